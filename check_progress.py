@@ -1,48 +1,49 @@
-"""Check progress of subsampling analysis"""
+"""
+Monitor running analyses from their progress event logs
+
+Reads the progress events written by the stage runner (run_full_pipeline.py,
+run_full_analysis.py, run_subsampling_analysis.py) and by work-queue workers,
+and shows per stage kind: done/planned, running, failed, mean duration and
+ETA, plus overall throughput, stragglers (running much longer than the
+median of their kind) and cells whose worker process has died.
+
+Usage:
+    python check_progress.py                     # one snapshot of the latest run
+    python check_progress.py --follow            # refresh every --interval seconds
+    python check_progress.py --queue-dir results/queue
+"""
+import sys
 import os
-import pandas as pd
-
-print("Checking analysis progress...\n")
-
-# Check models
-if os.path.exists('results/models'):
-    model_files = [f for f in os.listdir('results/models') if f.endswith('.pkl')]
-    print(f"Models: {len(model_files)} files")
-else:
-    print("Models: 0 files (not started)")
-
-# Check SHAP values
-if os.path.exists('results/shap_values'):
-    shap_files = [f for f in os.listdir('results/shap_values') if f.endswith('.npz')]
-    print(f"SHAP files: {len(shap_files)} files")
-    
-    # Count by model type
-    xgb_count = len([f for f in shap_files if 'xgboost' in f])
-    rf_count = len([f for f in shap_files if 'random_forest' in f])
-    lr_count = len([f for f in shap_files if 'logistic_regression' in f])
-    print(f"  - XGBoost: {xgb_count}")
-    print(f"  - Random Forest: {rf_count}")
-    print(f"  - Logistic Regression: {lr_count}")
-else:
-    print("SHAP files: 0 files (not started)")
-
-# Check results
-if os.path.exists('results/tables/subsampling_comparison.csv'):
-    df = pd.read_csv('results/tables/subsampling_comparison.csv')
-    print(f"\nSubsampling results: {len(df)} rows")
-    print("\nResults preview:")
-    print(df.head(10).to_string(index=False))
-else:
-    print("\nSubsampling results: Not yet generated")
-
-# Check figures
-if os.path.exists('results/figures'):
-    figures = [f for f in os.listdir('results/figures') if f.endswith('.png')]
-    print(f"\nFigures: {len(figures)} files")
-    if 'subsampling_analysis.png' in figures:
-        print("  [OK] Subsampling visualization exists")
-    else:
-        print("  [PENDING] Subsampling visualization not yet created")
-
-print("\n" + "=" * 60)
-print("Progress check complete")
+import time
+import argparse
+sys.path.append('src')
+
+from progress import DEFAULT_LOG, ProgressMonitor, format_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--log', default=None, help=f'Progress log (default: {DEFAULT_LOG})')
+    parser.add_argument('--queue-dir', default=None, help='Monitor a work queue instead')
+    parser.add_argument('--run', default=None, help='Run id (default: most recently active)')
+    parser.add_argument('--follow', action='store_true', help='Keep refreshing until the run ends')
+    parser.add_argument('--interval', type=float, default=5.0)
+    parser.add_argument('--straggler-factor', type=float, default=3.0)
+    args = parser.parse_args()
+    path = args.log or (os.path.join(args.queue_dir, 'progress.jsonl') if args.queue_dir else DEFAULT_LOG)
+
+    monitor = ProgressMonitor(path, straggler_factor=args.straggler_factor)
+    while True:
+        monitor.poll()
+        snapshot = monitor.snapshot(run=args.run)
+        if args.follow:
+            print('\033[2J\033[H', end='')
+        print(f"Progress: {path}\n")
+        print(format_snapshot(snapshot))
+        if not args.follow or (snapshot is not None and snapshot['ended']):
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ import numpy as np
 RANDOM_SEEDS = [42, 123, 456, 789, 1011, 2022, 3033, 4044, 5055, 6066]
 N_SEEDS = len(RANDOM_SEEDS)
 
+# Numeric precision of features, SHAP values and saved arrays ('float32' or 'float64');
+# reductions over seeds always accumulate in float64
+PRECISION = 'float64'
+
 # Data Subsampling Rates
 SUBSAMPLE_RATES = [0.5, 0.75, 1.0]  # 50%, 75%, 100%
 
@@ -70,12 +74,30 @@ MODELS = {
 
 # SHAP Configuration
 SHAP_CONFIG = {
+    # Rows per model call for model-agnostic explainers (bounds peak memory)
+    'predict_batch_size': 8192,
     'tree_explainer': {
-        'check_additivity': False  # Faster computation
+        'check_additivity': False,  # Faster computation
+        # 'tree_path_dependent': absent features follow the training cover of
+        # each split; 'interventional': absent features take the values of the
+        # shared background summary below (same rows for every model and seed)
+        'feature_perturbation': 'tree_path_dependent'
     },
     'kernel_explainer': {
         'nsamples': 100,  # Number of samples for KernelSHAP
-        'l1_reg': 'auto'
+        'l1_reg': 'auto',
+        # Adaptive precision: draw coalitions in rounds until every SHAP value
+        # of an instance has standard error <= target_se (nsamples is then unused)
+        'adaptive': False,
+        'target_se': 0.005,
+        'max_coalitions': 2048,  # Per instance
+        'max_evaluations': None  # Global model-evaluation budget per explain call
+    },
+    'background': {
+        # 'random': fresh random rows per call; 'kmeans' / 'medoids': weighted
+        # summary built once per (dataset, subsample, size) and shared
+        'method': 'random',
+        'size': 100
     }
 }
 
@@ -83,7 +105,13 @@ SHAP_CONFIG = {
 STABILITY_CONFIG = {
     'top_k_features': [3, 5, 10],  # Top-k features for consistency analysis
     'n_test_samples': 100,  # Number of test instances to analyze
-    'correlation_method': 'spearman'  # 'spearman' or 'pearson'
+    'correlation_method': 'spearman',  # 'spearman' or 'pearson'
+    'group_one_hot': False,  # Sum one-hot dummies per source column before ranking
+    # Pairwise interaction stability (tree models, run_interaction_stability.py)
+    'interactions': {
+        'top_n': 20,  # Interaction pairs kept and compared across seeds
+        'memory_limit_mb': 512  # Ceiling on the interaction values held at once (sets the chunk size)
+    }
 }
 
 # Output Directories
@@ -14,6 +14,10 @@ import numpy as np
 RANDOM_SEEDS = [42, 123, 456, 789, 1011]  # 10個 → 5個に削減
 N_SEEDS = len(RANDOM_SEEDS)
 
+# Numeric precision of features, SHAP values and saved arrays ('float32' or 'float64');
+# reductions over seeds always accumulate in float64
+PRECISION = 'float64'
+
 # Data Subsampling Rates
 SUBSAMPLE_RATES = [0.5, 0.75, 1.0]  # 50%, 75%, 100%
 
@@ -78,12 +82,30 @@ MODELS = {
 
 # SHAP Configuration (CPU環境用：KernelSHAPのサンプル数を削減)
 SHAP_CONFIG = {
+    # Rows per model call for model-agnostic explainers (bounds peak memory)
+    'predict_batch_size': 8192,
     'tree_explainer': {
-        'check_additivity': False  # Faster computation
+        'check_additivity': False,  # Faster computation
+        # 'tree_path_dependent': absent features follow the training cover of
+        # each split; 'interventional': absent features take the values of the
+        # shared background summary below (same rows for every model and seed)
+        'feature_perturbation': 'tree_path_dependent'
     },
     'kernel_explainer': {
         'nsamples': 50,  # 100 → 50に削減（KernelSHAPは時間がかかる）
-        'l1_reg': 'auto'
+        'l1_reg': 'auto',
+        # Adaptive precision: draw coalitions in rounds until every SHAP value
+        # of an instance has standard error <= target_se (nsamples is then unused)
+        'adaptive': False,
+        'target_se': 0.005,
+        'max_coalitions': 2048,  # Per instance
+        'max_evaluations': None  # Global model-evaluation budget per explain call
+    },
+    'background': {
+        # 'random': fresh random rows per call; 'kmeans' / 'medoids': weighted
+        # summary built once per (dataset, subsample, size) and shared
+        'method': 'random',
+        'size': 100
     }
 }
 
@@ -91,7 +113,13 @@ SHAP_CONFIG = {
 STABILITY_CONFIG = {
     'top_k_features': [3, 5, 10],
     'n_test_samples': 50,  # 100 → 50に削減（計算時間短縮）
-    'correlation_method': 'spearman'
+    'correlation_method': 'spearman',
+    'group_one_hot': False,  # Sum one-hot dummies per source column before ranking
+    # Pairwise interaction stability (tree models, run_interaction_stability.py)
+    'interactions': {
+        'top_n': 20,  # Interaction pairs kept and compared across seeds
+        'memory_limit_mb': 256  # Ceiling on the interaction values held at once (sets the chunk size)
+    }
 }
 
 # Output Directories
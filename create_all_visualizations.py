@@ -1,4 +1,8 @@
-"""Create all visualizations for all models"""
+"""Create all visualizations for all models
+
+Figures are rendered in parallel; figures whose inputs are unchanged since
+the last run are skipped (pass --force to redraw everything).
+"""
 import sys
 sys.path.append('src')
 
@@ -6,6 +10,7 @@ from visualization import (
     plot_shap_summary, plot_ranking_correlation,
     plot_shap_variance, plot_consistency_comparison
 )
+from render import plot_job, render_figures
 from shap_analysis import load_shap_values
 from stability_metrics import compute_stability_metrics
 import pandas as pd
@@ -26,6 +31,7 @@ seeds = [42, 123, 456, 789, 1011]
 
 # Process each model
 models = ['xgboost', 'random_forest', 'logistic_regression']
+jobs = []
 
 for model_name in models:
     print(f"\n=== Processing {model_name} ===")
@@ -50,39 +56,32 @@ for model_name in models:
     # Compute stability metrics
     metrics = compute_stability_metrics(shap_dict)
     
-    # Create visualizations
-    print(f"  Creating visualizations...")
-    
     # SHAP summary plot
     shap_vals = shap_dict[seeds[0]]
     X_sample = X_test.iloc[:shap_vals.shape[0]]
-    plot_shap_summary(
-        shap_vals, 
-        X_sample, 
-        feature_names=feature_names, 
-        save_path=f'results/figures/{model_name}_shap_summary.png'
-    )
+    jobs.append(plot_job(
+        plot_shap_summary, f'results/figures/{model_name}_shap_summary.png',
+        shap_vals, X_sample, feature_names=feature_names, feature_order=metrics['importance']['order']
+    ))
     
     # Ranking correlation
-    plot_ranking_correlation(
-        metrics, 
-        save_path=f'results/figures/{model_name}_ranking_correlation.png'
-    )
+    jobs.append(plot_job(
+        plot_ranking_correlation, f'results/figures/{model_name}_ranking_correlation.png', metrics
+    ))
     
     # SHAP variance
-    plot_shap_variance(
-        metrics, 
-        feature_names=feature_names, 
-        save_path=f'results/figures/{model_name}_shap_variance.png'
-    )
+    jobs.append(plot_job(
+        plot_shap_variance, f'results/figures/{model_name}_shap_variance.png',
+        metrics, feature_names=feature_names
+    ))
     
     # Consistency comparison
-    plot_consistency_comparison(
-        metrics, 
-        save_path=f'results/figures/{model_name}_consistency.png'
-    )
-    
-    print(f"  [OK] {model_name} visualizations created!")
+    jobs.append(plot_job(
+        plot_consistency_comparison, f'results/figures/{model_name}_consistency.png', metrics
+    ))
+
+print(f"\nRendering {len(jobs)} figures...")
+render_figures(jobs, force='--force' in sys.argv)
 
 print("\n" + "=" * 60)
 print("[OK] All visualizations created!")
@@ -0,0 +1,72 @@
+"""
+Background-size sweep: accuracy/latency trade-off of SHAP backgrounds
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+For each summarisation method (random rows, k-means centroids, stratified
+medoids) and background size, explains the same instances and compares the
+result with a large random background: KernelSHAP for model-agnostic
+models, interventional TreeSHAP (with the time spent on the background's
+tree paths and per instance/background pair) for tree models.
+
+Usage:
+    python run_background_sweep.py --sizes 10 25 50 100 200 --n-explain 20
+    python run_background_sweep.py --model xgboost --sizes 10 50 100 500 1000 --n-explain 100
+"""
+
+import os
+import sys
+import argparse
+sys.path.append('src')
+
+from pipeline import StageGraph, StageRunner
+from stages import add_data_stages, train_stage, model_params, TREE_MODELS
+from background import background_size_sweep, interventional_size_sweep, BACKGROUND_METHODS
+from data_loader import DATASET_REGISTRY
+import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--dataset', default='adult', choices=list(DATASET_REGISTRY))
+    parser.add_argument('--model', default='logistic_regression')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    parser.add_argument('--methods', nargs='+', default=BACKGROUND_METHODS, choices=BACKGROUND_METHODS)
+    parser.add_argument('--n-explain', type=int, default=20, help='Instances explained')
+    parser.add_argument('--reference-size', type=int, default=500)
+    parser.add_argument('--nsamples', type=int, default=200, help='KernelSHAP samples per instance')
+    parser.add_argument('--output', default=None,
+                        help='Output CSV (default: results/tables/background_size_sweep.csv, '
+                             'interventional_size_sweep.csv for tree models)')
+    args = parser.parse_args()
+
+    tree = args.model in TREE_MODELS
+    output = args.output or (f"results/tables/{'interventional' if tree else 'background'}_size_sweep.csv")
+
+    print("=" * 60)
+    print(f"Background-size sweep ({'interventional TreeSHAP' if tree else 'KernelSHAP'}, {args.model})")
+    print("=" * 60)
+
+    graph = StageGraph()
+    split, explain_set = add_data_stages(graph, args.dataset, n_samples=args.n_explain)
+    outputs = StageRunner(verbose=False).run(graph, targets=[split, explain_set])
+    split, X_explain = outputs[split], outputs[explain_set]
+    model = train_stage(split, args.model, seed=42, params=model_params(config, args.model))
+
+    if tree:
+        results = interventional_size_sweep(
+            model, split['X_train'], split['y_train'], X_explain, sizes=args.sizes,
+            methods=args.methods, reference_size=args.reference_size
+        )
+    else:
+        results = background_size_sweep(
+            model, split['X_train'], split['y_train'], X_explain, sizes=args.sizes,
+            methods=args.methods, reference_size=args.reference_size, nsamples_shap=args.nsamples
+        )
+    print(results.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    results.to_csv(output, index=False)
+    print(f"\n  [OK] Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Offline benchmark suite with a history file and regression check
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Commands:
+    run      Time every case (synthetic inputs + local Adult slices) and
+             append the results to the history under the current commit
+    compare  Compare the median times of two commits in the history and
+             flag regressions above a threshold (exit code 1 if any)
+    list     Show the commits recorded in the history
+
+Usage:
+    python run_benchmarks.py run --suite quick
+    python run_benchmarks.py run --suite full --include correlation tree_shap
+    python run_benchmarks.py compare BASE_COMMIT HEAD_COMMIT --threshold 0.1
+"""
+
+import sys
+import time
+import argparse
+import warnings
+sys.path.append('src')
+
+from benchmark import SUITES, DEFAULT_HISTORY, run_suite, append_history, read_history, compare_history
+
+
+def cmd_run(args):
+    warnings.filterwarnings('ignore')
+    print(f"  Running the {args.suite} suite ({args.repeats} repeats per case)...")
+    results = run_suite(args.suite, repeats=args.repeats, include=args.include)
+    label = append_history(results, args.history, suite=args.suite)
+    print(f"\n  [OK] {len(results)} cases recorded for {label} in {args.history}")
+    return 0
+
+
+def cmd_list(args):
+    history = read_history(args.history)
+    if history.empty:
+        print(f"  No benchmark history in {args.history}")
+        return 1
+    runs = history.groupby('commit').agg(cases=('key', 'nunique'), last=('time', 'max')).sort_values('last')
+    runs['last'] = runs['last'].map(lambda t: time.strftime('%Y-%m-%d %H:%M', time.localtime(t)))
+    print(runs.to_string())
+    return 0
+
+
+def cmd_compare(args):
+    history = read_history(args.history)
+    if history.empty:
+        print(f"  No benchmark history in {args.history}")
+        return 1
+    commits = list(history.sort_values('time')['commit'].drop_duplicates())
+    base = args.base or (commits[-2] if len(commits) > 1 else None)
+    head = args.head or commits[-1]
+    for commit in [base, head]:
+        if commit not in commits:
+            print(f"  [ERROR] No results for commit {commit} (recorded: {', '.join(commits)})")
+            return 1
+    table = compare_history(history, base, head, threshold=args.threshold)
+    print(f"  {base} -> {head} (threshold {args.threshold:.0%})\n")
+    print(table.to_string(index=False, float_format=lambda v: f'{v:.3g}'))
+    regressions = table[table['Status'] == 'REGRESSION']
+    print(f"\n  [{'FAIL' if len(regressions) else 'OK'}] {len(regressions)} regression(s)")
+    return 1 if len(regressions) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run')
+    run.add_argument('--suite', choices=list(SUITES), default='quick')
+    run.add_argument('--repeats', type=int, default=5)
+    run.add_argument('--include', nargs='+', default=None, help='Only cases containing these names')
+
+    compare = subparsers.add_parser('compare')
+    compare.add_argument('base', nargs='?', default=None, help='Default: second most recent commit')
+    compare.add_argument('head', nargs='?', default=None, help='Default: most recent commit')
+    compare.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown flagged')
+
+    subparsers.add_parser('list')
+
+    args = parser.parse_args()
+    print("=" * 60)
+    print(f"Benchmarks: {args.command}")
+    print("=" * 60)
+    sys.exit({'run': cmd_run, 'compare': cmd_compare, 'list': cmd_list}[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,182 +3,139 @@ Full analysis with all 3 models
 Student: Keisuke Nishioka (Matrikelnummer: 10081049)
 
 This script runs complete analysis for:
-- XGBoost (already done, will load)
-- Random Forest (new)
-- Logistic Regression (new)
+- XGBoost
+- Random Forest
+- Logistic Regression
+
+Stages already computed (e.g. by run_quick_test.py or an interrupted run)
+are loaded from results/artifacts instead of being recomputed.
+
+With --budget SECONDS a short calibration sizes the seeds, explain set and
+KernelSHAP samples to fit the wall-clock budget (see src/planner.py).
+
+Usage:
+    python run_full_analysis.py [--workers N] [--force] [--budget SECONDS]
+    python run_full_analysis.py --profile [LOG] [--trace-memory]
 """
 
 import sys
-import os
+import argparse
 sys.path.append('src')
 
-import pandas as pd
-import numpy as np
-from tqdm import tqdm
-
-# Import modules
-from data_loader import load_adult_income, prepare_data
-from models import (
-    train_xgboost, train_random_forest, train_logistic_regression,
-    get_task_type, save_model, load_model
-)
-from shap_analysis import (
-    compute_tree_shap, compute_kernel_shap, save_shap_values, load_shap_values
+from pipeline import StageGraph, StageRunner
+from progress import ProgressLog
+import instrument
+from stages import (
+    add_data_stages, add_model_stages, add_comparison_stage, model_params, planned_config,
+    kernel_options, background_spec, feature_groups_for, precision_for, add_results_store_stage
 )
-from stability_metrics import compute_stability_metrics, compare_models_stability
+from results_store import ResultsStore, DEFAULT_DB
+from bookkeeping import new_run_id
 from visualization import plot_model_comparison
+from render import plot_job, render_figures
 import config_cpu as config
 
+
+MODEL_TYPES = ['xgboost', 'random_forest', 'logistic_regression']
+
+
+def model_comparison_figure_stage(comparison_df):
+    """Create the model comparison figure"""
+    render_figures([plot_job(plot_model_comparison, 'results/figures/model_comparison.png', comparison_df)])
+
+
+def build_graph(config, test_seeds, n_samples, results_db=None, run_id=None):
+    """Stage graph for the 3-model CPU analysis"""
+    graph = StageGraph()
+    split, explain_set = add_data_stages(
+        graph, 'adult', test_size=0.2, random_state=42, n_samples=n_samples,
+        precision=precision_for(config)
+    )
+    metrics = [
+        add_model_stages(
+            graph, split, explain_set, model_type, test_seeds,
+            params=model_params(config, model_type),
+            nsamples_shap=config.SHAP_CONFIG['kernel_explainer']['nsamples'],
+            kernel_options=kernel_options(config),
+            background=background_spec(config),
+            batch_size=config.SHAP_CONFIG.get('predict_batch_size'),
+            top_k_list=config.STABILITY_CONFIG['top_k_features'],
+            feature_groups=feature_groups_for(graph, config),
+            models_dir=config.OUTPUT_DIRS['models'],
+            shap_dir=config.OUTPUT_DIRS['shap_values']
+        )
+        for model_type in MODEL_TYPES
+    ]
+    comparison = add_comparison_stage(
+        graph, metrics, MODEL_TYPES,
+        save_path='results/tables/model_stability_comparison.csv'
+    )
+    add_results_store_stage(graph, split, metrics, MODEL_TYPES, test_seeds, dataset='adult',
+                            store_path=results_db, run_id=run_id, shap_dir=config.OUTPUT_DIRS['shap_values'])
+    graph.add('report/figures', model_comparison_figure_stage, deps=[comparison], cache=False)
+    return graph
+
+
 def main():
     """Full analysis execution"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=2, help='Stages run concurrently')
+    parser.add_argument('--force', action='store_true', help='Ignore cached stage outputs')
+    parser.add_argument('--budget', type=float, default=None, help='Wall-clock budget in seconds')
+    parser.add_argument('--profile', nargs='?', const=instrument.DEFAULT_LOG, default=None,
+                        help='Record time and memory per stage, model and seed to this JSON-lines log')
+    parser.add_argument('--trace-memory', action='store_true', help='Also trace Python allocations (slower)')
+    parser.add_argument('--results-db', default=DEFAULT_DB, help="Results store ('' to skip)")
+    args = parser.parse_args()
+    # One id for the progress log, the instrument log and the results store
+    run_id = new_run_id()
+    if args.profile:
+        instrument.configure(args.profile, run_id=run_id, trace_memory=args.trace_memory)
     
     print("=" * 60)
     print("Full Analysis: All 3 Models")
     print("Student: Keisuke Nishioka (Matrikelnummer: 10081049)")
     print("=" * 60)
     
-    # Step 1: Data Preprocessing
-    print("\n[Step 1] Loading and preprocessing data...")
-    X, y = load_adult_income()
-    X_train, X_test, y_train, y_test, scaler = prepare_data(
-        X, y, test_size=0.2, random_state=42
-    )
-    print(f"  [OK] Training set: {X_train.shape}")
-    print(f"  [OK] Test set: {X_test.shape}")
-    
-    task = get_task_type(y_train)
-    print(f"  [OK] Task type: {task}")
-    
-    # Step 2: Model Training
-    print("\n[Step 2] Training models...")
-    test_seeds = config.RANDOM_SEEDS[:5]  # Use 5 seeds for better analysis
-    n_samples = 30  # Reduced for CPU efficiency
-    
-    # XGBoost (load if exists, otherwise train)
-    print("  Training XGBoost models...")
-    xgboost_models = {}
-    for seed in tqdm(test_seeds, desc="XGBoost"):
-        model_path = f'results/models/xgboost_seed_{seed}.pkl'
-        if os.path.exists(model_path):
-            xgboost_models[seed] = load_model(model_path)
-        else:
-            model = train_xgboost(
-                X_train, y_train, task=task, random_state=seed,
-                n_estimators=50, max_depth=5, base_score=0.5
-            )
-            xgboost_models[seed] = model
-            save_model(model, model_path)
-    
-    # Random Forest
-    print("  Training Random Forest models...")
-    rf_models = {}
-    for seed in tqdm(test_seeds, desc="Random Forest"):
-        model = train_random_forest(
-            X_train, y_train, task=task, random_state=seed,
-            n_estimators=50, max_depth=8
-        )
-        rf_models[seed] = model
-        save_model(model, f'results/models/random_forest_seed_{seed}.pkl')
-    
-    # Logistic Regression
-    print("  Training Logistic Regression models...")
-    lr_models = {}
-    for seed in tqdm(test_seeds, desc="Logistic Regression"):
-        model = train_logistic_regression(
-            X_train, y_train, random_state=seed
-        )
-        lr_models[seed] = model
-        save_model(model, f'results/models/logistic_regression_seed_{seed}.pkl')
-    
-    print(f"  [OK] All models trained!")
-    
-    # Step 3: SHAP Explanation Generation
-    print("\n[Step 3] Generating SHAP explanations...")
-    
-    # XGBoost (load if exists, otherwise compute)
-    print("  Computing SHAP for XGBoost...")
-    xgboost_shap_dict = {}
-    for seed in tqdm(test_seeds, desc="XGBoost SHAP"):
-        shap_path = f'results/shap_values/xgboost_seed_{seed}_shap.npz'
-        if os.path.exists(shap_path):
-            shap_vals = load_shap_values(shap_path)
-            # Handle 3D shape
-            if len(shap_vals.shape) == 3:
-                shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-            xgboost_shap_dict[seed] = shap_vals
-        else:
-            shap_vals, _ = compute_tree_shap(xgboost_models[seed], X_test, n_samples=n_samples)
-            if len(shap_vals.shape) == 3:
-                shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-            xgboost_shap_dict[seed] = shap_vals
-            save_shap_values(shap_vals, shap_path)
-    
-    # Random Forest (TreeSHAP)
-    print("  Computing SHAP for Random Forest...")
-    rf_shap_dict = {}
-    for seed in tqdm(test_seeds, desc="Random Forest SHAP"):
-        shap_vals, _ = compute_tree_shap(rf_models[seed], X_test, n_samples=n_samples)
-        if len(shap_vals.shape) == 3:
-            shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-        rf_shap_dict[seed] = shap_vals
-        save_shap_values(shap_vals, f'results/shap_values/random_forest_seed_{seed}_shap.npz')
-    
-    # Logistic Regression (KernelSHAP - slower)
-    print("  Computing SHAP for Logistic Regression (KernelSHAP - this will take time)...")
-    lr_shap_dict = {}
-    for seed in tqdm(test_seeds, desc="Logistic Regression SHAP"):
-        shap_vals, _ = compute_kernel_shap(
-            lr_models[seed], X_train, X_test, 
-            n_samples=n_samples, nsamples_shap=50  # Reduced for speed
-        )
-        if len(shap_vals.shape) == 3:
-            shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-        lr_shap_dict[seed] = shap_vals
-        save_shap_values(shap_vals, f'results/shap_values/logistic_regression_seed_{seed}_shap.npz')
-    
-    print("  [OK] All SHAP values computed!")
-    
-    # Step 4: Stability Analysis
-    print("\n[Step 4] Computing stability metrics...")
-    
-    xgboost_stability = compute_stability_metrics(xgboost_shap_dict)
-    rf_stability = compute_stability_metrics(rf_shap_dict)
-    lr_stability = compute_stability_metrics(lr_shap_dict)
-    
-    stability_results = {
-        'XGBoost': xgboost_stability,
-        'Random Forest': rf_stability,
-        'Logistic Regression': lr_stability
-    }
-    
-    comparison_df = compare_models_stability(stability_results)
-    comparison_df.to_csv('results/tables/model_stability_comparison.csv', index=False)
+    if args.budget:
+        print("\n[Plan] Calibrating for the time budget...")
+        run_config = planned_config(args.budget, MODEL_TYPES, config)
+        test_seeds = run_config.RANDOM_SEEDS
+        n_samples = run_config.STABILITY_CONFIG['n_test_samples']
+    else:
+        run_config = config
+        test_seeds = config.RANDOM_SEEDS[:5]  # Use 5 seeds for better analysis
+        n_samples = 30  # Reduced for CPU efficiency
+    
+    results_run = ResultsStore(args.results_db).start_run(run_config, 'run_full_analysis', run_id=run_id) if args.results_db else None
+    graph = build_graph(run_config, test_seeds, n_samples, args.results_db, results_run)
+    runner = StageRunner(max_workers=args.workers, force=args.force, progress=ProgressLog(run=run_id))
+    targets = ['report/comparison', 'report/figures'] + (['report/results_store'] if args.results_db else [])
+    outputs = runner.run(graph, targets=targets)
     
     print("\n  Stability Results:")
-    print(comparison_df.to_string(index=False))
-    print("  [OK] Stability analysis completed!")
-    
-    # Step 5: Model Comparison Visualization
-    print("\n[Step 5] Creating model comparison visualization...")
-    plot_model_comparison(
-        comparison_df,
-        save_path='results/figures/model_comparison.png'
-    )
-    print("  [OK] Model comparison plot created!")
+    print(outputs['report/comparison'].to_string(index=False))
     
     # Summary
     print("\n" + "=" * 60)
     print("Full Analysis Completed Successfully!")
     print("=" * 60)
     print("\nResults:")
-    print(f"  Models trained: {len(test_seeds) * 3}")
-    print(f"  SHAP explanations: {len(test_seeds) * 3}")
-    print(f"  Stability metrics computed for: 3 models")
+    print(f"  Models trained: {len(test_seeds) * len(MODEL_TYPES)}")
+    print(f"  SHAP explanations: {len(test_seeds) * len(MODEL_TYPES)}")
+    print(f"  Stages executed: {len(runner.timings)} of {len(graph.stages)}")
+    print(f"  Stability metrics computed for: {len(MODEL_TYPES)} models")
     print("\nOutput files:")
     print("  - Models: results/models/")
     print("  - SHAP values: results/shap_values/")
     print("  - Tables: results/tables/model_stability_comparison.csv")
     print("  - Figures: results/figures/model_comparison.png")
+    if args.results_db:
+        print(f"  - Results store: {args.results_db} (run {results_run})")
+    
+    if args.profile:
+        print(f"\n  Where the time went (run {run_id}, log {args.profile}):")
+        instrument.print_summary(args.profile, run=run_id)
 
 if __name__ == "__main__":
     main()
@@ -9,201 +9,207 @@ This script runs the complete pipeline:
 4. Stability analysis
 5. Visualization
 
+Stages are cached in results/artifacts, so an interrupted run resumes where
+it stopped. Use --force to recompute everything.
+
+With --budget SECONDS a short calibration sizes the seeds, explain set and
+KernelSHAP samples to fit the wall-clock budget (see src/planner.py).
+
+With --adaptive-seeds, seeds are added one at a time per model until the
+confidence intervals of all stability metrics are narrower than --target-width
+(see src/seed_scheduler.py).
+
 Usage:
-    python run_full_pipeline.py
+    python run_full_pipeline.py [--workers N] [--force] [--budget SECONDS]
+    python run_full_pipeline.py --adaptive-seeds [--target-width 0.05] [--max-seeds 20]
+    python run_full_pipeline.py --profile [LOG] [--trace-memory]
 """
 
 import sys
-import os
+import argparse
 sys.path.append('src')
 
-import pandas as pd
-import numpy as np
-from tqdm import tqdm
-
-# Import modules
-from data_loader import load_adult_income, prepare_data
-from models import (
-    train_xgboost, train_random_forest, train_logistic_regression,
-    get_task_type, save_model
+from pipeline import StageGraph, StageRunner
+from progress import ProgressLog
+import instrument
+from stages import (
+    add_data_stages, add_model_stages, add_comparison_stage, model_params, planned_config,
+    seed_explainer, kernel_options, background_spec, feature_groups_for,
+    precision_for, add_results_store_stage
 )
-from shap_analysis import (
-    compute_shap_for_model, compute_shap_multiple_seeds,
-    save_shap_values
-)
-from stability_metrics import compute_stability_metrics, compare_models_stability
+from results_store import ResultsStore, DEFAULT_DB
+from bookkeeping import new_run_id
+from seed_scheduler import schedule_seeds
+from planner import extend_seeds
 from visualization import (
     plot_shap_summary, plot_ranking_correlation,
     plot_shap_variance, plot_consistency_comparison, plot_model_comparison
 )
+from render import plot_job, render_figures
 import config
 
 
+def figures_stage(xgboost_shap, xgboost_stability, X_explain, comparison_df):
+    """Create the XGBoost figures and the model comparison figure"""
+    feature_names = X_explain.columns.tolist()
+    figures = 'results/figures'
+    # Feature order from the stability metrics (per encoded column only)
+    importance = xgboost_stability.get('importance') if 'feature_names' not in xgboost_stability else None
+    
+    render_figures([
+        plot_job(plot_shap_summary, f'{figures}/xgboost_shap_summary.png',
+                 xgboost_shap, X_explain, feature_names=feature_names,
+                 feature_order=importance['order'] if importance else None),
+        plot_job(plot_ranking_correlation, f'{figures}/xgboost_ranking_correlation.png',
+                 xgboost_stability),
+        plot_job(plot_shap_variance, f'{figures}/xgboost_shap_variance.png', xgboost_stability,
+                 feature_names=xgboost_stability.get('feature_names', feature_names)),
+        plot_job(plot_consistency_comparison, f'{figures}/xgboost_consistency.png',
+                 xgboost_stability),
+        plot_job(plot_model_comparison, f'{figures}/model_comparison.png', comparison_df)
+    ])
+
+
+def model_kwargs(config, model_type):
+    """Stage arguments shared by fixed and adaptive seed runs"""
+    return {
+        'params': model_params(config, model_type),
+        'nsamples_shap': config.SHAP_CONFIG['kernel_explainer']['nsamples'],
+        'kernel_options': kernel_options(config),
+        'background': background_spec(config),
+        'batch_size': config.SHAP_CONFIG.get('predict_batch_size'),
+        'models_dir': config.OUTPUT_DIRS['models'],
+        'shap_dir': config.OUTPUT_DIRS['shap_values']
+    }
+
+
+def data_stages(graph, config):
+    return add_data_stages(
+        graph, 'adult', test_size=0.2, random_state=42,
+        n_samples=config.STABILITY_CONFIG['n_test_samples'],
+        precision=precision_for(config)
+    )
+
+
+def adaptive_seeds(config, runner, args):
+    """Choose the number of seeds per model by metric convergence"""
+    graph = StageGraph()
+    split, explain_set = data_stages(graph, config)
+    explain_fns = {
+        model_type: seed_explainer(runner, graph, split, explain_set, model_type,
+                                   **model_kwargs(config, model_type))
+        for model_type in config.MODELS
+    }
+    schedule = schedule_seeds(
+        explain_fns, extend_seeds(config.RANDOM_SEEDS, args.max_seeds),
+        target_width=args.target_width,
+        top_k_list=config.STABILITY_CONFIG['top_k_features']
+    )
+    return {model_type: result['seeds'] for model_type, result in schedule.items()}
+
+
+def build_graph(config, seeds, results_db=None, run_id=None):
+    """Stage graph: load -> split -> train -> explain -> metrics -> report (and results store)"""
+    graph = StageGraph()
+    split, explain_set = data_stages(graph, config)
+    
+    metrics = [
+        add_model_stages(
+            graph, split, explain_set, model_type, model_seeds,
+            top_k_list=config.STABILITY_CONFIG['top_k_features'],
+            feature_groups=feature_groups_for(graph, config),
+            **model_kwargs(config, model_type)
+        )
+        for model_type, model_seeds in seeds.items()
+    ]
+    comparison = add_comparison_stage(
+        graph, metrics, list(seeds),
+        save_path='results/tables/model_stability_comparison.csv'
+    )
+    add_results_store_stage(graph, split, metrics, list(seeds), seeds, dataset='adult',
+                            store_path=results_db, run_id=run_id, shap_dir=config.OUTPUT_DIRS['shap_values'])
+    first_seed = seeds['xgboost'][0]
+    graph.add(
+        'report/figures', figures_stage,
+        deps=[f'explain/xgboost/{first_seed}', 'metrics/xgboost', explain_set, comparison],
+        cache=False
+    )
+    return graph
+
+
 def main():
     """Main pipeline execution"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=2, help='Stages run concurrently')
+    parser.add_argument('--force', action='store_true', help='Ignore cached stage outputs')
+    parser.add_argument('--budget', type=float, default=None, help='Wall-clock budget in seconds')
+    parser.add_argument('--adaptive-seeds', action='store_true',
+                        help='Add seeds until the stability metrics converge')
+    parser.add_argument('--target-width', type=float, default=0.05,
+                        help='Target 95%% CI width for correlation/consistency')
+    parser.add_argument('--max-seeds', type=int, default=20, help='Seed limit per model (adaptive)')
+    parser.add_argument('--profile', nargs='?', const=instrument.DEFAULT_LOG, default=None,
+                        help='Record time and memory per stage, model and seed to this JSON-lines log')
+    parser.add_argument('--trace-memory', action='store_true', help='Also trace Python allocations (slower)')
+    parser.add_argument('--results-db', default=DEFAULT_DB, help="Results store ('' to skip)")
+    args = parser.parse_args()
+    # One id for the progress log, the instrument log and the results store
+    run_id = new_run_id()
+    if args.profile:
+        instrument.configure(args.profile, run_id=run_id, trace_memory=args.trace_memory)
     
     print("=" * 60)
     print("SHAP Stability Analysis Pipeline")
     print("Student: Keisuke Nishioka (Matrikelnummer: 10081049)")
     print("=" * 60)
     
-    # Step 1: Data Preprocessing
-    print("\n[Step 1] Loading and preprocessing data...")
-    X, y = load_adult_income()
-    X_train, X_test, y_train, y_test, scaler = prepare_data(
-        X, y, test_size=0.2, random_state=42
-    )
-    print(f"  Training set: {X_train.shape}")
-    print(f"  Test set: {X_test.shape}")
-    
-    # Determine task type
-    task = get_task_type(y_train)
-    print(f"  Task type: {task}")
-    
-    # Step 2: Model Training
-    print("\n[Step 2] Training models...")
-    n_seeds = len(config.RANDOM_SEEDS)
-    
-    # Train XGBoost
-    print(f"  Training {n_seeds} XGBoost models...")
-    xgboost_models = {}
-    for seed in tqdm(config.RANDOM_SEEDS, desc="XGBoost"):
-        model = train_xgboost(X_train, y_train, task=task, random_state=seed)
-        xgboost_models[seed] = model
-        save_model(model, f'results/models/xgboost_seed_{seed}.pkl')
-    
-    # Train Random Forest
-    print(f"  Training {n_seeds} Random Forest models...")
-    rf_models = {}
-    for seed in tqdm(config.RANDOM_SEEDS, desc="Random Forest"):
-        model = train_random_forest(X_train, y_train, task=task, random_state=seed)
-        rf_models[seed] = model
-        save_model(model, f'results/models/random_forest_seed_{seed}.pkl')
-    
-    # Train Logistic Regression
-    print(f"  Training {n_seeds} Logistic Regression models...")
-    lr_models = {}
-    for seed in tqdm(config.RANDOM_SEEDS, desc="Logistic Regression"):
-        model = train_logistic_regression(X_train, y_train, random_state=seed)
-        lr_models[seed] = model
-        save_model(model, f'results/models/logistic_regression_seed_{seed}.pkl')
-    
-    print("  Model training completed!")
-    
-    # Step 3: SHAP Explanation Generation
-    print("\n[Step 3] Generating SHAP explanations...")
-    n_samples = config.STABILITY_CONFIG['n_test_samples']
-    
-    # XGBoost (TreeSHAP)
-    print("  Computing TreeSHAP for XGBoost...")
-    xgboost_shap_results = compute_shap_multiple_seeds(
-        xgboost_models, X_train, X_test,
-        model_type='xgboost',
-        random_seeds=config.RANDOM_SEEDS,
-        n_samples=n_samples,
-        save_dir='results/shap_values'
-    )
-    
-    # Random Forest (TreeSHAP)
-    print("  Computing TreeSHAP for Random Forest...")
-    rf_shap_results = compute_shap_multiple_seeds(
-        rf_models, X_train, X_test,
-        model_type='random_forest',
-        random_seeds=config.RANDOM_SEEDS,
-        n_samples=n_samples,
-        save_dir='results/shap_values'
-    )
-    
-    # Logistic Regression (KernelSHAP) - Use fewer seeds (slower)
-    print("  Computing KernelSHAP for Logistic Regression...")
-    lr_seeds = config.RANDOM_SEEDS[:5]  # Use first 5 seeds
-    lr_models_subset = {seed: lr_models[seed] for seed in lr_seeds}
-    lr_shap_results = compute_shap_multiple_seeds(
-        lr_models_subset, X_train, X_test,
-        model_type='logistic_regression',
-        random_seeds=lr_seeds,
-        n_samples=n_samples,
-        save_dir='results/shap_values'
-    )
-    
-    print("  SHAP computation completed!")
-    
-    # Step 4: Stability Analysis
-    print("\n[Step 4] Computing stability metrics...")
-    
-    # Extract SHAP values
-    xgboost_shap_dict = {seed: shap_vals for seed, (shap_vals, _) in xgboost_shap_results.items()}
-    rf_shap_dict = {seed: shap_vals for seed, (shap_vals, _) in rf_shap_results.items()}
-    lr_shap_dict = {seed: shap_vals for seed, (shap_vals, _) in lr_shap_results.items()}
-    
-    # Compute stability metrics
-    xgboost_stability = compute_stability_metrics(xgboost_shap_dict)
-    rf_stability = compute_stability_metrics(rf_shap_dict)
-    lr_stability = compute_stability_metrics(lr_shap_dict)
-    
-    # Compare models
-    stability_results = {
-        'XGBoost': xgboost_stability,
-        'Random Forest': rf_stability,
-        'Logistic Regression': lr_stability
-    }
-    comparison_df = compare_models_stability(stability_results)
-    
-    # Save results
-    comparison_df.to_csv('results/tables/model_stability_comparison.csv', index=False)
-    print("  Stability analysis completed!")
-    
-    # Step 5: Visualization
-    print("\n[Step 5] Generating visualizations...")
-    
-    # Get sample data for visualization
-    seed = config.RANDOM_SEEDS[0]
-    xgboost_shap_sample = xgboost_shap_dict[seed]
-    X_sample = X_test.iloc[:len(xgboost_shap_sample)]
-    feature_names = X_test.columns.tolist()
-    
-    # Create visualizations
-    plot_shap_summary(
-        xgboost_shap_sample, X_sample, feature_names=feature_names,
-        save_path='results/figures/xgboost_shap_summary.png'
-    )
-    
-    plot_ranking_correlation(
-        xgboost_stability,
-        save_path='results/figures/xgboost_ranking_correlation.png'
-    )
-    
-    plot_shap_variance(
-        xgboost_stability, feature_names=feature_names,
-        save_path='results/figures/xgboost_shap_variance.png'
-    )
-    
-    plot_consistency_comparison(
-        xgboost_stability,
-        save_path='results/figures/xgboost_consistency.png'
-    )
-    
-    plot_model_comparison(
-        comparison_df,
-        save_path='results/figures/model_comparison.png'
-    )
-    
-    print("  Visualizations completed!")
+    runner = StageRunner(max_workers=args.workers, force=args.force, progress=ProgressLog(run=run_id))
+    run_config = config
+    if args.budget:
+        print("\n[Plan] Calibrating for the time budget...")
+        run_config = planned_config(args.budget, list(config.MODELS), config)
+    
+    if args.adaptive_seeds:
+        print("\n[Seeds] Adding seeds until the stability metrics converge...")
+        seeds = adaptive_seeds(run_config, StageRunner(force=args.force, verbose=False), args)
+    elif args.budget:
+        seeds = {model_type: run_config.RANDOM_SEEDS for model_type in config.MODELS}
+    else:
+        seeds = {
+            'xgboost': config.RANDOM_SEEDS,
+            'random_forest': config.RANDOM_SEEDS,
+            'logistic_regression': config.RANDOM_SEEDS[:5]  # KernelSHAP is slow: first 5 seeds
+        }
+    
+    results_run = ResultsStore(args.results_db).start_run(run_config, 'run_full_pipeline', run_id=run_id) if args.results_db else None
+    graph = build_graph(run_config, seeds, args.results_db, results_run)
+    targets = ['report/comparison', 'report/figures'] + (['report/results_store'] if args.results_db else [])
+    outputs = runner.run(graph, targets=targets)
+    
+    print("\n  Stability Results:")
+    print(outputs['report/comparison'].to_string(index=False))
     
     # Summary
     print("\n" + "=" * 60)
     print("Pipeline completed successfully!")
     print("=" * 60)
     print("\nResults:")
-    print(f"  Models trained: {n_seeds * 3}")
-    print(f"  SHAP explanations generated: {len(xgboost_shap_results) + len(rf_shap_results) + len(lr_shap_results)}")
-    print(f"  Stability metrics computed for: 3 models")
-    print(f"  Visualizations created: 5 figures")
+    print(f"  Models trained: {sum(len(s) for s in seeds.values())}")
+    print(f"  Stages executed: {len(runner.timings)} of {len(graph.stages)}")
+    print(f"  Stability metrics computed for: {len(seeds)} models")
+    print("  Visualizations created: 5 figures")
     print("\nOutput files:")
     print("  - Models: results/models/")
     print("  - SHAP values: results/shap_values/")
     print("  - Tables: results/tables/")
     print("  - Figures: results/figures/")
+    print("  - Stage cache: results/artifacts/")
+    if args.results_db:
+        print(f"  - Results store: {args.results_db} (run {results_run})")
+    
+    if args.profile:
+        print(f"\n  Where the time went (run {run_id}, log {args.profile}):")
+        instrument.print_summary(args.profile, run=run_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""
+Import-time benchmark of the analysis modules
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Imports each module in a fresh interpreter (repeated, median reported) and
+lists which heavy dependencies (shap, matplotlib, seaborn, xgboost, sklearn)
+the import pulled in. The metrics/IO path used by check_results.py must
+stay under the budget; shap, plotting and model libraries load on first
+use only.
+
+Usage:
+    python run_import_benchmark.py --repeats 5 --budget 1.0
+"""
+
+import sys
+import os
+import json
+import argparse
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+
+HEAVY_MODULES = ['shap', 'matplotlib', 'seaborn', 'xgboost', 'sklearn']
+
+# Name -> statements executed in the timed import
+TARGETS = {
+    'metrics/IO path': 'from shap_analysis import load_shap_values; '
+                       'from stability_metrics import compute_stability_metrics',
+    'stability_metrics': 'import stability_metrics',
+    'shap_archive': 'import shap_archive',
+    'shap_analysis': 'import shap_analysis',
+    'data_loader': 'import data_loader',
+    'models': 'import models',
+    'visualization': 'import visualization',
+    'stages': 'import stages',
+    'work_queue': 'import work_queue',
+    'shap (first use)': 'import shap'
+}
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(statement, src_dir, repeats=3):
+    """Median import time (s) over fresh interpreters and the heavy modules loaded"""
+    code = PROBE.format(src=src_dir, statement=statement, heavy=HEAVY_MODULES)
+    times, loaded = [], []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(report['seconds'])
+        loaded = report['loaded']
+    return float(np.median(times)), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=1.0, help='Seconds allowed for the metrics/IO path')
+    args = parser.parse_args()
+    src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+    print("=" * 60)
+    print("Import-time benchmark")
+    print("=" * 60)
+
+    rows = []
+    for name, statement in TARGETS.items():
+        seconds, loaded = time_import(statement, src_dir, args.repeats)
+        rows.append({'Import': name, 'Seconds': seconds, 'Heavy Modules': ', '.join(loaded) or '-'})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+
+    io_path = rows[0]['Seconds']
+    ok = io_path <= args.budget
+    print(f"\n  [{'OK' if ok else 'FAIL'}] metrics/IO path {io_path:.3f} s (budget {args.budget:.1f} s)")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
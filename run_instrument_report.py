@@ -0,0 +1,51 @@
+"""
+Summarise an instrumentation log: where the time and memory went
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Reads the JSON-lines log written by --profile runs (see src/instrument.py)
+and prints totals per measured function or stage, optionally split by
+labels such as the model or seed.
+
+Usage:
+    python run_instrument_report.py [--log results/logs/instrument.jsonl] [--run last|all|RUN_ID]
+    python run_instrument_report.py --by name label_model
+"""
+
+import sys
+import os
+import argparse
+sys.path.append('src')
+
+from instrument import DEFAULT_LOG, read_log, summary_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--log', default=DEFAULT_LOG)
+    parser.add_argument('--run', default='last', help="Run id, 'last' or 'all'")
+    parser.add_argument('--by', nargs='+', default=['name'],
+                        help='Group columns (name, label_model, label_seed, label_stage, ...)')
+    parser.add_argument('--output', default=None, help='Also write the table to this CSV file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"  [ERROR] No instrumentation log at {args.log} (run a script with --profile)")
+        return 1
+    frame = read_log(args.log, run=None if args.run == 'all' else args.run)
+    if frame.empty:
+        print("  No measurements recorded")
+        return 1
+    runs = frame['run'].unique()
+    print(f"  {len(frame)} measurements from {len(runs)} run(s): {', '.join(map(str, runs))}")
+    print(f"  Top-level wall time: {frame.loc[frame['depth'] == 0, 'wall'].sum():.1f} s\n")
+    table = summary_table(frame, by=args.by)
+    print(table.to_string(index=False, float_format=lambda v: f'{v:.3g}'))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        table.to_csv(args.output, index=False)
+        print(f"\n  [OK] Saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
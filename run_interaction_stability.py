@@ -0,0 +1,95 @@
+"""
+Stability of pairwise SHAP interaction effects across seeds
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Computes TreeSHAP interaction values of every seed in instance chunks that
+fit the memory ceiling (STABILITY_CONFIG['interactions']) and reports the
+top-N interaction pairs with their spread across seeds, the rank
+correlation of the seeds' pair rankings and the top-N consistency. The
+models are the cached train stages of run_full_pipeline.py.
+
+Usage:
+    python run_interaction_stability.py --model xgboost
+    python run_interaction_stability.py --model random_forest --top-n 30 --memory-mb 256 --n-samples 500
+"""
+
+import sys
+import argparse
+import importlib
+sys.path.append('src')
+
+from pipeline import StageGraph, StageRunner
+from stages import (
+    add_data_stages, add_interaction_stage, model_params, feature_groups_for, precision_for, TREE_MODELS
+)
+from results_store import ResultsStore, stability_rows, DEFAULT_DB
+from data_loader import DATASET_REGISTRY
+
+
+SUMMARY_KEYS = ['ranking_correlation', 'instance_ranking_correlation', 'top_n_consistency',
+                'instance_top_n_consistency', 'variance', 'n_runs', 'n_samples', 'n_pairs', 'top_n']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--config', default='config', choices=['config', 'config_cpu'])
+    parser.add_argument('--dataset', default='adult', choices=list(DATASET_REGISTRY))
+    parser.add_argument('--model', default='xgboost', choices=TREE_MODELS)
+    parser.add_argument('--seeds', type=int, default=None, help='Number of seeds (default: config)')
+    parser.add_argument('--n-samples', type=int, default=None, help='Explained test instances')
+    parser.add_argument('--top-n', type=int, default=None, help='Interaction pairs kept (default: config)')
+    parser.add_argument('--memory-mb', type=float, default=None, help='Memory ceiling in MB (default: config)')
+    parser.add_argument('--force', action='store_true', help='Ignore cached stage outputs')
+    parser.add_argument('--output', default=None,
+                        help='Top pairs CSV (default: results/tables/interaction_stability_<model>.csv)')
+    parser.add_argument('--results-db', default=DEFAULT_DB, help="Results store ('' to skip)")
+    args = parser.parse_args()
+
+    config = importlib.import_module(args.config)
+    options = config.STABILITY_CONFIG['interactions']
+    seeds = config.RANDOM_SEEDS[:args.seeds] if args.seeds else config.RANDOM_SEEDS
+    top_n = args.top_n or options['top_n']
+    memory_mb = args.memory_mb or options['memory_limit_mb']
+    output = args.output or f'results/tables/interaction_stability_{args.model}.csv'
+
+    print("=" * 60)
+    print(f"Interaction stability ({args.model}, {len(seeds)} seeds, top {top_n} pairs, {memory_mb:g} MB)")
+    print("=" * 60)
+
+    graph = StageGraph()
+    split, explain_set = add_data_stages(
+        graph, args.dataset, test_size=0.2, random_state=42,
+        n_samples=args.n_samples or config.STABILITY_CONFIG['n_test_samples'],
+        precision=precision_for(config)
+    )
+    interactions = add_interaction_stage(
+        graph, split, explain_set, args.model, seeds, params=model_params(config, args.model),
+        top_n=top_n, memory_limit_mb=memory_mb, feature_groups=feature_groups_for(graph, config, args.dataset),
+        models_dir=config.OUTPUT_DIRS['models'] if args.dataset == 'adult' else None, save_path=output
+    )
+    try:
+        outputs = StageRunner(force=args.force, verbose=False).run(graph, targets=[interactions, split])
+    except ValueError as e:
+        print(f"  [ERROR] {e}")
+        return 1
+    result = outputs[interactions]
+
+    print(f"\n  Chunks of {result['chunk_size']} instances")
+    for key in SUMMARY_KEYS:
+        print(f"  {key:30s} {result[key]:.4g}")
+    print(f"\n  Top {result['top_n']} interaction pairs:")
+    print(result['top_pairs'].to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    print(f"\n  [OK] Saved to {output}")
+
+    if args.results_db:
+        store = ResultsStore(args.results_db)
+        run_id = store.start_run(config, 'run_interaction_stability')
+        summary = {'interactions': {key: result[key] for key in SUMMARY_KEYS}}
+        store.add_metrics(run_id, stability_rows(args.dataset, args.model, summary, rate=outputs[split]['rate'],
+                                                 n_train=len(outputs[split]['X_train']), seeds=seeds))
+        print(f"  [OK] Recorded in {args.results_db} (run {run_id})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
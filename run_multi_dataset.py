@@ -0,0 +1,70 @@
+"""
+Stability grid across several datasets, run concurrently
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Runs the model comparison of every selected dataset (keys of
+config.DATASETS or any registered dataset, e.g. synthetic) in parallel,
+splitting the core budget between the datasets, and merges the
+per-dataset comparison tables into results/datasets/index.csv. Stages are
+cached, so datasets that were already analysed only reload their results.
+
+Usage:
+    python run_multi_dataset.py --datasets adult wine --cores 8
+    python run_multi_dataset.py --datasets adult synthetic --seeds 5 --n-samples 50
+    python run_multi_dataset.py --config config_cpu
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+sys.path.append('src')
+
+from data_loader import DATASET_REGISTRY
+from dataset_grid import run_datasets, update_results_index, split_cores, DEFAULT_INDEX
+from results_store import DEFAULT_DB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--config', default='config', choices=['config', 'config_cpu'])
+    parser.add_argument('--datasets', nargs='+', default=None, choices=list(DATASET_REGISTRY),
+                        help='Default: every dataset in config.DATASETS')
+    parser.add_argument('--cores', type=int, default=None, help='Core budget (default: all cores)')
+    parser.add_argument('--seeds', type=int, default=None, help='Number of seeds (default: config)')
+    parser.add_argument('--n-samples', type=int, default=None, help='Explained test instances')
+    parser.add_argument('--force', action='store_true', help='Ignore cached stage outputs')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help='Combined results index')
+    parser.add_argument('--results-db', default=DEFAULT_DB, help="Results store ('' to skip)")
+    args = parser.parse_args()
+
+    config = importlib.import_module(args.config)
+    datasets = args.datasets or list(config.DATASETS)
+    seeds = config.RANDOM_SEEDS[:args.seeds] if args.seeds else config.RANDOM_SEEDS
+
+    print("=" * 60)
+    print("Multi-dataset stability grid")
+    print("=" * 60)
+    shares = split_cores(datasets, args.cores or os.cpu_count() or 1)
+    print("  " + ", ".join(f"{dataset}: {cores} core(s)" for dataset, cores in shares.items()))
+    print(f"  Seeds: {len(seeds)}\n")
+
+    start = time.perf_counter()
+    results = run_datasets(datasets, cores=args.cores, seeds=seeds, config_name=args.config,
+                           n_samples=args.n_samples, force=args.force,
+                           results_db=args.results_db)
+    index = update_results_index(results, config, path=args.index)
+
+    print(f"\n  Combined index ({args.index}):")
+    columns = [c for c in ['Dataset', 'Model', 'Ranking Correlation', 'Top-5 Consistency', 'SHAP Variance',
+                           'Seconds'] if c in index.columns]
+    print(index[columns].to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+    failed = [r['dataset'] for r in results if r['status'] != 'ok']
+    print(f"\n  [{'WARN' if failed else 'OK'}] {len(results) - len(failed)}/{len(results)} datasets "
+          f"in {time.perf_counter() - start:.1f}s" + (f" (failed: {', '.join(failed)})" if failed else ''))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
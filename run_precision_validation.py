@@ -0,0 +1,127 @@
+"""
+Validate float32 mode: stability-metric drift against float64 on the Adult grid
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Runs the same models x seeds (x subsample rates) grid once in float64 and
+once in float32 (both cached in the artifact store) and reports, per model
+and metric, the float64 and float32 values with their absolute and relative
+drift, plus the SHAP value difference and the SHAP storage size.
+
+Model-agnostic explainers use the seeded adaptive KernelSHAP estimator, so
+both runs draw the same coalitions and the drift reflects precision rather
+than sampling noise.
+
+Usage:
+    python run_precision_validation.py --n-seeds 5 --n-samples 50
+"""
+
+import sys
+import os
+import argparse
+import io
+sys.path.append('src')
+
+import numpy as np
+import pandas as pd
+
+from pipeline import StageGraph, StageRunner
+from stages import add_data_stages, add_model_stages, model_params, MODEL_NAMES
+from precision import metric_drift
+import config
+
+
+KERNEL_OPTIONS = {'target_se': 0.005, 'max_coalitions': 1024}
+
+
+def build_graph(models, seeds, n_samples, rates):
+    """Metrics and explain stages of the grid for both precisions"""
+    graph = StageGraph()
+    targets = {}
+    for precision in ['float64', 'float32']:
+        for rate in rates:
+            prefix = f'{precision}/rate_{rate}/'
+            split, explain_set = add_data_stages(
+                graph, 'adult', test_size=0.2, random_state=42, n_samples=n_samples,
+                rate=rate, prefix=prefix, precision=precision
+            )
+            for model_type in models:
+                metrics = add_model_stages(
+                    graph, split, explain_set, model_type, seeds,
+                    params=model_params(config, model_type),
+                    kernel_options=KERNEL_OPTIONS,
+                    top_k_list=config.STABILITY_CONFIG['top_k_features'],
+                    prefix=prefix
+                )
+                explains = [f'{prefix}explain/{model_type}/{seed}' for seed in seeds]
+                targets[(precision, rate, model_type)] = (metrics, explains)
+    return graph, targets
+
+
+def npz_size(shap_values):
+    """Compressed size of one saved SHAP file"""
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, shap_values=shap_values)
+    return buffer.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--models', nargs='+', default=['xgboost', 'random_forest', 'logistic_regression'])
+    parser.add_argument('--n-seeds', type=int, default=5)
+    parser.add_argument('--n-samples', type=int, default=50, help='Explained test instances')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1.0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--output', default='results/tables/precision_validation.csv')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("float32 vs float64 validation")
+    print("=" * 60)
+
+    seeds = config.RANDOM_SEEDS[:args.n_seeds]
+    graph, targets = build_graph(args.models, seeds, args.n_samples, args.rates)
+    names = [name for metrics, explains in targets.values() for name in [metrics] + explains]
+    outputs = StageRunner(max_workers=args.workers, verbose=False).run(graph, targets=names)
+
+    reports = []
+    for rate in args.rates:
+        metrics = {
+            precision: {
+                MODEL_NAMES[m]: outputs[targets[(precision, rate, m)][0]] for m in args.models
+            }
+            for precision in ['float64', 'float32']
+        }
+        drift = metric_drift(metrics['float64'], metrics['float32'])
+        drift.insert(0, 'Subsample Rate', rate)
+
+        shap_rows = []
+        for model_type in args.models:
+            shap_64 = [outputs[n] for n in targets[('float64', rate, model_type)][1]]
+            shap_32 = [outputs[n] for n in targets[('float32', rate, model_type)][1]]
+            diff = max(np.abs(a.astype(np.float64) - b).max() for a, b in zip(shap_32, shap_64))
+            scale = max(np.abs(a).max() for a in shap_64)
+            shap_rows.append({
+                'Subsample Rate': rate, 'Model': MODEL_NAMES[model_type],
+                'Metric': 'Max SHAP Difference', 'float64': scale, 'float32': scale,
+                'Absolute Drift': diff, 'Relative Drift': diff / max(scale, 1e-300)
+            })
+            size_64 = sum(npz_size(a) for a in shap_64)
+            size_32 = sum(npz_size(a) for a in shap_32)
+            shap_rows.append({
+                'Subsample Rate': rate, 'Model': MODEL_NAMES[model_type],
+                'Metric': 'SHAP Storage (bytes)', 'float64': size_64, 'float32': size_32,
+                'Absolute Drift': size_64 - size_32, 'Relative Drift': 1 - size_32 / size_64
+            })
+        reports.append(pd.concat([drift, pd.DataFrame(shap_rows)], ignore_index=True))
+
+    report = pd.concat(reports, ignore_index=True)
+    print(report.to_string(index=False, float_format=lambda v: f'{v:.3g}'))
+    worst = report[~report['Metric'].isin(['Max SHAP Difference', 'SHAP Storage (bytes)'])]['Absolute Drift'].max()
+    print(f"\n  Largest stability-metric drift: {worst:.3g}")
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    report.to_csv(args.output, index=False)
+    print(f"  [OK] Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Query the results store across runs
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Reads the SQLite index filled by the pipeline scripts (see
+src/results_store.py); the SHAP files are never opened.
+
+Usage:
+    python run_results_query.py --metric ranking_correlation.mean --model xgboost --since 2025-01-01
+    python run_results_query.py --dataset adult --wide
+    python run_results_query.py --metric ranking_correlation --model random_forest --per-seed
+    python run_results_query.py --runs
+    python run_results_query.py --artifacts --model xgboost --seed 42
+"""
+
+import sys
+import os
+import argparse
+sys.path.append('src')
+
+from results_store import ResultsStore, DEFAULT_DB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--metric', nargs='+', default=None, help='Metric names (e.g. ranking_correlation.mean)')
+    parser.add_argument('--dataset', nargs='+', default=None)
+    parser.add_argument('--model', nargs='+', default=None)
+    parser.add_argument('--rate', nargs='+', type=float, default=None)
+    parser.add_argument('--run', nargs='+', default=None, help='Run ids')
+    parser.add_argument('--since', default=None, help="Only results recorded since (e.g. '2025-01-01')")
+    parser.add_argument('--seed', type=int, default=None, help='Seed (with --artifacts)')
+    parser.add_argument('--per-seed', action='store_true', help='Per-seed metrics instead of metrics across seeds')
+    parser.add_argument('--wide', action='store_true', help='One column per metric')
+    parser.add_argument('--runs', action='store_true', help='List the registered runs')
+    parser.add_argument('--artifacts', action='store_true', help='List artifact paths instead of metrics')
+    parser.add_argument('--output', default=None, help='Also write the table to this CSV file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"  [ERROR] No results store at {args.db}")
+        return 1
+    store = ResultsStore(args.db)
+    if args.runs:
+        table = store.runs(since=args.since)
+    elif args.artifacts:
+        table = store.artifacts(dataset=args.dataset, model=args.model, seed=args.seed, run_id=args.run,
+                                since=args.since)
+    else:
+        table = store.query(metric=args.metric, dataset=args.dataset, model=args.model, rate=args.rate,
+                            run_id=args.run, since=args.since, per_seed=args.per_seed, wide=args.wide)
+    if table.empty:
+        print("  No matching results")
+        return 1
+    print(table.to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        table.to_csv(args.output, index=False)
+        print(f"\n  [OK] Saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Pack per-seed SHAP files into quantised, delta-encoded archives
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Groups results/shap_values/{model}_seed_{seed}_shap.npz by model, writes one
+{model}_archive.npz per model (cross-seed mean + int16 residuals) and reports
+the storage ratio, load times and the recorded error bound. The per-seed
+files are left in place.
+
+Usage:
+    python run_shap_archive.py --shap-dir results/shap_values
+"""
+
+import sys
+import os
+import re
+import time
+import argparse
+sys.path.append('src')
+
+import numpy as np
+import pandas as pd
+
+from shap_analysis import load_shap_values
+from shap_archive import save_shap_archive, load_shap_archive
+
+
+FILE_PATTERN = re.compile(r'^(?P<model>.+)_seed_(?P<seed>\d+)_shap\.npz$')
+
+
+def find_seed_files(shap_dir):
+    """Dictionary {model: {seed: path}} of per-seed SHAP files"""
+    files = {}
+    for name in sorted(os.listdir(shap_dir)):
+        match = FILE_PATTERN.match(name)
+        if match:
+            files.setdefault(match['model'], {})[int(match['seed'])] = os.path.join(shap_dir, name)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--shap-dir', default='results/shap_values')
+    parser.add_argument('--output-dir', default=None, help='Archive directory (default: --shap-dir)')
+    parser.add_argument('--no-compress', action='store_true', help='Store the archive uncompressed')
+    args = parser.parse_args()
+    output_dir = args.output_dir or args.shap_dir
+
+    print("=" * 60)
+    print("SHAP archive packing")
+    print("=" * 60)
+
+    rows = []
+    for model, paths in find_seed_files(args.shap_dir).items():
+        if len(paths) < 2:
+            continue
+        start = time.perf_counter()
+        shap_dict = {seed: load_shap_values(path) for seed, path in paths.items()}
+        load_files = time.perf_counter() - start
+
+        # Files from different runs can differ in shape; keep the common one
+        shapes = pd.Series({seed: values.shape for seed, values in shap_dict.items()})
+        common = shapes.value_counts().index[0]
+        skipped = sorted(shapes.index[shapes != common])
+        if skipped:
+            print(f"  [WARN] {model}: skipping seeds {skipped} (shape differs from {common})")
+        paths = {seed: path for seed, path in paths.items() if seed not in skipped}
+        shap_dict = {seed: shap_dict[seed] for seed in paths}
+        if len(paths) < 2:
+            continue
+
+        archive_path = os.path.join(output_dir, f'{model}_archive.npz')
+        error_bound = save_shap_archive(shap_dict, archive_path, compress=not args.no_compress)
+        start = time.perf_counter()
+        decoded = load_shap_archive(archive_path)
+        load_archive = time.perf_counter() - start
+
+        max_error = max(np.abs(decoded[seed] - shap_dict[seed]).max() for seed in paths)
+        size_files = sum(os.path.getsize(path) for path in paths.values())
+        size_archive = os.path.getsize(archive_path)
+        rows.append({
+            'Model': model, 'Seeds': len(paths),
+            'Files (bytes)': size_files, 'Archive (bytes)': size_archive,
+            'Ratio': size_files / size_archive,
+            'Load Files (s)': load_files, 'Load Archive (s)': load_archive,
+            'Error Bound': float(error_bound.max()), 'Max Error': float(max_error)
+        })
+        print(f"  [OK] {model}: {len(paths)} seeds -> {archive_path} "
+              f"({size_files / size_archive:.1f}x smaller, max error {max_error:.2e})")
+
+    if not rows:
+        print(f"  [ERROR] No per-seed SHAP files found in {args.shap_dir}")
+        return
+    print()
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f'{v:.3g}'))
+
+
+if __name__ == "__main__":
+    main()
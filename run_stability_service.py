@@ -0,0 +1,110 @@
+"""
+Online explanation-stability scoring service and load generator
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Commands:
+    serve   Load (or train, via the cached stage graph) the seed models and
+            serve per-row stability scores over HTTP or a Unix socket
+    load    Send test-set rows to a running service and report latency
+            percentiles against a p99 target
+
+Usage:
+    python run_stability_service.py serve --port 8765 --n-seeds 5
+    python run_stability_service.py serve --unix /tmp/stability.sock
+    python run_stability_service.py load --port 8765 --requests 2000 --concurrency 8 --target-p99-ms 50
+"""
+
+import sys
+import argparse
+sys.path.append('src')
+
+from pipeline import StageGraph, StageRunner
+from stages import add_data_stages, add_seed_stages, model_params, MODEL_NAMES
+from stability_service import StabilityScorer, make_server, load_test
+import config
+
+
+def prepare(model_types, seeds):
+    """Split and seed models from the stage graph (cached after the first run)"""
+    graph = StageGraph()
+    split, explain_set = add_data_stages(graph, 'adult', test_size=0.2, random_state=42)
+    train_names = {}
+    for model_type in model_types:
+        for seed in seeds:
+            add_seed_stages(graph, split, explain_set, model_type, seed,
+                            params=model_params(config, model_type))
+            train_names[(model_type, seed)] = f'train/{model_type}/{seed}'
+    outputs = StageRunner(verbose=False).run(graph, targets=[split] + list(train_names.values()))
+    models = {m: {s: outputs[train_names[(m, s)]] for s in seeds} for m in model_types}
+    return outputs[split], models
+
+
+def cmd_serve(args):
+    seeds = config.RANDOM_SEEDS[:args.n_seeds]
+    print(f"  Loading {len(args.models)} model types x {len(seeds)} seeds...")
+    split, models = prepare(args.models, seeds)
+    scorer = StabilityScorer(models, split['X_train'], top_k_list=config.STABILITY_CONFIG['top_k_features'],
+                             method=args.method)
+    server, batcher = make_server(scorer, host=args.host, port=args.port, unix_socket=args.unix,
+                                  max_rows=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    address = args.unix or f'http://{args.host}:{args.port}'
+    print(f"  [OK] Serving {', '.join(MODEL_NAMES.get(m, m) for m in args.models)} on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+def cmd_load(args):
+    graph = StageGraph()
+    split, _ = add_data_stages(graph, 'adult', test_size=0.2, random_state=42)
+    rows = StageRunner(verbose=False).run(graph, targets=[split])[split]['X_test'].values
+    print(f"  Sending {args.requests} requests ({args.rows_per_request} rows each, "
+          f"{args.concurrency} clients)...")
+    report = load_test(rows, n_requests=args.requests, concurrency=args.concurrency,
+                       rows_per_request=args.rows_per_request, host=args.host, port=args.port,
+                       unix_socket=args.unix)
+    print(f"  Throughput: {report['throughput_rows']:.0f} rows/s, errors: {report['errors']}")
+    print(f"  Latency p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, "
+          f"p99 {report['p99_ms']:.1f} ms, max {report['max_ms']:.1f} ms")
+    if args.target_p99_ms is not None:
+        ok = report['p99_ms'] <= args.target_p99_ms and report['errors'] == 0
+        print(f"  [{'OK' if ok else 'FAIL'}] p99 target {args.target_p99_ms:.1f} ms")
+        return 0 if ok else 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ['serve', 'load']:
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--host', default='127.0.0.1')
+        sub.add_argument('--port', type=int, default=8765)
+        sub.add_argument('--unix', default=None, help='Unix socket path (instead of TCP)')
+
+    serve = subparsers.choices['serve']
+    serve.add_argument('--models', nargs='+', default=['xgboost', 'random_forest', 'logistic_regression'])
+    serve.add_argument('--n-seeds', type=int, default=5)
+    serve.add_argument('--method', choices=['interventional', 'shap', 'paths'], default='interventional',
+                       help="Tree explanations: interventional SHAP of all seeds against one background "
+                            "summary, path-dependent TreeSHAP per seed (matches the offline analysis) or "
+                            "Saabas path attributions of all seeds in one call (fastest, not SHAP)")
+    serve.add_argument('--max-batch', type=int, default=64, help='Rows per micro-batch')
+    serve.add_argument('--max-wait-ms', type=float, default=5.0, help='Micro-batch collection window')
+
+    load = subparsers.choices['load']
+    load.add_argument('--requests', type=int, default=1000)
+    load.add_argument('--concurrency', type=int, default=8)
+    load.add_argument('--rows-per-request', type=int, default=1)
+    load.add_argument('--target-p99-ms', type=float, default=None)
+
+    args = parser.parse_args()
+    sys.exit({'serve': cmd_serve, 'load': cmd_load}[args.command](args) or 0)
+
+
+if __name__ == "__main__":
+    main()
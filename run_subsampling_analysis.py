@@ -7,193 +7,180 @@ This script runs extended analysis with:
 - More random seeds (10 seeds)
 - All 3 models
 - Extended analysis for better accuracy
+
+Every (rate, model, seed) stage is cached in results/artifacts, so a rerun
+only computes what is missing, and every completed cell is appended to the
+checkpoint journal results/checkpoints/subsampling.jsonl. --force recomputes
+all stages; --force --resume continues an interrupted forced run from its
+last journalled cell instead of starting it over. Without --resume the
+previous journal is archived and a new one is started.
+
+With --budget SECONDS a short calibration sizes the seeds, explain set and
+KernelSHAP samples to fit the wall-clock budget (see src/planner.py).
+
+Usage:
+    python run_subsampling_analysis.py [--workers N] [--force] [--resume] [--budget SECONDS]
 """
 
 import sys
 import os
+import argparse
 sys.path.append('src')
 
 import pandas as pd
-import numpy as np
-from tqdm import tqdm
-import json
 
-# Import modules
-from data_loader import load_adult_income, prepare_data, subsample_data
-from models import (
-    train_xgboost, train_random_forest, train_logistic_regression,
-    get_task_type, save_model, load_model
+from pipeline import StageGraph, StageRunner
+from progress import ProgressLog
+from checkpoint import CheckpointJournal
+from stages import (
+    add_data_stages, add_model_stages, planned_config, kernel_options, background_spec,
+    feature_groups_for, precision_for, add_results_store_stage, MODEL_NAMES
 )
-from shap_analysis import (
-    compute_tree_shap, compute_kernel_shap, save_shap_values, load_shap_values
-)
-from stability_metrics import compute_stability_metrics, compare_models_stability
-from visualization import plot_model_comparison
+from results_store import ResultsStore, DEFAULT_DB
+from bookkeeping import new_run_id
 import config
 
+
+MODEL_TYPES = ['xgboost', 'random_forest', 'logistic_regression']
+JOURNAL_PATH = 'results/checkpoints/subsampling.jsonl'
+MODEL_PARAMS = {
+    'xgboost': {'n_estimators': 100, 'max_depth': 6, 'base_score': 0.5},
+    'random_forest': {'n_estimators': 100, 'max_depth': 10},
+    'logistic_regression': {}
+}
+
+
+def subsampling_comparison_stage(training_sizes, *metrics, rates, save_path=None):
+    """
+    Comparison table across subsample rates
+
+    Args:
+        training_sizes: Training set size per rate
+        *metrics: Stability metrics ordered rate-major, then MODEL_TYPES
+        rates: Subsample rates
+        save_path: CSV output path (optional)
+    """
+    comparison_data = []
+    metrics = iter(metrics)
+    for rate, training_size in zip(rates, training_sizes):
+        for model_type in MODEL_TYPES:
+            model_metrics = next(metrics)
+            comparison_data.append({
+                'Subsample Rate': f'{rate*100:.0f}%',
+                'Training Size': training_size,
+                'Model': MODEL_NAMES[model_type],
+                'Ranking Correlation': model_metrics['ranking_correlation']['mean'],
+                'SHAP Variance': model_metrics['variance']['overall'],
+                'Top-5 Consistency': model_metrics['consistency']['top_5']['overall']
+            })
+    
+    comparison_df = pd.DataFrame(comparison_data)
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        comparison_df.to_csv(save_path, index=False)
+    return comparison_df
+
+
+def training_sizes_stage(*splits):
+    """Training set size of each subsampled split"""
+    return [split['X_train'].shape[0] for split in splits]
+
+
+def build_graph(all_seeds, subsample_rates, n_samples, nsamples_shap=100, kernel_opts=None,
+                background=None, results_db=None, run_id=None):
+    """Stage graph: rates x models x seeds, then one comparison table"""
+    graph = StageGraph()
+    metrics = []
+    splits = []
+    for subsample_rate in subsample_rates:
+        prefix = f'rate_{subsample_rate}/'
+        split, explain_set = add_data_stages(
+            graph, 'adult', test_size=0.2, random_state=42,
+            n_samples=n_samples, rate=subsample_rate, prefix=prefix,
+            precision=precision_for(config)
+        )
+        splits.append(split)
+        for model_type in MODEL_TYPES:
+            metrics.append(add_model_stages(
+                graph, split, explain_set, model_type, all_seeds,
+                params=MODEL_PARAMS[model_type],
+                nsamples_shap=nsamples_shap,
+                kernel_options=kernel_opts,
+                background=background,
+                batch_size=config.SHAP_CONFIG.get('predict_batch_size'),
+                top_k_list=config.STABILITY_CONFIG['top_k_features'],
+                feature_groups=feature_groups_for(graph, config),
+                prefix=prefix,
+                labels={'rate': subsample_rate}
+            ))
+        add_results_store_stage(graph, split, metrics[-len(MODEL_TYPES):], MODEL_TYPES, all_seeds,
+                                dataset='adult', prefix=prefix, store_path=results_db, run_id=run_id)
+    
+    sizes = graph.add('training_sizes', training_sizes_stage, deps=splits)
+    graph.add(
+        'report/subsampling', subsampling_comparison_stage, deps=[sizes] + metrics,
+        params={'rates': list(subsample_rates)},
+        extra={'save_path': 'results/tables/subsampling_comparison.csv'}, cache=False
+    )
+    return graph
+
+
 def main():
     """Extended subsampling analysis"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=2, help='Stages run concurrently')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep the stages journalled by an interrupted run (with --force)')
+    parser.add_argument('--force', action='store_true', help='Ignore cached stage outputs')
+    parser.add_argument('--journal', default=JOURNAL_PATH, help='Checkpoint journal path')
+    parser.add_argument('--budget', type=float, default=None, help='Wall-clock budget in seconds')
+    parser.add_argument('--results-db', default=DEFAULT_DB, help="Results store ('' to skip)")
+    args = parser.parse_args()
     
     print("=" * 60)
     print("Extended Subsampling Analysis")
     print("Student: Keisuke Nishioka (Matrikelnummer: 10081049)")
     print("=" * 60)
     
-    # Step 1: Data Preprocessing
-    print("\n[Step 1] Loading and preprocessing data...")
-    X, y = load_adult_income()
-    X_train_full, X_test, y_train_full, y_test, scaler = prepare_data(
-        X, y, test_size=0.2, random_state=42
-    )
-    print(f"  [OK] Full training set: {X_train_full.shape}")
-    print(f"  [OK] Test set: {X_test.shape}")
-    
-    task = get_task_type(y_train_full)
-    print(f"  [OK] Task type: {task}")
-    print(f"  [OK] Dataset: Adult Income")
-    
-    # Step 2: Extended Configuration
-    print("\n[Step 2] Extended configuration...")
-    # Use all 10 seeds for better accuracy
-    all_seeds = config.RANDOM_SEEDS  # 10 seeds
     subsample_rates = config.SUBSAMPLE_RATES  # [0.5, 0.75, 1.0]
-    n_samples = 50  # Increased from 30 to 50 for better analysis
+    run_config = config
+    if args.budget:
+        print("\n[Plan] Calibrating for the time budget...")
+        run_config = planned_config(args.budget, MODEL_TYPES, config, rates=subsample_rates)
+        all_seeds = run_config.RANDOM_SEEDS
+        n_samples = run_config.STABILITY_CONFIG['n_test_samples']
+        nsamples_shap = run_config.SHAP_CONFIG['kernel_explainer']['nsamples']
+    else:
+        # Use all 10 seeds for better accuracy
+        all_seeds = config.RANDOM_SEEDS  # 10 seeds
+        n_samples = 50  # Increased from 30 to 50 for better analysis
+        nsamples_shap = 100  # Increased for better accuracy
     
     print(f"  Random seeds: {len(all_seeds)} seeds")
     print(f"  Subsampling rates: {subsample_rates}")
     print(f"  Test samples: {n_samples}")
     
-    # Step 3: Subsampling Analysis
-    print("\n[Step 3] Running subsampling analysis...")
-    
-    all_results = {}
-    
-    for subsample_rate in subsample_rates:
-        print(f"\n  === Subsampling Rate: {subsample_rate*100:.0f}% ===")
-        
-        # Subsample training data
-        X_train_sub, y_train_sub = subsample_data(
-            X_train_full, y_train_full, 
-            rate=subsample_rate, 
-            random_state=42
-        )
-        print(f"  Training set size: {X_train_sub.shape[0]} samples")
-        
-        # Train models for each subsample rate
-        print(f"  Training models...")
-        
-        # XGBoost
-        xgboost_models = {}
-        for seed in tqdm(all_seeds, desc=f"XGBoost ({subsample_rate*100:.0f}%)"):
-            model = train_xgboost(
-                X_train_sub, y_train_sub, task=task, random_state=seed,
-                n_estimators=100,  # Increased for better accuracy
-                max_depth=6,  # Increased
-                base_score=0.5
-            )
-            xgboost_models[seed] = model
-        
-        # Random Forest
-        rf_models = {}
-        for seed in tqdm(all_seeds, desc=f"Random Forest ({subsample_rate*100:.0f}%)"):
-            model = train_random_forest(
-                X_train_sub, y_train_sub, task=task, random_state=seed,
-                n_estimators=100,  # Increased for better accuracy
-                max_depth=10  # Increased
-            )
-            rf_models[seed] = model
-        
-        # Logistic Regression
-        lr_models = {}
-        for seed in tqdm(all_seeds, desc=f"Logistic Regression ({subsample_rate*100:.0f}%)"):
-            model = train_logistic_regression(
-                X_train_sub, y_train_sub, random_state=seed
-            )
-            lr_models[seed] = model
-        
-        print(f"  [OK] All models trained for {subsample_rate*100:.0f}% subsample")
-        
-        # Step 4: SHAP Explanation Generation
-        print(f"  Computing SHAP explanations...")
-        
-        # XGBoost (TreeSHAP)
-        xgboost_shap_dict = {}
-        for seed in tqdm(all_seeds, desc=f"XGBoost SHAP ({subsample_rate*100:.0f}%)"):
-            shap_vals, _ = compute_tree_shap(xgboost_models[seed], X_test, n_samples=n_samples)
-            if len(shap_vals.shape) == 3:
-                shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-            xgboost_shap_dict[seed] = shap_vals
-        
-        # Random Forest (TreeSHAP)
-        rf_shap_dict = {}
-        for seed in tqdm(all_seeds, desc=f"Random Forest SHAP ({subsample_rate*100:.0f}%)"):
-            shap_vals, _ = compute_tree_shap(rf_models[seed], X_test, n_samples=n_samples)
-            if len(shap_vals.shape) == 3:
-                shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-            rf_shap_dict[seed] = shap_vals
-        
-        # Logistic Regression (KernelSHAP - slower)
-        lr_shap_dict = {}
-        for seed in tqdm(all_seeds, desc=f"Logistic Regression SHAP ({subsample_rate*100:.0f}%)"):
-            shap_vals, _ = compute_kernel_shap(
-                lr_models[seed], X_train_sub, X_test,
-                n_samples=n_samples, nsamples_shap=100  # Increased for better accuracy
-            )
-            if len(shap_vals.shape) == 3:
-                shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
-            lr_shap_dict[seed] = shap_vals
-        
-        print(f"  [OK] All SHAP values computed for {subsample_rate*100:.0f}% subsample")
-        
-        # Step 5: Stability Analysis
-        print(f"  Computing stability metrics...")
-        
-        xgboost_stability = compute_stability_metrics(xgboost_shap_dict)
-        rf_stability = compute_stability_metrics(rf_shap_dict)
-        lr_stability = compute_stability_metrics(lr_shap_dict)
-        
-        stability_results = {
-            'XGBoost': xgboost_stability,
-            'Random Forest': rf_stability,
-            'Logistic Regression': lr_stability
-        }
-        
-        # Store results
-        all_results[f'subsample_{subsample_rate}'] = {
-            'rate': subsample_rate,
-            'training_size': X_train_sub.shape[0],
-            'stability_results': stability_results
-        }
-        
-        print(f"  [OK] Stability analysis completed for {subsample_rate*100:.0f}% subsample")
-    
-    # Step 6: Compare across subsample rates
-    print("\n[Step 6] Comparing across subsample rates...")
-    
-    comparison_data = []
-    for rate_key, result in all_results.items():
-        rate = result['rate']
-        training_size = result['training_size']
-        stability = result['stability_results']
-        
-        for model_name, metrics in stability.items():
-            comparison_data.append({
-                'Subsample Rate': f'{rate*100:.0f}%',
-                'Training Size': training_size,
-                'Model': model_name,
-                'Ranking Correlation': metrics['ranking_correlation']['mean'],
-                'SHAP Variance': metrics['variance']['overall'],
-                'Top-5 Consistency': metrics['consistency']['top_5']['overall']
-            })
+    journal = CheckpointJournal(args.journal)
+    if args.resume:
+        print(f"  Resuming: {len(journal.completed())} stages already checkpointed")
+    else:
+        journal.reset()
     
-    comparison_df = pd.DataFrame(comparison_data)
-    comparison_df.to_csv('results/tables/subsampling_comparison.csv', index=False)
+    # One id for the progress log and the results store
+    results_run = new_run_id()
+    if args.results_db:
+        ResultsStore(args.results_db).start_run(run_config, 'run_subsampling_analysis', run_id=results_run)
+    graph = build_graph(all_seeds, subsample_rates, n_samples, nsamples_shap,
+                        kernel_options(run_config), background_spec(run_config), args.results_db, results_run)
+    runner = StageRunner(max_workers=args.workers, force=args.force, journal=journal, resume=args.resume,
+                         progress=ProgressLog(run=results_run))
+    targets = ['report/subsampling'] + [name for name in graph.stages if name.endswith('report/results_store')]
+    comparison_df = runner.run(graph, targets=targets)['report/subsampling']
     
     print("\n  Subsampling Comparison Results:")
     print(comparison_df.to_string(index=False))
     
-    # Step 7: Visualize subsampling effects
-    print("\n[Step 7] Creating subsampling visualization...")
+    print("\n[Report] Creating subsampling visualization...")
     create_subsampling_visualization(comparison_df)
     
     # Summary
@@ -203,11 +190,14 @@ def main():
     print("\nResults:")
     print(f"  Subsampling rates analyzed: {len(subsample_rates)}")
     print(f"  Random seeds per rate: {len(all_seeds)}")
-    print(f"  Total models trained: {len(subsample_rates) * len(all_seeds) * 3}")
-    print(f"  Total SHAP computations: {len(subsample_rates) * len(all_seeds) * 3}")
+    print(f"  Total models trained: {len(subsample_rates) * len(all_seeds) * len(MODEL_TYPES)}")
+    print(f"  Total SHAP computations: {len(subsample_rates) * len(all_seeds) * len(MODEL_TYPES)}")
+    print(f"  Stages executed: {len(runner.timings)} of {len(graph.stages)}")
     print("\nOutput files:")
     print("  - Tables: results/tables/subsampling_comparison.csv")
     print("  - Figures: results/figures/subsampling_analysis.png")
+    if args.results_db:
+        print(f"  - Results store: {args.results_db} (run {results_run})")
 
 def create_subsampling_visualization(comparison_df):
     """Create visualization for subsampling analysis"""
@@ -0,0 +1,133 @@
+"""
+Distributed experiment grid over a shared-directory work queue
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Commands:
+    init    Create the queue and enqueue the grid (datasets x rates x
+            replicates x models x seeds)
+    worker  Lease cells, train + explain them, push results (run any number
+            of these, on any host that mounts the queue directory with
+            working file locks; see src/work_queue.py)
+    status  Show cell counts per status
+    reduce  Run the stability reduction over finished cells
+    local   init + N local worker processes sharing the datasets in memory
+            + reduce (single-machine run)
+
+Usage:
+    python run_work_queue.py init --queue-dir results/queue --rates 0.5 1.0 --replicates 2
+    python run_work_queue.py worker --queue-dir results/queue
+    python run_work_queue.py reduce --queue-dir results/queue
+    python run_work_queue.py local --queue-dir results/queue --workers 4
+"""
+
+import sys
+import os
+import argparse
+import time
+sys.path.append('src')
+
+import pandas as pd
+
+from work_queue import WorkQueue, build_grid, run_worker, run_local_workers, reduce_results
+from stages import kernel_options, background_spec, precision_for
+import config
+
+
+def cmd_init(args):
+    queue = WorkQueue(args.queue_dir, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    params = {
+        'n_samples': args.n_samples,
+        'nsamples_shap': config.SHAP_CONFIG['kernel_explainer']['nsamples'],
+        'kernel_options': kernel_options(config),
+        'background': background_spec(config),
+        'batch_size': config.SHAP_CONFIG.get('predict_batch_size'),
+        'precision': precision_for(config),
+        'model_params': {
+            model: {k: v for k, v in config.MODELS[model]['params'].items() if k != 'random_state'}
+            for model in args.models if model in config.MODELS
+        }
+    }
+    seeds = config.RANDOM_SEEDS[:args.n_seeds]
+    cells = build_grid(args.datasets, args.rates, args.replicates, args.models, seeds, params)
+    existing = queue.cells()
+    before = set(existing['cell_id']) if not existing.empty else set()
+    added = queue.enqueue(cells)
+    # Announce only the new cells to the progress monitor
+    new = [cell for cell in queue.cells().to_dict('records') if cell['cell_id'] not in before]
+    if new:
+        queue.progress_log().plan_kinds(pd.Series([cell['model'] for cell in new]).value_counts().to_dict())
+    print(f"  [OK] Enqueued {added} new cells ({len(cells)} in grid) in {queue.db_path}")
+
+
+def cmd_worker(args):
+    queue = WorkQueue(args.queue_dir, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    n = run_worker(queue, worker=args.worker_id, max_cells=args.max_cells,
+                   idle_exit=not args.wait, poll_seconds=args.poll_seconds,
+                   progress=queue.progress_log())
+    print(f"  [OK] Worker finished {n} cells")
+
+
+def cmd_status(args):
+    queue = WorkQueue(args.queue_dir, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    counts = queue.counts()
+    total = sum(counts.values())
+    print(f"Queue: {queue.db_path}")
+    for status, n in counts.items():
+        print(f"  {status:8s} {n:6d}")
+    print(f"  {'total':8s} {total:6d}")
+    failed = queue.cells(status='failed')
+    for _, row in failed.head(5).iterrows():
+        print(f"\n  [FAILED] {row['cell_id']} after {row['attempts']} attempts:\n{row['error']}")
+
+
+def cmd_reduce(args):
+    queue = WorkQueue(args.queue_dir, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    if not queue.is_finished():
+        print(f"  [WARNING] Queue not finished: {queue.counts()}")
+    comparison_df = reduce_results(queue, top_k_list=config.STABILITY_CONFIG['top_k_features'],
+                                   group_one_hot=config.STABILITY_CONFIG.get('group_one_hot', False))
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    comparison_df.to_csv(args.output, index=False)
+    print(comparison_df.to_string(index=False))
+    print(f"\n  [OK] Saved {args.output}")
+
+
+def cmd_local(args):
+    cmd_init(args)
+    queue = WorkQueue(args.queue_dir, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    print(f"  Starting {args.workers} local workers (datasets in shared memory)...")
+    start = time.time()
+    completed = run_local_workers(queue, args.workers, args.datasets, precision=precision_for(config))
+    print(f"  [OK] Workers finished {sum(completed)} cells in {time.time() - start:.1f}s")
+    cmd_status(args)
+    cmd_reduce(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed experiment grid")
+    parser.add_argument('command', choices=['init', 'worker', 'status', 'reduce', 'local'])
+    parser.add_argument('--queue-dir', default='results/queue', help='Shared queue directory')
+    parser.add_argument('--lease-seconds', type=float, default=300)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    # Grid definition (init / local)
+    parser.add_argument('--datasets', nargs='+', default=['adult'])
+    parser.add_argument('--rates', nargs='+', type=float, default=config.SUBSAMPLE_RATES)
+    parser.add_argument('--replicates', type=int, default=1)
+    parser.add_argument('--models', nargs='+', default=['xgboost', 'random_forest', 'logistic_regression'])
+    parser.add_argument('--n-seeds', type=int, default=len(config.RANDOM_SEEDS))
+    parser.add_argument('--n-samples', type=int, default=config.STABILITY_CONFIG['n_test_samples'])
+    # Worker options
+    parser.add_argument('--worker-id', default=None, help='Default: host:pid')
+    parser.add_argument('--max-cells', type=int, default=None)
+    parser.add_argument('--wait', action='store_true', help='Keep polling after all cells are done or failed')
+    parser.add_argument('--poll-seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=2, help='Local workers (local command)')
+    parser.add_argument('--output', default='results/tables/queue_stability.csv')
+    args = parser.parse_args()
+
+    {'init': cmd_init, 'worker': cmd_worker, 'status': cmd_status,
+     'reduce': cmd_reduce, 'local': cmd_local}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Background-set summarisation for model-agnostic explainers
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+KernelSHAP evaluates the model once per background row for every coalition,
+so its cost grows linearly with the background size. Instead of drawing a
+fresh random 100-row background on every call, a weighted summary of the
+training set is built once per (dataset, subsample, size) and shared by all
+models and seeds:
+
+- 'kmeans': k-means centroids, weighted by cluster size
+- 'medoids': per-class k-means, represented by the closest real training row
+  (stratified by the target, so class balance is preserved)
+- 'random': uniform random rows with equal weights (previous behaviour)
+
+Interventional TreeSHAP explains tree models against the same summaries;
+interventional_size_sweep measures how its cost scales with the size.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+BACKGROUND_METHODS = ['random', 'kmeans', 'medoids']
+
+
+def _as_frame(X):
+    return X if isinstance(X, pd.DataFrame) else pd.DataFrame(np.asarray(X))
+
+
+def _round_to_observed(centroids, X):
+    """Snap every centroid coordinate to the nearest value observed in X's column"""
+    rounded = np.empty_like(centroids)
+    for j in range(X.shape[1]):
+        values = np.unique(X[:, j])
+        pos = np.clip(np.searchsorted(values, centroids[:, j]), 1, max(len(values) - 1, 1))
+        lower, upper = values[pos - 1], values[np.minimum(pos, len(values) - 1)]
+        rounded[:, j] = np.where(np.abs(centroids[:, j] - lower) <= np.abs(upper - centroids[:, j]),
+                                 lower, upper)
+    return rounded
+
+
+def kmeans_summary(X, size=100, random_state=0, round_values=True):
+    """
+    Summarise X by k-means centroids weighted by cluster size
+
+    Args:
+        X: Training features
+        size: Number of centroids
+        random_state: Seed for k-means
+        round_values: Snap centroid coordinates to observed values, so
+                      encoded categorical features stay valid
+
+    Returns:
+        Summary dictionary {'data', 'weights', 'method', 'size'}
+    """
+    from sklearn.cluster import KMeans
+
+    X = _as_frame(X)
+    values = X.values.astype(np.float64)
+    size = min(size, len(values))
+    kmeans = KMeans(n_clusters=size, random_state=random_state, n_init=1).fit(values)
+    centroids = kmeans.cluster_centers_
+    if round_values:
+        centroids = _round_to_observed(centroids, values)
+    weights = np.bincount(kmeans.labels_, minlength=size).astype(np.float64)
+    keep = weights > 0
+    return {
+        'data': pd.DataFrame(centroids[keep], columns=X.columns),
+        'weights': weights[keep] / weights.sum(),
+        'method': 'kmeans',
+        'size': int(keep.sum())
+    }
+
+
+def stratified_medoids(X, y=None, size=100, random_state=0):
+    """
+    Summarise X by real rows closest to per-class k-means centroids
+
+    Each class receives a share of the rows proportional to its frequency
+    (at least one); the weight of a medoid is the fraction of training rows
+    in its cluster.
+
+    Args:
+        X: Training features
+        y: Targets to stratify by (None or continuous: no stratification)
+        size: Number of medoids
+        random_state: Seed for k-means
+
+    Returns:
+        Summary dictionary {'data', 'weights', 'method', 'size'}
+    """
+    from sklearn.cluster import KMeans
+
+    X = _as_frame(X)
+    values = X.values.astype(np.float64)
+    n = len(values)
+    if y is None or len(np.unique(y)) > 20:
+        strata = np.zeros(n, dtype=int)
+    else:
+        strata = pd.factorize(np.asarray(y))[0]
+
+    labels, counts = np.unique(strata, return_counts=True)
+    shares = np.maximum(np.round(counts / n * min(size, n)).astype(int), 1)
+    rows, weights = [], []
+    for label, count, share in zip(labels, counts, shares):
+        members = np.flatnonzero(strata == label)
+        share = min(share, count)
+        kmeans = KMeans(n_clusters=share, random_state=random_state, n_init=1).fit(values[members])
+        # Closest member to each centroid
+        distances = kmeans.transform(values[members])
+        medoids = members[np.argmin(distances, axis=0)]
+        rows.append(medoids)
+        weights.append(np.bincount(kmeans.labels_, minlength=share))
+    rows = np.concatenate(rows)
+    weights = np.concatenate(weights).astype(np.float64)
+    return {
+        'data': X.iloc[rows].reset_index(drop=True),
+        'weights': weights / weights.sum(),
+        'method': 'medoids',
+        'size': len(rows)
+    }
+
+
+def random_background(X, size=100, random_state=0):
+    """Uniform random rows with equal weights"""
+    X = _as_frame(X)
+    rng = np.random.RandomState(random_state)
+    rows = rng.choice(len(X), size=min(size, len(X)), replace=False)
+    return {
+        'data': X.iloc[rows].reset_index(drop=True),
+        'weights': np.full(len(rows), 1.0 / len(rows)),
+        'method': 'random',
+        'size': len(rows)
+    }
+
+
+def summarize_background(X, y=None, method='kmeans', size=100, random_state=0):
+    """
+    Build a weighted background summary
+
+    Args:
+        X: Training features
+        y: Training targets (used by 'medoids' for stratification)
+        method: 'kmeans', 'medoids' or 'random'
+        size: Number of background rows
+        random_state: Seed
+
+    Returns:
+        Summary dictionary {'data', 'weights', 'method', 'size'}
+    """
+    if method == 'kmeans':
+        return kmeans_summary(X, size=size, random_state=random_state)
+    elif method == 'medoids':
+        return stratified_medoids(X, y, size=size, random_state=random_state)
+    elif method == 'random':
+        return random_background(X, size=size, random_state=random_state)
+    else:
+        raise ValueError(f"Unknown background method: {method}")
+
+
+def background_size_sweep(model, X_train, y_train, X_explain, sizes=(10, 25, 50, 100, 200),
+                          methods=('random', 'kmeans', 'medoids'), reference_size=500,
+                          nsamples_shap=200, random_state=0):
+    """
+    Accuracy/latency trade-off of the background size
+
+    SHAP values for every (method, size) are compared with a reference
+    computed on a large random background.
+
+    Args:
+        model: Trained model-agnostic model (predict_proba or predict)
+        X_train, y_train: Training data to summarise
+        X_explain: Instances to explain
+        sizes: Background sizes to try
+        methods: Summarisation methods to try
+        reference_size: Random background rows for the reference values
+        nsamples_shap: KernelSHAP samples per instance
+        random_state: Seed for summaries and KernelSHAP
+
+    Returns:
+        DataFrame with method, size, build/explain seconds, RMSE against the
+        reference and mean Spearman correlation of the feature rankings
+    """
+    # Imported here so that building summaries does not load shap
+    from shap_analysis import compute_kernel_shap, select_positive_class
+    from stability_metrics import compute_feature_ranking, pairwise_rank_correlation
+
+    def explain(background):
+        start = time.perf_counter()
+        shap_values, _ = compute_kernel_shap(model, X_train, X_explain, n_samples=None,
+                                             nsamples_shap=nsamples_shap, random_state=random_state,
+                                             background=background)
+        return select_positive_class(np.asarray(shap_values)), time.perf_counter() - start
+
+    reference, _ = explain(random_background(X_train, size=reference_size, random_state=random_state))
+    reference_rankings = compute_feature_ranking(reference)
+
+    rows = []
+    for method in methods:
+        for size in sizes:
+            start = time.perf_counter()
+            background = summarize_background(X_train, y_train, method=method, size=size,
+                                              random_state=random_state)
+            build_seconds = time.perf_counter() - start
+            shap_values, explain_seconds = explain(background)
+            rankings = compute_feature_ranking(shap_values)
+            rows.append({
+                'method': method,
+                'size': background['size'],
+                'build_seconds': build_seconds,
+                'explain_seconds': explain_seconds,
+                'rmse': np.sqrt(np.mean((shap_values - reference) ** 2)),
+                'rank_correlation': pairwise_rank_correlation(rankings, reference_rankings).mean()
+            })
+    return pd.DataFrame(rows)
+
+
+def interventional_size_sweep(model, X_train, y_train, X_explain, sizes=(10, 25, 50, 100, 200, 500),
+                              methods=('random', 'kmeans'), reference_size=1000, random_state=0):
+    """
+    Cost and accuracy of interventional TreeSHAP against the background size
+
+    The background's tree paths are computed once per size ('paths_seconds')
+    and the instances explained against them ('explain_seconds'); rows with
+    the same path mask on a leaf are merged, so 'entries' (distinct
+    (leaf, mask) pairs) rather than the row count drives the explain time.
+    Values are compared with a reference on `reference_size` random rows.
+
+    Args:
+        model: Trained XGBoost or Random Forest model
+        X_train, y_train: Training data to summarise
+        X_explain: Instances to explain
+        sizes: Background sizes to try
+        methods: Summarisation methods to try
+        reference_size: Random background rows for the reference values
+        random_state: Seed for the summaries
+
+    Returns:
+        DataFrame with method, size, entries, paths/explain seconds,
+        microseconds per (instance, background row) pair, RMSE against the
+        reference and mean Spearman correlation of the feature rankings
+    """
+    from models import Ensemble
+    from stability_metrics import compute_feature_ranking, pairwise_rank_correlation
+
+    ensemble = Ensemble([model])
+    ensemble.leaf_paths()
+
+    def explain(background):
+        start = time.perf_counter()
+        paths = ensemble.background_paths(background['data'], background['weights'])
+        paths_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        shap_values = ensemble.interventional_contributions(X_explain, paths)[0]
+        return shap_values, len(paths['leaf']), paths_seconds, time.perf_counter() - start
+
+    reference = explain(random_background(X_train, size=reference_size, random_state=random_state))[0]
+    reference_rankings = compute_feature_ranking(reference)
+
+    rows = []
+    for method in methods:
+        for size in sizes:
+            background = summarize_background(X_train, y_train, method=method, size=size,
+                                              random_state=random_state)
+            shap_values, entries, paths_seconds, explain_seconds = explain(background)
+            rankings = compute_feature_ranking(shap_values)
+            rows.append({
+                'method': method,
+                'size': background['size'],
+                'entries': entries,
+                'paths_seconds': paths_seconds,
+                'explain_seconds': explain_seconds,
+                'us_per_pair': 1e6 * explain_seconds / (len(X_explain) * background['size']),
+                'rmse': np.sqrt(np.mean((shap_values - reference) ** 2)),
+                'rank_correlation': pairwise_rank_correlation(rankings, reference_rankings).mean()
+            })
+    return pd.DataFrame(rows)
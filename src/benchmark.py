@@ -0,0 +1,287 @@
+"""
+Offline micro-benchmarks of the analysis hot paths
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Each case times one function (ranking, correlation, variance, consistency,
+full stability metrics, path-dependent and interventional TreeSHAP,
+KernelSHAP, training, npz I/O) on fixed-seed inputs: in-memory arrays
+(the 'arrays' fixture) parametrised by runs,
+samples, features and classes, and slices of registered datasets, i.e. the
+local Adult data (data/raw/adult.csv; skipped when absent, nothing is
+downloaded) and the generated synthetic datasets. Results are appended to a
+JSON-lines history keyed by git commit, and compare_history() flags cases
+whose median time changed by more than a threshold between two commits.
+"""
+
+import json
+import os
+import platform
+import socket
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bookkeeping import git_commit
+
+
+DEFAULT_HISTORY = 'results/benchmarks/history.jsonl'
+
+# Parameter sets per suite
+SUITES = {
+    'quick': {
+        'metrics': [dict(runs=5, samples=100, features=23, classes=1)],
+        'shap': [dict(samples=200, features=23)],
+        'io': [dict(runs=5, samples=100, features=23)],
+        'datasets': ['adult', 'synthetic']
+    },
+    'full': {
+        'metrics': [dict(runs=10, samples=100, features=23, classes=1),
+                    dict(runs=10, samples=1000, features=100, classes=1),
+                    dict(runs=10, samples=10000, features=100, classes=2)],
+        'shap': [dict(samples=1000, features=23), dict(samples=5000, features=100)],
+        'io': [dict(runs=10, samples=1000, features=100), dict(runs=10, samples=10000, features=100)],
+        'datasets': ['adult', 'synthetic', 'synthetic_wide']
+    }
+}
+
+
+METRIC_CASES = ['ranking', 'correlation', 'variance', 'consistency', 'stability_metrics']
+SHAP_CASES = ['train_xgboost', 'train_random_forest', 'train_logistic_regression',
+              'tree_shap_xgboost', 'tree_shap_random_forest', 'tree_shap_interventional', 'kernel_shap']
+IO_CASES = ['npz_save', 'npz_load']
+
+
+def synthetic_shap(runs, samples, features, classes=1, random_state=0):
+    """Correlated SHAP tensors of several runs: shared signal plus per-run noise"""
+    rng = np.random.RandomState(random_state)
+    scale = np.linspace(1.0, 0.01, features)
+    shape = (samples, features) if classes == 1 else (samples, features, classes)
+    base = rng.normal(size=shape) * (scale if classes == 1 else scale[:, None])
+    return {seed: base + rng.normal(scale=0.05, size=shape) for seed in range(runs)}
+
+
+def synthetic_classification(samples, features, random_state=0):
+    """Standardised features and a logistic target with a few informative columns"""
+    rng = np.random.RandomState(random_state)
+    X = rng.normal(size=(samples, features))
+    weights = np.zeros(features)
+    weights[:max(features // 5, 1)] = rng.normal(size=max(features // 5, 1))
+    y = (X @ weights + rng.logistic(size=samples) > 0).astype(int)
+    columns = [f'f{j}' for j in range(features)]
+    return pd.DataFrame(X, columns=columns), pd.Series(y, name='target')
+
+
+_SPLITS = {}
+
+
+def dataset_fixture(dataset='adult', samples=1000):
+    """
+    Fixed-seed slice of a registered dataset
+
+    Returns:
+        (X_train, y_train, X_test), or None if the dataset would have to be
+        downloaded
+    """
+    from data_loader import DATASET_REGISTRY, load_dataset, prepare_data
+
+    entry = DATASET_REGISTRY[dataset]
+    if entry['version'] is None and not (entry['data_file'] and os.path.exists(entry['data_file'])):
+        return None
+    if dataset not in _SPLITS:
+        X, y = load_dataset(dataset)
+        _SPLITS[dataset] = prepare_data(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test, _ = _SPLITS[dataset]
+    return X_train.iloc[:samples], y_train.iloc[:samples], X_test.iloc[:samples]
+
+
+def time_call(func, repeats=5, warmup=1):
+    """Wall times (s) of repeated calls after warm-up runs"""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _metric_cases(params):
+    from stability_metrics import (
+        compute_feature_ranking, compute_ranking_correlation, compute_shap_variance,
+        compute_explanation_consistency, compute_stability_metrics
+    )
+    shap_dict = synthetic_shap(**params)
+    values = [v if v.ndim == 2 else v[:, :, -1] for v in shap_dict.values()]
+    rankings = [compute_feature_ranking(v) for v in values]
+    return {
+        'ranking': lambda: [compute_feature_ranking(v) for v in values],
+        'correlation': lambda: compute_ranking_correlation(rankings),
+        'variance': lambda: compute_shap_variance(values),
+        'consistency': lambda: compute_explanation_consistency(rankings, top_k=5),
+        'stability_metrics': lambda: compute_stability_metrics(shap_dict)
+    }
+
+
+def _shap_cases(params, X_train, y_train, X_test):
+    from models import train_xgboost, train_random_forest, train_logistic_regression
+    from shap_analysis import compute_tree_shap, compute_kernel_shap
+    from background import random_background
+
+    xgb = train_xgboost(X_train, y_train, random_state=0, n_estimators=50, n_jobs=1)
+    rf = train_random_forest(X_train, y_train, random_state=0, n_estimators=50, n_jobs=1)
+    lr = train_logistic_regression(X_train, y_train, random_state=0, n_jobs=1)
+    n_explain = min(params['samples'], len(X_test))
+    background = random_background(X_train, size=100, random_state=0)
+    return {
+        'train_xgboost': lambda: train_xgboost(X_train, y_train, random_state=0, n_estimators=50, n_jobs=1),
+        'train_random_forest': lambda: train_random_forest(X_train, y_train, random_state=0,
+                                                           n_estimators=50, n_jobs=1),
+        'train_logistic_regression': lambda: train_logistic_regression(X_train, y_train, random_state=0,
+                                                                       n_jobs=1),
+        'tree_shap_xgboost': lambda: compute_tree_shap(xgb, X_test, n_samples=n_explain, random_state=0),
+        'tree_shap_random_forest': lambda: compute_tree_shap(rf, X_test, n_samples=min(n_explain, 200),
+                                                             random_state=0),
+        'tree_shap_interventional': lambda: compute_tree_shap(xgb, X_test, n_samples=min(n_explain, 200),
+                                                              random_state=0, background=background),
+        'kernel_shap': lambda: compute_kernel_shap(lr, X_train, X_test, n_samples=10, nsamples_shap=100,
+                                                   random_state=0)
+    }
+
+
+def _io_cases(params, directory):
+    from shap_analysis import save_shap_values, load_shap_values
+    values = synthetic_shap(params['runs'], params['samples'], params['features'])
+    paths = [os.path.join(directory, f'seed_{seed}.npz') for seed in values]
+    for path, v in zip(paths, values.values()):
+        save_shap_values(v, path)
+    return {
+        'npz_save': lambda: [save_shap_values(v, p) for p, v in zip(paths, values.values())],
+        'npz_load': lambda: [load_shap_values(p) for p in paths]
+    }
+
+
+def run_suite(suite='quick', repeats=5, include=None, verbose=True):
+    """
+    Run every case of a suite
+
+    Args:
+        suite: 'quick' or 'full'
+        repeats: Timed repetitions per case
+        include: Case-name substrings to run (default: all)
+        verbose: Print one line per case
+
+    Returns:
+        List of result dictionaries {'case', 'fixture', 'params', 'times', 'median', 'min'}
+    """
+    spec = SUITES[suite]
+    tmp = tempfile.TemporaryDirectory()
+
+    def synthetic_shap_group(p):
+        X_train, y_train = synthetic_classification(p['samples'], p['features'])
+        X_test = synthetic_classification(p['samples'], p['features'], random_state=1)[0]
+        return _shap_cases(p, X_train, y_train, X_test)
+
+    def dataset_shap_group(dataset, p):
+        fixture = dataset_fixture(dataset, p['samples'])
+        return _shap_cases(p, *fixture) if fixture is not None else {}
+
+    # (fixture, params, case names, builder); builders run only if a case is selected
+    groups = []
+    for params in spec['metrics']:
+        groups.append(('arrays', params, METRIC_CASES, lambda p=params: _metric_cases(p)))
+    for params in spec['shap']:
+        groups.append(('arrays', params, SHAP_CASES, lambda p=params: synthetic_shap_group(p)))
+        for dataset in spec['datasets']:
+            groups.append((dataset, dict(samples=params['samples']), SHAP_CASES,
+                           lambda d=dataset, p=params: dataset_shap_group(d, p)))
+    for params in spec['io']:
+        groups.append(('arrays', params, IO_CASES, lambda p=params: _io_cases(p, tmp.name)))
+
+    results = []
+    try:
+        for fixture, params, names, build in groups:
+            if include and not any(pattern in name for pattern in include for name in names):
+                continue
+            cases = build()
+            if not cases and verbose:
+                print(f"  [SKIP] {fixture} data not available offline")
+            for case, func in cases.items():
+                if include and not any(pattern in case for pattern in include):
+                    continue
+                times = time_call(func, repeats=repeats)
+                result = {'case': case, 'fixture': fixture, 'params': params, 'times': times,
+                          'median': float(np.median(times)), 'min': float(np.min(times))}
+                results.append(result)
+                if verbose:
+                    print(f"  {case:<28}{fixture:<16}{_params_label(params):<50}"
+                          f"median {result['median'] * 1000:9.2f} ms")
+    finally:
+        tmp.cleanup()
+    return results
+
+
+def _params_label(params):
+    return ' '.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+
+def append_history(results, path=DEFAULT_HISTORY, suite='quick'):
+    """
+    Append results to the history file (one JSON line per case)
+
+    Returns:
+        Commit label the results were recorded under
+    """
+    commit, dirty = git_commit()
+    label = commit + ('-dirty' if dirty else '')
+    context = {
+        'commit': label, 'suite': suite, 'time': time.time(), 'host': socket.gethostname(),
+        'python': platform.python_version(), 'numpy': np.__version__
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(dict(context, **result)) + '\n')
+    return label
+
+
+def read_history(path=DEFAULT_HISTORY):
+    """History as a DataFrame with a 'key' column identifying case + fixture + params"""
+    records = []
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    frame = pd.DataFrame(records)
+    if not frame.empty:
+        frame['key'] = frame['case'] + ' [' + frame['fixture'] + ' ' + frame['params'].map(_params_label) + ']'
+    return frame
+
+
+def compare_history(history, base, head, threshold=0.10):
+    """
+    Compare the median times of two commits
+
+    Args:
+        history: Output of read_history
+        base, head: Commit labels (the latest record per case is used)
+        threshold: Relative change counted as a regression / improvement
+
+    Returns:
+        DataFrame per case: base and head median (ms), ratio and status
+        ('REGRESSION', 'improved', 'ok', 'new', 'removed')
+    """
+    def latest(commit):
+        rows = history[history['commit'] == commit].sort_values('time')
+        return rows.groupby('key').last()['median']
+
+    old, new = latest(base), latest(head)
+    table = pd.DataFrame({'Base (ms)': old * 1000, 'Head (ms)': new * 1000})
+    table['Ratio'] = table['Head (ms)'] / table['Base (ms)']
+    table['Status'] = np.select(
+        [table['Base (ms)'].isna(), table['Head (ms)'].isna(),
+         table['Ratio'] > 1 + threshold, table['Ratio'] < 1 - threshold],
+        ['new', 'removed', 'REGRESSION', 'improved'], default='ok'
+    )
+    return table.reset_index().rename(columns={'key': 'Case'})
@@ -0,0 +1,47 @@
+"""
+Helpers shared by the run bookkeeping modules
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Used by the work queue and the results store (SQLite transactions), by the
+benchmark history and the results store (git commit of a run), and by every
+run_* script for the one run id its progress log, instrument log and results
+store records share.
+"""
+
+import subprocess
+import time
+import uuid
+
+
+class Transaction:
+    """Context manager running the block in one IMMEDIATE SQLite transaction and closing the connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+def new_run_id():
+    """Run identifier: timestamp and random suffix, e.g. '20250101-120000-3fa2c1'"""
+    return time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+
+
+def git_commit():
+    """Current commit hash and whether the tree has uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, dirty
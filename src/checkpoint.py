@@ -0,0 +1,91 @@
+"""
+Append-only checkpoint journal for long experiment grids
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Every completed stage (e.g. one (rate, model, seed) cell) appends one JSON
+line to the journal and is fsync'ed before the next stage starts. The stage
+outputs themselves are written by the ArtifactStore with an atomic rename, so
+an entry in the journal always points at a complete artifact. A crashed or
+pre-empted run can then be resumed from exactly the last journalled stage.
+"""
+
+import json
+import os
+import socket
+import time
+
+
+class CheckpointJournal:
+    """JSON-lines journal of completed stages"""
+
+    def __init__(self, path='results/checkpoints/journal.jsonl'):
+        """
+        Args:
+            path: Journal file path
+        """
+        self.path = path
+
+    def append(self, entry):
+        """
+        Append one entry and flush it to disk
+
+        Args:
+            entry: JSON-serialisable dictionary
+        """
+        entry = dict(entry, time=time.time(), host=socket.gethostname(), pid=os.getpid())
+        line = (json.dumps(entry, default=str) + '\n').encode()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # A single write() of one line keeps concurrent appends from interleaving
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def entries(self):
+        """
+        Read all entries, ignoring a truncated last line left by a crash
+
+        Returns:
+            List of dictionaries
+        """
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def completed(self):
+        """
+        Returns:
+            Dictionary {stage key: entry} of completed stages
+        """
+        return {e['key']: e for e in self.entries() if e.get('event') == 'done'}
+
+    def planned(self):
+        """
+        Returns:
+            Stage names of the most recent plan entry (empty list if none)
+        """
+        plans = [e for e in self.entries() if e.get('event') == 'plan']
+        return plans[-1]['stages'] if plans else []
+
+    def reset(self):
+        """
+        Start a new journal; the previous one is kept as journal.<timestamp>.jsonl
+
+        Returns:
+            Path of the archived journal, or None if there was none
+        """
+        if not os.path.exists(self.path):
+            return None
+        root, ext = os.path.splitext(self.path)
+        archived = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        os.replace(self.path, archived)
+        return archived
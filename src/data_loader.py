@@ -3,15 +3,18 @@ Data loading and preprocessing utilities
 Student: Keisuke Nishioka (Matrikelnummer: 10081049)
 """
 
+import functools
+
 import pandas as pd
 import numpy as np
-from sklearn.datasets import fetch_california_housing
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from scipy import sparse
 import warnings
 warnings.filterwarnings('ignore')
 
+from instrument import instrumented
+
 
+@instrumented()
 def load_adult_income():
     """
     Load Adult Income dataset from UCI repository
@@ -20,6 +23,8 @@ def load_adult_income():
         X: Features (DataFrame)
         y: Target (Series)
     """
+    from sklearn.preprocessing import LabelEncoder
+    
     try:
         # Try to load from local file first
         df = pd.read_csv('data/raw/adult.csv')
@@ -43,12 +48,78 @@ def load_adult_income():
     X = df.drop('income', axis=1)
     y = df['income']
     
-    # Encode categorical features
-    X = pd.get_dummies(X, drop_first=True)
+    # Encode categorical features (the dummy -> source column map is kept in X.attrs)
+    X = one_hot_encode(X, drop_first=True)
     
     return X, y
 
 
+def one_hot_encode(X, drop_first=True):
+    """
+    One-hot encode categorical columns and record the feature groups
+    
+    Columns are identical to pd.get_dummies(X, drop_first=drop_first).
+    
+    Args:
+        X: Features with categorical (object/category) columns
+        drop_first: Drop the first level of every categorical column
+    
+    Returns:
+        Encoded features; X.attrs['feature_groups'] maps every source column
+        to its encoded columns ({column: [column]} for numeric columns)
+    """
+    encoded = pd.get_dummies(X, drop_first=drop_first)
+    categorical = X.select_dtypes(include=['object', 'category']).columns
+    groups = {}
+    for column in X.columns:
+        if column in categorical:
+            groups[column] = pd.get_dummies(X[[column]], drop_first=drop_first).columns.tolist()
+        else:
+            groups[column] = [column]
+    encoded.attrs['feature_groups'] = groups
+    return encoded
+
+
+def get_feature_groups(X):
+    """
+    Feature groups recorded during encoding (one group per column if none)
+    
+    Returns:
+        Dictionary {source column: [encoded columns]}
+    """
+    groups = X.attrs.get('feature_groups') if hasattr(X, 'attrs') else None
+    if groups is None:
+        groups = {column: [column] for column in X.columns}
+    return groups
+
+
+def feature_group_matrix(columns, feature_groups):
+    """
+    Sparse 0/1 matrix that sums encoded columns into their source groups
+    
+    Args:
+        columns: Encoded column names, in SHAP column order
+        feature_groups: Dictionary {source column: [encoded columns]}
+    
+    Returns:
+        (CSR matrix (n_columns, n_groups), group names)
+    """
+    index = {column: i for i, column in enumerate(columns)}
+    group_names, rows, cols = [], [], []
+    for group, members in feature_groups.items():
+        members = [index[m] for m in members if m in index]
+        if not members:
+            continue
+        rows.extend(members)
+        cols.extend([len(group_names)] * len(members))
+        group_names.append(group)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(columns), len(group_names))
+    )
+    return matrix, group_names
+
+
+@instrumented()
 def load_boston_housing():
     """
     Load California Housing dataset (alternative to Boston Housing)
@@ -57,12 +128,15 @@ def load_boston_housing():
         X: Features (DataFrame)
         y: Target (Series)
     """
+    from sklearn.datasets import fetch_california_housing
+    
     data = fetch_california_housing()
     X = pd.DataFrame(data.data, columns=data.feature_names)
     y = pd.Series(data.target, name='target')
     return X, y
 
 
+@instrumented()
 def load_wine_quality():
     """
     Load Wine Quality dataset from UCI repository
@@ -87,6 +161,7 @@ def load_wine_quality():
     return X, y
 
 
+@instrumented(seed='random_state')
 def prepare_data(X, y, test_size=0.2, random_state=42):
     """
     Prepare data for training: split and scale
@@ -100,6 +175,9 @@ def prepare_data(X, y, test_size=0.2, random_state=42):
     Returns:
         X_train, X_test, y_train, y_test, scaler
     """
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y if y.dtype == 'int' else None
     )
@@ -142,3 +220,73 @@ def subsample_data(X, y, rate=1.0, random_state=42):
     )
     
     return X.iloc[indices], y.iloc[indices]
+
+
+def register_dataset(name, loader, data_file=None, version=None, **info):
+    """
+    Make a dataset available to the pipeline stages and scripts by name
+
+    Args:
+        name: Dataset key (e.g. 'adult')
+        loader: Function without arguments returning (X, y)
+        data_file: Local file the loader reads; its size and modification
+                   time invalidate cached stages
+        version: String that invalidates cached stages when it changes
+                 (e.g. the spec hash of a synthetic dataset)
+        **info: Further fields kept in the registry entry
+    """
+    DATASET_REGISTRY[name] = dict(info, loader=loader, data_file=data_file, version=version)
+
+
+def register_synthetic(name, **options):
+    """
+    Register a synthetic dataset (see synthetic.synthetic_spec for options)
+
+    The data is streamed to data/synthetic/<name>/ on first load.
+    """
+    from synthetic import synthetic_spec, spec_hash
+
+    spec = synthetic_spec(**options)
+    directory = f'data/synthetic/{name}'
+    register_dataset(name, functools.partial(load_synthetic, directory, spec), version=spec_hash(spec),
+                     directory=directory, spec=spec)
+    return spec
+
+
+@instrumented()
+def load_synthetic(directory=None, spec=None):
+    """
+    Load a synthetic dataset (generated on first use)
+    
+    Returns:
+        X: Features (DataFrame, categorical columns one-hot encoded)
+        y: Target (Series)
+    """
+    from synthetic import load_synthetic as load
+    return load(directory, spec)
+
+
+def load_dataset(name):
+    """Load a registered dataset by name"""
+    return DATASET_REGISTRY[name]['loader']()
+
+
+def dataset_fingerprint(name):
+    """Cache-invalidation token of a registered dataset (None if it never changes)"""
+    from pipeline import file_fingerprint
+    entry = DATASET_REGISTRY[name]
+    parts = [file_fingerprint(entry['data_file']) if entry['data_file'] else None, entry['version']]
+    parts = [part for part in parts if part is not None]
+    return ':'.join(parts) if parts else None
+
+
+# Dataset key -> {'loader', 'data_file', 'version', ...}
+DATASET_REGISTRY = {}
+register_dataset('adult', load_adult_income, 'data/raw/adult.csv')
+register_dataset('boston', load_boston_housing)
+register_dataset('wine', load_wine_quality, 'data/raw/winequality-red.csv')
+# Load-testing presets; register_synthetic() adds others
+register_synthetic('synthetic')
+register_synthetic('synthetic_1m', rows=1_000_000, numeric=80, categorical=20, cardinality=12)
+register_synthetic('synthetic_wide', rows=20_000, numeric=1000, categorical=0, informative=0.05,
+                   block_size=20)
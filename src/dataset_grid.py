@@ -0,0 +1,250 @@
+"""
+Stability grid over several datasets with a shared core budget
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Every dataset runs in its own process with its own share of the cores:
+that many stages run concurrently and every stage is limited to one
+thread (model n_jobs and BLAS/OpenMP pools), so the datasets together use
+the budget without oversubscribing it. Each dataset compares the models of
+its task (see stages.TASK_MODELS), caches its stages in the shared artifact
+store (loading and preprocessing run once per dataset and are reused by
+later runs), and writes its comparison table to
+results/datasets/<dataset>/model_stability_comparison.csv. The rows of all
+tables are merged into one index, results/datasets/index.csv, which keeps
+the rows of datasets not part of the current run.
+"""
+
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+import pandas as pd
+
+from bookkeeping import new_run_id
+
+
+DATASET_DIR = 'results/datasets'
+DEFAULT_INDEX = os.path.join(DATASET_DIR, 'index.csv')
+
+
+def split_cores(datasets, cores):
+    """
+    Cores per dataset: equal shares, the remainder to the first datasets
+
+    With fewer cores than datasets every dataset gets one core and the
+    datasets queue for the available processes.
+
+    Returns:
+        Dictionary {dataset: cores}
+    """
+    cores = max(int(cores), 1)
+    if cores <= len(datasets):
+        return {dataset: 1 for dataset in datasets}
+    share, remainder = divmod(cores, len(datasets))
+    return {dataset: share + (i < remainder) for i, dataset in enumerate(datasets)}
+
+
+def build_dataset_graph(config, dataset, seeds, n_samples=None, n_jobs=1, kernel_seeds=5, results_db=None,
+                        results_run=None):
+    """
+    Stage graph of one dataset: data -> models x seeds -> comparison
+
+    Args:
+        config: Config module
+        dataset: Registered dataset key
+        seeds: Random seeds
+        n_samples: Explained test instances (default: STABILITY_CONFIG)
+        n_jobs: Threads per training stage
+        kernel_seeds: Seeds used for KernelSHAP models (slow)
+        results_db, results_run: Results store and run the metrics are recorded
+                                 under (optional)
+
+    Returns:
+        (graph, comparison stage name, split stage name)
+    """
+    from pipeline import StageGraph
+    from stages import (
+        add_data_stages, add_model_stages, add_comparison_stage, model_params, kernel_options,
+        background_spec, feature_groups_for, precision_for, dataset_task, add_results_store_stage, TASK_MODELS
+    )
+
+    graph = StageGraph()
+    split, explain_set = add_data_stages(
+        graph, dataset, test_size=0.2, random_state=42,
+        n_samples=n_samples or config.STABILITY_CONFIG['n_test_samples'],
+        precision=precision_for(config)
+    )
+    output_dir = os.path.join(DATASET_DIR, dataset)
+    model_types = TASK_MODELS[dataset_task(config, dataset)]
+    model_seeds = {model_type: seeds[:kernel_seeds] if model_type in ['logistic_regression', 'ridge'] else seeds
+                   for model_type in model_types}
+    metrics = [
+        add_model_stages(
+            graph, split, explain_set, model_type, model_seeds[model_type],
+            params=model_params(config, model_type),
+            nsamples_shap=config.SHAP_CONFIG['kernel_explainer']['nsamples'],
+            kernel_options=kernel_options(config), background=background_spec(config),
+            batch_size=config.SHAP_CONFIG.get('predict_batch_size'),
+            top_k_list=config.STABILITY_CONFIG['top_k_features'],
+            feature_groups=feature_groups_for(graph, config, dataset),
+            prefix=f'{dataset}/', shap_dir=os.path.join(output_dir, 'shap_values'),
+            labels={'dataset': dataset}, n_jobs=n_jobs
+        )
+        for model_type in model_types
+    ]
+    comparison = add_comparison_stage(
+        graph, metrics, model_types, prefix=f'{dataset}/',
+        save_path=os.path.join(output_dir, 'model_stability_comparison.csv')
+    )
+    add_results_store_stage(graph, split, metrics, model_types, model_seeds, dataset=dataset,
+                            prefix=f'{dataset}/', store_path=results_db, run_id=results_run,
+                            shap_dir=os.path.join(output_dir, 'shap_values'))
+    return graph, comparison, split
+
+
+def _thread_limit():
+    """Limit BLAS/OpenMP pools of this process to one thread (if threadpoolctl is installed)"""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return nullcontext()
+    return threadpool_limits(limits=1)
+
+
+def run_dataset(dataset, cores, seeds, config_name='config', n_samples=None, force=False,
+                progress_run=None, results_db=None, results_run=None):
+    """
+    Run the grid of one dataset (entry point of a worker process)
+
+    Args:
+        dataset: Registered dataset key
+        cores: Stages run concurrently (one thread each)
+        seeds: Random seeds
+        config_name: Config module name ('config' or 'config_cpu')
+        n_samples: Explained test instances
+        force: Ignore cached stage outputs
+        progress_run: Progress run id prefix (events go to '<prefix>/<dataset>')
+        results_db, results_run: Results store and run (optional)
+
+    Returns:
+        Dictionary {'dataset', 'status', 'seconds', 'cores', 'comparison',
+        'train_rows', 'features', 'table', 'error'}
+    """
+    from pipeline import StageRunner
+    from progress import ProgressLog
+
+    config = importlib.import_module(config_name)
+    start = time.perf_counter()
+    result = {'dataset': dataset, 'cores': cores, 'comparison': None, 'train_rows': None,
+              'features': None, 'table': os.path.join(DATASET_DIR, dataset, 'model_stability_comparison.csv'),
+              'error': None}
+    os.environ['OMP_NUM_THREADS'] = '1'
+    try:
+        with _thread_limit():
+            graph, comparison, split = build_dataset_graph(config, dataset, seeds, n_samples=n_samples,
+                                                           results_db=results_db, results_run=results_run)
+            progress = ProgressLog(run=f'{progress_run}/{dataset}' if progress_run else None)
+            runner = StageRunner(max_workers=cores, force=force, verbose=False, progress=progress)
+            targets = [comparison, split] + ([f'{dataset}/report/results_store'] if results_db else [])
+            outputs = runner.run(graph, targets=targets)
+        result.update(status='ok', comparison=outputs[comparison],
+                      train_rows=len(outputs[split]['X_train']), features=outputs[split]['X_train'].shape[1])
+    except Exception as e:
+        result.update(status='failed', error=f'{type(e).__name__}: {e}')
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_datasets(datasets, cores=None, seeds=None, config_name='config', n_samples=None, force=False,
+                 progress_run=None, results_db=None, verbose=True):
+    """
+    Run the grids of several datasets concurrently
+
+    Args:
+        datasets: Registered dataset keys
+        cores: Core budget shared by the datasets (default: all cores)
+        seeds: Random seeds (default: the config's RANDOM_SEEDS)
+        config_name, n_samples, force: See run_dataset
+        progress_run: Run id (default: new id); the datasets' progress events
+                      go to '<run id>/<dataset>' and the results store run
+                      has the same id
+        results_db: Results store; all datasets are recorded under one run
+        verbose: Print one line per finished dataset
+
+    Returns:
+        List of run_dataset results, in the order of `datasets`
+    """
+    config = importlib.import_module(config_name)
+    seeds = list(seeds or config.RANDOM_SEEDS)
+    cores = max(int(cores or os.cpu_count() or 1), 1)
+    shares = split_cores(datasets, cores)
+    progress_run = progress_run or new_run_id()
+    results_run = None
+    if results_db:
+        from results_store import ResultsStore
+        results_run = ResultsStore(results_db).start_run(config, 'run_multi_dataset', run_id=progress_run)
+    results = {}
+    # With fewer cores than datasets the surplus datasets queue for a process
+    with ProcessPoolExecutor(max_workers=min(len(datasets), cores)) as pool:
+        futures = {
+            pool.submit(run_dataset, dataset, shares[dataset], seeds, config_name, n_samples, force,
+                        progress_run, results_db, results_run): dataset
+            for dataset in datasets
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['dataset']] = result
+            if verbose:
+                if result['status'] == 'ok':
+                    print(f"  [OK] {result['dataset']}: {result['train_rows']} training rows, "
+                          f"{result['features']} features, {result['cores']} cores, {result['seconds']:.1f}s")
+                else:
+                    print(f"  [ERROR] {result['dataset']}: {result['error']}")
+    return [results[dataset] for dataset in datasets]
+
+
+def update_results_index(results, config=None, path=DEFAULT_INDEX):
+    """
+    Merge the comparison tables of finished datasets into the results index
+
+    Rows of the datasets in `results` are replaced; other datasets are kept.
+
+    Args:
+        results: Output of run_datasets
+        config: Config module (dataset names and tasks from config.DATASETS)
+        path: Index CSV
+
+    Returns:
+        The full index as a DataFrame
+    """
+    datasets_config = getattr(config, 'DATASETS', {}) if config is not None else {}
+    frames = []
+    for result in results:
+        if result['status'] != 'ok':
+            continue
+        table = result['comparison'].copy()
+        info = datasets_config.get(result['dataset'], {})
+        table.insert(0, 'Dataset', result['dataset'])
+        table.insert(1, 'Dataset Name', info.get('name', result['dataset']))
+        table.insert(2, 'Task', info.get('task'))
+        table['Train Rows'] = result['train_rows']
+        table['Features'] = result['features']
+        table['Cores'] = result['cores']
+        table['Seconds'] = round(result['seconds'], 1)
+        table['Table'] = result['table']
+        table['Updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        frames.append(table)
+
+    index = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+    if frames:
+        new = pd.concat(frames, ignore_index=True)
+        if not index.empty:
+            index = index[~index['Dataset'].isin(new['Dataset'])]
+        index = pd.concat([index, new], ignore_index=True).sort_values(['Dataset', 'Model'], kind='stable')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    index.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return index.reset_index(drop=True)
@@ -0,0 +1,292 @@
+"""
+Runtime instrumentation: wall time, CPU time, memory per call
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+measure() (context manager) and instrumented() (decorator) record, for every
+measured block:
+
+- wall time and the CPU time of the calling thread; with several worker
+  threads process CPU would also count the other stages running meanwhile.
+  Native threads started by the block (OpenMP in XGBoost, joblib) are not
+  included. Blocks that are outermost in their thread also record the
+  process CPU time ('process_cpu'), which does include native threads but
+  also includes every other thread of the process. With one worker,
+  process CPU > wall therefore means native threads were busy
+- peak resident set size of the process so far and the RSS growth (NaN
+  where /proc or the resource module is missing, e.g. on Windows)
+- peak traced Python allocations (only with trace_memory=True, which makes
+  allocations noticeably slower; with concurrent stages the peaks of
+  overlapping blocks are shared)
+
+together with labels such as the stage, model and seed, as one JSON line per
+block. Nothing is recorded until configure() is called (or the
+SHAP_INSTRUMENT_LOG environment variable is set, which also covers worker
+processes), so the decorated functions cost one dictionary lookup otherwise.
+
+Usage:
+    configure('results/logs/instrument.jsonl')
+    with measure('explain', model='xgboost', seed=42):
+        ...
+    print(summary_table(read_log('results/logs/instrument.jsonl')))
+"""
+
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from bookkeeping import new_run_id
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DEFAULT_LOG = 'results/logs/instrument.jsonl'
+LOG_ENV = 'SHAP_INSTRUMENT_LOG'
+TRACE_ENV = 'SHAP_INSTRUMENT_TRACE'
+RUN_ENV = 'SHAP_INSTRUMENT_RUN'
+
+_STATE = {'path': None, 'run': None, 'trace': False}
+_local = threading.local()
+
+
+def configure(path, run_id=None, trace_memory=False):
+    """
+    Start writing measurements to a JSON-lines log
+
+    Args:
+        path: Log file (appended to; None disables instrumentation)
+        run_id: Identifier shared by all records of this run (default: random)
+        trace_memory: Record peak traced allocations with tracemalloc
+
+    Returns:
+        The run id
+    """
+    if path is None:
+        _STATE.update(path=None, run=None, trace=False)
+        for name in [LOG_ENV, TRACE_ENV, RUN_ENV]:
+            os.environ.pop(name, None)
+        return None
+    run_id = run_id or new_run_id()
+    _STATE.update(path=path, run=run_id, trace=trace_memory)
+    # Inherited by worker processes
+    os.environ.update({LOG_ENV: path, RUN_ENV: run_id, TRACE_ENV: '1' if trace_memory else ''})
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return run_id
+
+
+def _from_environment():
+    if _STATE['path'] is None and os.environ.get(LOG_ENV):
+        configure(os.environ[LOG_ENV], os.environ.get(RUN_ENV), bool(os.environ.get(TRACE_ENV)))
+
+
+def enabled():
+    """Whether measurements are being recorded"""
+    _from_environment()
+    return _STATE['path'] is not None
+
+
+def _rss_mb():
+    """Current resident set size (MB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return float('nan')
+
+
+def _peak_rss_mb():
+    """Peak resident set size of the process (MB)"""
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _write(record):
+    path = _STATE['path']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # One write() per line keeps concurrent writers from interleaving
+        os.write(fd, (json.dumps(record, default=str) + '\n').encode())
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def measure(name, **labels):
+    """
+    Measure a block of code
+
+    Args:
+        name: Block name (e.g. 'train_xgboost', 'stage')
+        **labels: JSON-serialisable labels (stage, model, seed, ...)
+    """
+    if not enabled():
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    labels = dict(getattr(_local, 'labels', {}), **labels)
+    frame = {'name': name, 'traced_peak': 0}
+    tracing = _STATE['trace'] and tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        traced_start = tracemalloc.get_traced_memory()[0]
+    stack.append(frame)
+    rss_start = _rss_mb()
+    top_level = len(stack) == 1
+    process_start = time.process_time() if top_level else None
+    cpu_start, wall_start = time.thread_time(), time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        stack.pop()
+        record = {
+            'run': _STATE['run'], 'name': name, 'labels': labels, 'status': status,
+            'wall': wall, 'cpu': cpu,
+            'rss_mb': _rss_mb(), 'rss_growth_mb': _rss_mb() - rss_start, 'peak_rss_mb': _peak_rss_mb(),
+            'depth': len(stack), 'parent': stack[-1].get('name') if stack else None,
+            'start': time.time() - wall, 'pid': os.getpid(), 'thread': threading.get_ident()
+        }
+        if top_level:
+            record['process_cpu'] = time.process_time() - process_start
+        if tracing:
+            # reset_peak() by a nested block hides earlier peaks; carry them upwards
+            peak = max(tracemalloc.get_traced_memory()[1], frame['traced_peak'])
+            record['traced_peak_mb'] = (peak - traced_start) / 2 ** 20
+            if stack:
+                stack[-1]['traced_peak'] = max(stack[-1]['traced_peak'], peak)
+        _write(record)
+
+
+def instrumented(name=None, **label_args):
+    """
+    Decorator measuring every call of a function
+
+    Args:
+        name: Record name (default: function name)
+        **label_args: Labels taken from call arguments, {label: argument name},
+                      e.g. seed='random_state'
+
+    Example:
+        @instrumented(seed='random_state')
+        def train_xgboost(X_train, y_train, task='classification', random_state=42): ...
+    """
+    def decorator(func):
+        record_name = name or func.__name__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            labels = {}
+            if label_args:
+                bound = signature.bind_partial(*args, **kwargs)
+                bound.apply_defaults()
+                labels = {label: bound.arguments.get(arg) for label, arg in label_args.items()}
+            with measure(record_name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def labelled(**labels):
+    """Attach labels (e.g. stage, model, seed) to all measurements in this thread"""
+    previous = getattr(_local, 'labels', {})
+    _local.labels = dict(previous, **labels)
+    try:
+        yield
+    finally:
+        _local.labels = previous
+
+
+def read_log(path, run=None):
+    """
+    Read an instrumentation log
+
+    Args:
+        path: Log file
+        run: Run id to keep ('last' for the most recent run, None for all)
+
+    Returns:
+        DataFrame with one row per measurement; labels become columns
+    """
+    import pandas as pd
+
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            labels = record.pop('labels', {}) or {}
+            records.append(dict(record, **{f'label_{k}': v for k, v in labels.items()}))
+    frame = pd.DataFrame(records)
+    if frame.empty or run is None:
+        return frame
+    if run == 'last':
+        run = frame.loc[frame['start'].idxmax(), 'run']
+    return frame[frame['run'] == run].reset_index(drop=True)
+
+
+def summary_table(frame, by=('name',)):
+    """
+    Where the time went: totals per measured name (and optional labels)
+
+    Args:
+        frame: Output of read_log
+        by: Columns to group by, e.g. ('name', 'label_model')
+
+    Returns:
+        DataFrame sorted by total wall time, with the share of the run's
+        top-level wall time
+    """
+    import pandas as pd
+
+    if frame.empty:
+        return pd.DataFrame()
+    by = [column for column in by if column in frame.columns]
+    aggregations = {
+        'Calls': ('wall', 'size'), 'Wall (s)': ('wall', 'sum'), 'Mean Wall (s)': ('wall', 'mean'),
+        'Max Wall (s)': ('wall', 'max'), 'CPU (s)': ('cpu', 'sum'),
+        'Peak RSS (MB)': ('peak_rss_mb', 'max'), 'RSS Growth (MB)': ('rss_growth_mb', 'max')
+    }
+    if 'process_cpu' in frame.columns:
+        aggregations['Process CPU (s)'] = ('process_cpu', lambda v: v.sum(min_count=1))
+    if 'traced_peak_mb' in frame.columns:
+        aggregations['Traced Peak (MB)'] = ('traced_peak_mb', 'max')
+    table = frame.groupby(by, dropna=False).agg(**aggregations).reset_index()
+    table['CPU/Wall'] = table['CPU (s)'] / table['Wall (s)'].where(table['Wall (s)'] > 0)
+    top_level = frame.loc[frame['depth'] == 0, 'wall'].sum()
+    table['Share'] = table['Wall (s)'] / top_level if top_level > 0 else float('nan')
+    return table.sort_values('Wall (s)', ascending=False).reset_index(drop=True)
+
+
+def print_summary(path=DEFAULT_LOG, run='last', by=('name',)):
+    """Print the summary table of one run of a log"""
+    table = summary_table(read_log(path, run=run), by=by)
+    if table.empty:
+        print("  No measurements recorded")
+        return table
+    print(table.to_string(index=False, float_format=lambda v: f'{v:.3g}'))
+    return table
@@ -0,0 +1,263 @@
+"""
+Stability of pairwise SHAP interaction effects across seeds
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+The interaction tensor of one seed has n_samples x n_features^2 entries, so
+stacking it for all seeds (as compute_shap_variance does for main effects)
+does not fit in memory for realistic feature counts. Instead, the explain
+set is processed in instance chunks sized from a memory ceiling: for each
+chunk the interaction values of every seed are computed one seed at a time,
+reduced to the upper-triangle pairs, and folded into running per-pair
+statistics before the next chunk is computed:
+
+- per seed and pair: sum of |interaction| (pair importance) and of the
+  signed interaction
+- per pair: sum over instances of the variance across seeds
+- per instance: Spearman correlation and top-N overlap of the pair rankings
+  of every two seeds
+
+Only the top-N pairs (by mean importance across seeds) are kept in the
+result. A pair's interaction effect is phi_jk + phi_kj = 2 phi_jk (TreeSHAP
+splits it equally between the two off-diagonal entries).
+"""
+
+import numpy as np
+import pandas as pd
+
+from stability_metrics import (
+    compute_feature_ranking, pairwise_rank_correlation, compute_pairwise_correlations,
+    compute_explanation_consistency
+)
+
+
+# Safety factor on the estimated working set of one instance
+MEMORY_MARGIN = 1.5
+
+
+def _n_pairs(n_features):
+    return n_features * (n_features - 1) // 2
+
+
+def interaction_values(explainer, X):
+    """
+    Path-dependent SHAP interaction values of the positive class
+
+    Args:
+        explainer: shap.TreeExplainer of a tree model
+        X: Instances
+
+    Returns:
+        Array (n_samples, n_features, n_features)
+    """
+    values = explainer.shap_interaction_values(X)
+    if isinstance(values, list):
+        values = values[1]
+    values = np.asarray(values)
+    if values.ndim == 4:
+        values = values[..., 1] if values.shape[-1] > 1 else values[..., 0]
+    return values
+
+
+def memory_per_instance(n_features, n_seeds, n_groups=None):
+    """
+    Estimated bytes held per explained instance of a chunk
+
+    One seed's raw interaction output (both classes for forests, with the
+    bias row/column, held twice while shap converts it), and per seed the
+    pair values, their rankings and one temporary of the same size, plus
+    the temporaries of one seed pair's rank correlation.
+    """
+    n_pairs = _n_pairs(n_groups or n_features)
+    raw = 4 * (n_features + 1) ** 2 * 8
+    pairs = (3 * n_seeds + 4) * n_pairs * 8
+    return int(MEMORY_MARGIN * (raw + pairs))
+
+
+def interaction_chunk_size(n_features, n_seeds, memory_limit_mb=512, n_groups=None):
+    """
+    Instances per chunk that keep the working set under the memory ceiling
+
+    The running statistics (two arrays of n_seeds x n_pairs plus two per
+    pair) are reserved first.
+
+    Raises:
+        ValueError: If not even one instance fits
+
+    Returns:
+        Instances per chunk (>= 1)
+    """
+    n_pairs = _n_pairs(n_groups or n_features)
+    fixed = (2 * n_seeds + 2) * n_pairs * 8
+    available = memory_limit_mb * 2 ** 20 - fixed
+    per_instance = memory_per_instance(n_features, n_seeds, n_groups)
+    if available < per_instance:
+        needed = (fixed + per_instance) / 2 ** 20
+        raise ValueError(f"Memory ceiling of {memory_limit_mb} MB is too small for {n_features} features "
+                         f"and {n_seeds} seeds (at least {needed:.0f} MB)")
+    return int(available // per_instance)
+
+
+class InteractionStability:
+    """Running per-pair statistics of interaction values across seeds"""
+
+    def __init__(self, n_features, n_seeds, top_n=20):
+        """
+        Args:
+            n_features: Features (or feature groups) of the interaction matrices
+            n_seeds: Seeds compared
+            top_n: Pairs kept in the result and used for top-N consistency
+        """
+        self.n_features = n_features
+        self.n_seeds = n_seeds
+        self.n_seed_pairs = n_seeds * (n_seeds - 1) // 2
+        self.top_n = min(top_n, _n_pairs(n_features))
+        self.pair_index = np.triu_indices(n_features, k=1)
+        n_pairs = len(self.pair_index[0])
+        self.abs_sum = np.zeros((n_seeds, n_pairs))
+        self.signed_sum = np.zeros((n_seeds, n_pairs))
+        self.variance_sum = np.zeros(n_pairs)
+        self.instance_correlation_sum = 0.0
+        self.instance_consistency_sum = 0.0
+        self.n_samples = 0
+
+    def pairs(self, values):
+        """Interaction effect of every pair (..., n_pairs) from matrices (..., n_features, n_features)"""
+        return 2.0 * values[..., self.pair_index[0], self.pair_index[1]]
+
+    def add(self, pair_values):
+        """
+        Fold one instance chunk into the statistics
+
+        Args:
+            pair_values: Pair effects of every seed (n_seeds, chunk, n_pairs)
+        """
+        pair_values = np.asarray(pair_values, dtype=np.float64)
+        self.abs_sum += np.abs(pair_values).sum(axis=1)
+        self.signed_sum += pair_values.sum(axis=1)
+        self.variance_sum += pair_values.var(axis=0).sum(axis=0)
+        rankings = [compute_feature_ranking(v) for v in pair_values]
+        # One seed pair at a time: compute_pairwise_correlations would copy
+        # the rankings once per seed pair
+        for i, j in zip(*np.triu_indices(self.n_seeds, k=1)):
+            self.instance_correlation_sum += (pairwise_rank_correlation(rankings[i], rankings[j]).sum()
+                                              / self.n_seed_pairs)
+        self.instance_consistency_sum += compute_explanation_consistency(rankings, self.top_n)['per_sample'].sum()
+        self.n_samples += pair_values.shape[1]
+
+    def result(self, feature_names=None):
+        """
+        Summary of the pairs seen so far
+
+        Returns:
+            Dictionary with
+            'top_pairs': DataFrame of the top-N pairs (mean importance across
+                seeds, its std and coefficient of variation, mean signed
+                effect, mean per-instance variance across seeds, mean rank
+                and rank std across seeds, fraction of seeds ranking the pair
+                in their top N),
+            'ranking_correlation': mean Spearman correlation of the seeds'
+                global pair rankings,
+            'instance_ranking_correlation': the same per instance, averaged,
+            'top_n_consistency' / 'instance_top_n_consistency': fraction of
+                the top-N pairs shared by every seed (global / per instance),
+            'variance': mean per-instance variance across seeds over all pairs,
+            'n_runs', 'n_samples', 'n_features', 'n_pairs', 'top_n'
+        """
+        if self.n_samples == 0:
+            raise ValueError("No instances added")
+        names = list(feature_names) if feature_names is not None else [f'f{j}' for j in range(self.n_features)]
+        importance = self.abs_sum / self.n_samples  # (seeds, pairs)
+        mean_importance = importance.mean(axis=0)
+        std_importance = importance.std(axis=0)
+        # Global pair rankings per seed (1 = strongest interaction)
+        rankings = compute_feature_ranking(importance)
+        in_top_n = rankings <= self.top_n
+
+        top = np.argsort(-mean_importance, kind='stable')[:self.top_n]
+        a, b = self.pair_index[0][top], self.pair_index[1][top]
+        table = pd.DataFrame({
+            'feature_a': [names[j] for j in a],
+            'feature_b': [names[j] for j in b],
+            'importance_mean': mean_importance[top],
+            'importance_std': std_importance[top],
+            'importance_cv': std_importance[top] / np.maximum(mean_importance[top], 1e-300),
+            'effect_mean': self.signed_sum[:, top].mean(axis=0) / self.n_samples,
+            'instance_variance': self.variance_sum[top] / self.n_samples,
+            'rank_mean': rankings[:, top].mean(axis=0),
+            'rank_std': rankings[:, top].std(axis=0),
+            'top_n_fraction': in_top_n[:, top].mean(axis=0)
+        })
+
+        ranking_correlation = 1.0
+        if self.n_seeds > 1:
+            ranking_correlation = float(compute_pairwise_correlations(list(rankings[:, None, :])).mean())
+        return {
+            'top_pairs': table,
+            'ranking_correlation': ranking_correlation,
+            'instance_ranking_correlation': (self.instance_correlation_sum / self.n_samples
+                                             if self.n_seeds > 1 else 1.0),
+            'top_n_consistency': float(np.all(in_top_n, axis=0).sum() / self.top_n),
+            'instance_top_n_consistency': self.instance_consistency_sum / self.n_samples,
+            'variance': float(self.variance_sum.mean() / self.n_samples),
+            'n_runs': self.n_seeds,
+            'n_samples': self.n_samples,
+            'n_features': self.n_features,
+            'n_pairs': len(mean_importance),
+            'top_n': self.top_n
+        }
+
+
+def compute_interaction_stability(models, X, top_n=20, memory_limit_mb=512, feature_names=None,
+                                  group_matrix=None, group_names=None, verbose=False):
+    """
+    Stability of SHAP interaction effects across seeds within a memory ceiling
+
+    Args:
+        models: Dictionary {seed: fitted tree model} of one model type
+        X: Instances to explain
+        top_n: Pairs kept in the result (and for top-N consistency)
+        memory_limit_mb: Ceiling on the working set of the interaction values
+        feature_names: Column names (default: X's columns)
+        group_matrix: Optional sparse matrix from data_loader.feature_group_matrix;
+                      interactions are then summed per original feature pair
+        group_names: Names of the groups
+        verbose: Print one line per chunk
+
+    Returns:
+        InteractionStability.result() plus 'seeds', 'chunk_size' and
+        'memory_limit_mb'
+    """
+    import shap
+
+    seeds = sorted(models)
+    if feature_names is None:
+        feature_names = list(X.columns) if hasattr(X, 'columns') else None
+    n_features = X.shape[1]
+    groups = None
+    if group_matrix is not None:
+        groups = np.asarray(group_matrix.todense() if hasattr(group_matrix, 'todense') else group_matrix)
+        feature_names = group_names
+    n_output = groups.shape[1] if groups is not None else n_features
+
+    chunk_size = min(interaction_chunk_size(n_features, len(seeds), memory_limit_mb,
+                                            n_groups=n_output), len(X))
+    explainers = [shap.TreeExplainer(models[seed]) for seed in seeds]
+    stats = InteractionStability(n_output, len(seeds), top_n=top_n)
+    pair_values = np.empty((len(seeds), chunk_size, len(stats.pair_index[0])))
+
+    for start in range(0, len(X), chunk_size):
+        X_chunk = X.iloc[start:start + chunk_size] if hasattr(X, 'iloc') else X[start:start + chunk_size]
+        n = len(X_chunk)
+        for s, explainer in enumerate(explainers):
+            values = interaction_values(explainer, X_chunk)
+            if groups is not None:
+                values = groups.T @ values @ groups
+            pair_values[s, :n] = stats.pairs(values)
+            del values
+        stats.add(pair_values[:, :n])
+        if verbose:
+            print(f"  Interactions: {stats.n_samples}/{len(X)} instances")
+
+    result = stats.result(feature_names)
+    result.update(seeds=seeds, chunk_size=chunk_size, memory_limit_mb=memory_limit_mb)
+    return result
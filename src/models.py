@@ -4,13 +4,14 @@ Student: Keisuke Nishioka (Matrikelnummer: 10081049)
 """
 
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.linear_model import LogisticRegression, Ridge
-from xgboost import XGBClassifier, XGBRegressor
 import joblib
+import json
 import os
 
+from instrument import instrumented
 
+
+@instrumented(seed='random_state')
 def train_xgboost(X_train, y_train, task='classification', random_state=42, **kwargs):
     """
     Train XGBoost model
@@ -25,6 +26,8 @@ def train_xgboost(X_train, y_train, task='classification', random_state=42, **kw
     Returns:
         Trained model
     """
+    from xgboost import XGBClassifier, XGBRegressor
+    
     default_params = {
         'n_estimators': 100,
         'max_depth': 6,
@@ -44,6 +47,7 @@ def train_xgboost(X_train, y_train, task='classification', random_state=42, **kw
     return model
 
 
+@instrumented(seed='random_state')
 def train_random_forest(X_train, y_train, task='classification', random_state=42, **kwargs):
     """
     Train Random Forest model
@@ -58,6 +62,8 @@ def train_random_forest(X_train, y_train, task='classification', random_state=42
     Returns:
         Trained model
     """
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    
     default_params = {
         'n_estimators': 100,
         'max_depth': 10,
@@ -75,6 +81,7 @@ def train_random_forest(X_train, y_train, task='classification', random_state=42
     return model
 
 
+@instrumented(seed='random_state')
 def train_logistic_regression(X_train, y_train, random_state=42, **kwargs):
     """
     Train Logistic Regression model
@@ -88,6 +95,8 @@ def train_logistic_regression(X_train, y_train, random_state=42, **kwargs):
     Returns:
         Trained model
     """
+    from sklearn.linear_model import LogisticRegression
+    
     default_params = {
         'max_iter': 1000,
         'random_state': random_state,
@@ -100,6 +109,7 @@ def train_logistic_regression(X_train, y_train, random_state=42, **kwargs):
     return model
 
 
+@instrumented(seed='random_state')
 def train_ridge_regression(X_train, y_train, random_state=42, **kwargs):
     """
     Train Ridge Regression model (for regression tasks)
@@ -113,6 +123,8 @@ def train_ridge_regression(X_train, y_train, random_state=42, **kwargs):
     Returns:
         Trained model
     """
+    from sklearn.linear_model import Ridge
+    
     default_params = {
         'alpha': 1.0,
         'random_state': random_state
@@ -165,3 +177,546 @@ def load_model(filepath):
         Loaded model
     """
     return joblib.load(filepath)
+
+
+def _sigmoid(margin):
+    return 1.0 / (1.0 + np.exp(-margin))
+
+
+def _popcount(bits):
+    """Set bits per element of a uint64 array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).astype(np.int64)
+    as_bytes = bits.view(np.uint8).reshape(bits.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1).astype(np.int64)
+
+
+def _bits(values, width):
+    """Lowest `width` bits of uint64 values as a (values, width) 0/1 array"""
+    as_bytes = values.astype('<u8', copy=False).view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1, bitorder='little')[:, :width]
+
+
+def _coalition_weights(n):
+    """
+    Shapley weights W[s, t] = s! t! / (s + t + 1)! for s, t <= n
+
+    A leaf reached when the features in A take the instance's values and the
+    features in B the background row's values (|A| = a, |B| = b) contributes
+    value * W[a - 1, b] to every feature of A and -value * W[a, b - 1] to
+    every feature of B.
+    """
+    from math import factorial
+    return np.array([[factorial(s) * factorial(t) / factorial(s + t + 1) for t in range(n + 1)]
+                     for s in range(n + 1)])
+
+
+def _flatten_sklearn_tree(estimator, n_classes):
+    """
+    Node arrays of one fitted sklearn tree
+
+    Returns:
+        Dictionary of node arrays (local indices); leaves point to themselves
+    """
+    tree = estimator.tree_
+    n_nodes = tree.node_count
+    is_leaf = tree.children_left == -1
+    own = np.arange(n_nodes)
+    if n_classes:
+        # Positive-class fraction at every node (sklearn stores counts or fractions)
+        value = tree.value[:, 0, :]
+        value = value[:, -1] / value.sum(axis=1)
+    else:
+        value = tree.value[:, 0, 0]
+    missing_left = getattr(tree, 'missing_go_to_left', np.zeros(n_nodes, dtype=bool))
+    return {
+        'feature': np.where(is_leaf, -1, tree.feature),
+        'threshold': tree.threshold.astype(np.float64),
+        'left': np.where(is_leaf, own, tree.children_left),
+        'right': np.where(is_leaf, own, tree.children_right),
+        'missing_left': np.asarray(missing_left, dtype=bool),
+        'value': value.astype(np.float64),
+        'depth': int(tree.max_depth)
+    }
+
+
+def _flatten_xgboost(model):
+    """
+    Node arrays of all trees of a fitted XGBoost model
+
+    XGBoost splits on float32 x < split; the threshold is stored as the
+    largest float32 below the split so that all trees share x <= threshold.
+    Internal node values are cover-weighted means of their children, as in
+    XGBoost's approximate contributions.
+
+    Returns:
+        (list of node-array dictionaries, base margin)
+    """
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())
+    learner = config['learner']
+    if int(learner['learner_model_param'].get('num_class', '0')) > 1:
+        raise ValueError("Multi-class XGBoost models are not supported")
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    objective = learner['objective']['name']
+    base_margin = np.log(base_score / (1 - base_score)) if objective.startswith('binary:logistic') else base_score
+
+    feature_names = booster.feature_names or [f'f{i}' for i in range(booster.num_features())]
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+    df = booster.trees_to_dataframe()
+    trees = []
+    for _, nodes in df.groupby('Tree', sort=True):
+        nodes = nodes.reset_index(drop=True)
+        local = {node_id: i for i, node_id in enumerate(nodes['ID'])}
+        own = np.arange(len(nodes))
+        is_leaf = (nodes['Feature'] == 'Leaf').values
+        left = np.where(is_leaf, own, nodes['Yes'].map(local).fillna(-1).astype(int).values)
+        right = np.where(is_leaf, own, nodes['No'].map(local).fillna(-1).astype(int).values)
+        missing = nodes['Missing'].map(local).fillna(-1).astype(int).values
+        split = nodes['Split'].fillna(0).values.astype(np.float32)
+        cover = nodes['Cover'].values.astype(np.float64)
+        value = np.where(is_leaf, nodes['Gain'].values, 0.0).astype(np.float64)
+
+        # Bottom-up: children always have larger node ids than their parent
+        order = np.argsort(nodes['Node'].values)[::-1]
+        depth = np.zeros(len(nodes), dtype=int)
+        for i in order:
+            if not is_leaf[i]:
+                l, r = left[i], right[i]
+                value[i] = (cover[l] * value[l] + cover[r] * value[r]) / max(cover[l] + cover[r], 1e-300)
+                depth[i] = 1 + max(depth[l], depth[r])
+        trees.append({
+            'feature': np.where(is_leaf, -1, nodes['Feature'].map(feature_index).fillna(-1).astype(int).values),
+            'threshold': np.nextafter(split, np.float32(-np.inf)).astype(np.float64),
+            'left': left,
+            'right': right,
+            'missing_left': missing == left,
+            'value': value,
+            'depth': int(depth.max())
+        })
+    return trees, base_margin
+
+
+class Ensemble:
+    """
+    The models of all seeds of one model type, evaluated together
+
+    Linear models are stacked into one coefficient matrix; tree models are
+    merged into one flat node array covering every tree of every seed, which
+    is traversed for all (tree, instance) pairs at once. predict, margin and
+    contributions answer for all seeds in one vectorised call and return
+    tensors with the seed as the leading axis.
+    """
+
+    def __init__(self, models, seeds=None):
+        """
+        Args:
+            models: List of fitted models of one type, or dictionary {seed: model}
+            seeds: Seeds of the models (default: dictionary keys or 0..n-1)
+        """
+        if isinstance(models, dict):
+            seeds = list(models) if seeds is None else seeds
+            models = list(models.values())
+        self.models = list(models)
+        self.seeds = list(seeds) if seeds is not None else list(range(len(self.models)))
+        first = self.models[0]
+        self.classification = hasattr(first, 'predict_proba')
+
+        if hasattr(first, 'coef_'):
+            self.kind = 'linear'
+            self.coef = np.stack([np.ravel(m.coef_) for m in self.models])  # (seeds, features)
+            self.intercept = np.array([np.ravel(m.intercept_)[0] for m in self.models])
+            self.n_features = self.coef.shape[1]
+        elif hasattr(first, 'get_booster') or hasattr(first, 'estimators_'):
+            self.kind = 'xgboost' if hasattr(first, 'get_booster') else 'random_forest'
+            self._build_trees()
+        else:
+            raise ValueError(f"Unsupported model type: {type(first).__name__}")
+
+    def _build_trees(self):
+        """Merge the trees of all seeds into one flat node array"""
+        trees, tree_seed, base = [], [], []
+        for s, model in enumerate(self.models):
+            if self.kind == 'xgboost':
+                model_trees, base_margin = _flatten_xgboost(model)
+            else:
+                n_classes = len(model.classes_) if self.classification else 0
+                if n_classes > 2:
+                    raise ValueError("Multi-class forests are not supported")
+                model_trees = [_flatten_sklearn_tree(e, n_classes) for e in model.estimators_]
+                base_margin = 0.0
+            trees.extend(model_trees)
+            tree_seed.extend([s] * len(model_trees))
+            base.append(base_margin)
+
+        sizes = np.array([len(t['value']) for t in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        concat = lambda key: np.concatenate([t[key] for t in trees])
+        shift = np.repeat(offsets, sizes)
+        self.feature = concat('feature')
+        self.threshold = concat('threshold')
+        self.left = concat('left') + shift
+        self.right = concat('right') + shift
+        self.missing_left = concat('missing_left')
+        self.value = concat('value')
+        self.roots = offsets
+        self.depth = max(t['depth'] for t in trees)
+        self.tree_seed = np.array(tree_seed)
+        self.trees_per_seed = np.bincount(self.tree_seed, minlength=len(self.models))
+        self.base_margin = np.array(base, dtype=np.float64)
+        self.n_features = getattr(self.models[0], 'n_features_in_', int(self.feature.max()) + 1)
+        self._paths = None
+
+    def __len__(self):
+        return len(self.models)
+
+    def _as_array(self, X):
+        X = X.values if hasattr(X, 'values') else np.asarray(X)
+        return X.astype(np.float32) if self.kind != 'linear' else X.astype(np.float64)
+
+    def _traverse(self, X, contributions=False):
+        """
+        Route every instance through every tree
+
+        Returns:
+            (leaf node per (tree, instance), path contributions (seeds, n, features)
+            summed over trees, or None)
+        """
+        n = len(X)
+        rows = np.arange(n)[None, :]
+        nodes = np.repeat(self.roots[:, None], n, axis=1)
+        contrib = np.zeros(len(self) * n * self.n_features) if contributions else None
+        for _ in range(self.depth):
+            feature = self.feature[nodes]
+            internal = feature >= 0
+            x = X[rows, np.maximum(feature, 0)]
+            go_left = np.where(np.isnan(x), self.missing_left[nodes], x <= self.threshold[nodes])
+            children = np.where(go_left, self.left[nodes], self.right[nodes])
+            if contributions and internal.any():
+                t, i = np.nonzero(internal)
+                delta = self.value[children[t, i]] - self.value[nodes[t, i]]
+                index = (self.tree_seed[t] * n + i) * self.n_features + feature[t, i]
+                contrib += np.bincount(index, weights=delta, minlength=contrib.size)
+            nodes = children
+        if contributions:
+            contrib = contrib.reshape(len(self), n, self.n_features)
+        return nodes, contrib
+
+    def _reduce_trees(self, per_tree):
+        """Sum (XGBoost) or average (forest) per-tree values (trees, ...) per seed"""
+        starts = np.concatenate([[0], np.cumsum(self.trees_per_seed)[:-1]])
+        summed = np.add.reduceat(per_tree, starts, axis=0)
+        if self.kind == 'random_forest':
+            summed = summed / self.trees_per_seed.reshape((-1,) + (1,) * (summed.ndim - 1))
+        return summed
+
+    def _chunks(self, X, chunk_size):
+        X = self._as_array(X)
+        if self.kind == 'linear':
+            yield X
+            return
+        # Bound the (trees, instances) working arrays
+        chunk_size = chunk_size or max(1, 2_000_000 // len(self.roots))
+        for start in range(0, len(X), chunk_size):
+            yield X[start:start + chunk_size]
+
+    def margin(self, X, chunk_size=None):
+        """
+        Raw model output for every seed: log-odds for XGBoost and linear
+        classifiers, positive-class probability for forests, prediction for
+        regressors
+
+        Returns:
+            Array (seeds, instances)
+        """
+        out = []
+        for X_chunk in self._chunks(X, chunk_size):
+            if self.kind == 'linear':
+                out.append(X_chunk @ self.coef.T + self.intercept)
+                out[-1] = out[-1].T
+            else:
+                leaves, _ = self._traverse(X_chunk)
+                out.append(self._reduce_trees(self.value[leaves]) + self.base_margin[:, None])
+        return np.concatenate(out, axis=1)
+
+    def predict(self, X, chunk_size=None):
+        """
+        Positive-class probability (classification) or prediction (regression)
+
+        Returns:
+            Array (seeds, instances)
+        """
+        margin = self.margin(X, chunk_size)
+        if self.classification and self.kind != 'random_forest':
+            return _sigmoid(margin)
+        return margin
+
+    def contributions(self, X, reference=None, chunk_size=None):
+        """
+        Per-feature contributions to the margin for every seed
+
+        Linear models: exact SHAP values coef * (x - reference mean).
+        Tree models: path attributions (Saabas), i.e. the change in node
+        value along each instance's decision path, credited to the split
+        feature; this is what XGBoost's approximate contributions compute.
+        margin = contributions.sum(-1) + base_value(reference).
+
+        Args:
+            X: Instances
+            reference: Background data or mean vector (linear models;
+                       default: mean of X)
+
+        Returns:
+            Array (seeds, instances, features)
+        """
+        if self.kind == 'linear':
+            X = self._as_array(X)
+            mean = self._reference_mean(X, reference)
+            return self.coef[:, None, :] * (X - mean)[None, :, :]
+        out = []
+        for X_chunk in self._chunks(X, chunk_size):
+            _, contrib = self._traverse(X_chunk, contributions=True)
+            if self.kind == 'random_forest':
+                contrib /= self.trees_per_seed[:, None, None]
+            out.append(contrib)
+        return np.concatenate(out, axis=1)
+
+    def _reference_mean(self, X, reference):
+        if reference is None:
+            return X.mean(axis=0)
+        reference = self._as_array(reference)
+        return reference if reference.ndim == 1 else reference.mean(axis=0)
+
+    def base_value(self, X=None, reference=None):
+        """
+        Margin not attributed to any feature, per seed
+
+        Returns:
+            Array (seeds,)
+        """
+        if self.kind == 'linear':
+            if X is None and reference is None:
+                raise ValueError("The linear base value needs X or a reference")
+            mean = self._reference_mean(self._as_array(X) if X is not None else None, reference)
+            return self.coef @ mean + self.intercept
+        return self._reduce_trees(self.value[self.roots]) + self.base_margin
+
+    def leaf_paths(self):
+        """
+        Root-to-leaf paths of every tree, built once per ensemble
+
+        The distinct split features of a path are numbered 0..k-1 ('bit' per
+        path position, 'features' per number), so whether a row follows a
+        leaf's path on each of its features fits in one uint64 mask.
+
+        Returns:
+            Dictionary {'leaf', 'seed', 'value' (per-leaf contribution to the
+            seed's margin), 'nodes', 'left', 'bit' (leaves, depth; -1 / False
+            padded), 'features' (leaves, max distinct features; -1 padded),
+            'full' (mask with one bit per distinct feature)}
+        """
+        if self.kind == 'linear':
+            raise ValueError("Linear models have no tree paths")
+        if self._paths is not None:
+            return self._paths
+        depth = self.depth
+        frontier, tree = self.roots, np.arange(len(self.roots))
+        nodes = np.full((len(frontier), depth), -1)
+        left = np.zeros((len(frontier), depth), dtype=bool)
+        leaves = []
+        for level in range(depth + 1):
+            is_leaf = self.feature[frontier] < 0
+            leaves.append((frontier[is_leaf], tree[is_leaf], nodes[is_leaf], left[is_leaf]))
+            internal = ~is_leaf
+            if not internal.any():
+                break
+            parents, tree = frontier[internal], np.concatenate([tree[internal]] * 2)
+            nodes = np.concatenate([nodes[internal]] * 2)
+            left = np.concatenate([left[internal]] * 2)
+            nodes[:, level] = np.concatenate([parents, parents])
+            left[:, level] = np.repeat([True, False], len(parents))
+            frontier = np.concatenate([self.left[parents], self.right[parents]])
+        leaf, leaf_tree, nodes, left = (np.concatenate(parts) for parts in zip(*leaves))
+
+        # Number the distinct features of every path
+        valid = nodes >= 0
+        path_features = np.where(valid, self.feature[np.maximum(nodes, 0)], -1)
+        rows = np.arange(len(leaf))
+        bit = np.full(nodes.shape, -1)
+        n_bits = np.zeros(len(leaf), dtype=int)
+        features = np.full(nodes.shape, -1)
+        for d in range(depth):
+            seen = (path_features[:, :d] == path_features[:, d:d + 1]) & valid[:, :d]
+            repeated = seen.any(axis=1)
+            new = valid[:, d] & ~repeated
+            bit[:, d] = np.where(repeated, bit[rows, np.argmax(seen, axis=1) if d else 0], n_bits)
+            bit[~valid[:, d], d] = -1
+            features[rows[new], n_bits[new]] = path_features[new, d]
+            n_bits += new
+        width = max(int(n_bits.max()), 1)
+        if width > 64:
+            raise ValueError(f"Paths with {width} distinct features are not supported (at most 64)")
+        full = np.zeros(len(leaf), dtype=np.uint64)
+        for k in range(width):
+            full |= (k < n_bits).astype(np.uint64) << np.uint64(k)
+
+        seed = self.tree_seed[leaf_tree]
+        value = self.value[leaf]
+        if self.kind == 'random_forest':
+            value = value / self.trees_per_seed[seed]
+        self._paths = {'leaf': leaf, 'seed': seed, 'value': value, 'nodes': nodes, 'left': left,
+                       'bit': bit, 'features': features[:, :width], 'full': full}
+        return self._paths
+
+    def path_masks(self, X, chunk_size=None):
+        """
+        Which path features each row follows, per leaf
+
+        Bit k of mask[i, leaf] is set when row i goes the leaf's way at every
+        node splitting on the leaf's k-th distinct feature.
+
+        Returns:
+            uint64 array (rows, leaves)
+        """
+        paths = self.leaf_paths()
+        X = self._as_array(X)
+        n_leaves, depth = paths['nodes'].shape
+        chunk_size = chunk_size or max(1, 4_000_000 // n_leaves)
+        masks = np.empty((len(X), n_leaves), dtype=np.uint64)
+        for start in range(0, len(X), chunk_size):
+            X_chunk = X[start:start + chunk_size]
+            mismatch = np.zeros((len(X_chunk), n_leaves), dtype=np.uint64)
+            for d in range(depth):
+                valid = paths['nodes'][:, d] >= 0
+                node = np.maximum(paths['nodes'][:, d], 0)
+                x = X_chunk[:, np.maximum(self.feature[node], 0)]
+                go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+                off_path = (go_left != paths['left'][:, d]) & valid
+                mismatch |= off_path.astype(np.uint64) << np.maximum(paths['bit'][:, d], 0).astype(np.uint64)
+            masks[start:start + chunk_size] = paths['full'] & ~mismatch
+        return masks
+
+    def background_paths(self, background, weights=None):
+        """
+        Path masks of background rows, computed once and reused for every
+        batch of instances (and every seed of the ensemble)
+
+        A background row enters a leaf's Shapley values only through its mask
+        on that leaf, so rows with equal masks are merged per leaf and their
+        weights summed: the work per instance is bounded by the number of
+        distinct masks per leaf (at most 2^path features), not the number of
+        background rows.
+
+        Args:
+            background: Background rows (e.g. a background summary's 'data')
+            weights: Row weights (default: uniform)
+
+        Returns:
+            Dictionary {'leaf', 'masks', 'weights' (one entry per distinct
+            mask of a leaf, by leaf), 'rows', 'expected' (weighted mean
+            margin per seed)} for interventional_contributions
+        """
+        data = self._as_array(background)
+        weights = (np.full(len(data), 1.0 / len(data)) if weights is None
+                   else np.asarray(weights, dtype=np.float64) / np.sum(weights))
+        expected = self.margin(data) @ weights
+        if self.kind == 'linear':
+            return {'data': data, 'weights': weights, 'rows': len(data), 'expected': expected}
+
+        # Leaf-major, so every leaf's masks are sorted as one contiguous row
+        masks = np.ascontiguousarray(self.path_masks(data).T)
+        order = np.argsort(masks, axis=1)
+        masks = np.take_along_axis(masks, order, axis=1)
+        first = np.ones(masks.shape, dtype=bool)
+        first[:, 1:] = masks[:, 1:] != masks[:, :-1]
+        group = np.cumsum(first.ravel()) - 1
+        return {'leaf': np.repeat(np.arange(len(masks)), first.sum(axis=1)),
+                'masks': masks[first],
+                'weights': np.bincount(group, weights=weights[order].ravel()),
+                'rows': len(data), 'expected': expected}
+
+    def interventional_contributions(self, X, background, weights=None, chunk_size=None):
+        """
+        Interventional SHAP values of the margin for every seed
+
+        The background rows stand in for the absent features: for every
+        (instance, background row) pair the exact Shapley values of the
+        trees are found leaf by leaf from the two rows' path masks, and the
+        pairs are averaged with the background weights. Instances are
+        processed in batches against the precomputed background masks
+        (see background_paths).
+        margin = contributions.sum(-1) + background['expected'].
+
+        Linear models: coef * (x - weighted background mean).
+
+        Args:
+            X: Instances
+            background: Output of background_paths, or background rows
+            weights: Background row weights (when rows are given)
+            chunk_size: Instances per batch (default: bounded by the
+                        instances x background entries working arrays)
+
+        Returns:
+            Array (seeds, instances, features)
+        """
+        if not (isinstance(background, dict) and 'expected' in background):
+            background = self.background_paths(background, weights)
+        X = self._as_array(X)
+        if self.kind == 'linear':
+            mean = background['weights'] @ background['data']
+            return self.coef[:, None, :] * (X - mean)[None, :, :]
+
+        paths = self.leaf_paths()
+        shapley = _coalition_weights(paths['features'].shape[1])
+        n_entries = len(background['leaf'])
+        entry_chunk = min(n_entries, 2_000_000)
+        chunk_size = chunk_size or max(1, 2_000_000 // entry_chunk)
+        out = np.zeros((len(self), len(X), self.n_features))
+        for start in range(0, len(X), chunk_size):
+            X_masks = self.path_masks(X[start:start + chunk_size])
+            for e_start in range(0, n_entries, entry_chunk):
+                entries = slice(e_start, e_start + entry_chunk)
+                out[:, start:start + chunk_size] += self._pair_contributions(
+                    X_masks, background['leaf'][entries], background['masks'][entries],
+                    background['weights'][entries], paths, shapley
+                )
+        return out
+
+    def _pair_contributions(self, X_masks, leaves, Z_masks, Z_weights, paths, shapley):
+        """Weighted sum over background entries of the pairwise Shapley values (seeds, instances, features)"""
+        n = len(X_masks)
+        x = X_masks[:, leaves]
+        # A leaf counts when every path feature is followed by one of the rows;
+        # leaves reached by both rows cancel out
+        reached = ((x | Z_masks) == paths['full'][leaves]) & (x != Z_masks)
+        i, e = np.nonzero(reached)
+        x, z, leaf = x[i, e], Z_masks[e], leaves[e]
+        from_x, from_z = x & ~z, z & ~x
+        a, c = _popcount(from_x), _popcount(from_z)
+        value = paths['value'][leaf] * Z_weights[e]
+        gain = np.where(a > 0, value * shapley[np.maximum(a - 1, 0), c], 0.0)
+        loss = np.where(c > 0, -value * shapley[a, np.maximum(c - 1, 0)], 0.0)
+
+        # Credit every feature of A (gain) and of B (loss) of each reached leaf
+        width = paths['features'].shape[1]
+        coef = gain[:, None] * _bits(from_x, width) + loss[:, None] * _bits(from_z, width)
+        used = coef != 0
+        row = (paths['seed'][leaf] * n + i) * self.n_features
+        index = (row[:, None] + paths['features'][leaf])[used]
+        size = len(self) * n * self.n_features
+        out = np.bincount(index, weights=coef[used], minlength=size)
+        return out.reshape(len(self), n, self.n_features)
+
+
+def load_ensemble(filepaths, seeds=None):
+    """
+    Load saved models into an Ensemble
+
+    Args:
+        filepaths: Model file paths (one per seed)
+        seeds: Seeds of the models
+
+    Returns:
+        Ensemble
+    """
+    return Ensemble([load_model(path) for path in filepaths], seeds=seeds)
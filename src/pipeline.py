@@ -0,0 +1,321 @@
+"""
+Resumable stage-graph runner
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+A pipeline is a graph of stages (load -> split -> train(model, seed) ->
+explain -> metrics -> report). Every stage output is written to an artifact
+store under a key derived from the stage's function, its parameters and the
+keys of its inputs. A stage whose key already exists in the store is skipped,
+so a run that dies at seed 9 restarts at seed 9. Independent stages run
+concurrently in a thread pool.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import joblib
+
+from instrument import measure, labelled
+
+
+def _stable_repr(value):
+    """JSON-serialisable representation of stage parameters for hashing"""
+    return json.dumps(value, sort_keys=True, default=repr)
+
+
+def file_fingerprint(filepath):
+    """
+    Cheap fingerprint of an input file (size and modification time)
+
+    Args:
+        filepath: Path to file
+
+    Returns:
+        Fingerprint string, or 'missing' if the file does not exist
+    """
+    if not os.path.exists(filepath):
+        return 'missing'
+    stat = os.stat(filepath)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of stage outputs
+
+    Artifacts are pickled with joblib into ``root/<key[:2]>/<key>.pkl``.
+    Writes go to a temporary file that is renamed into place, so a crash never
+    leaves a truncated artifact behind.
+    """
+
+    def __init__(self, root='results/artifacts'):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        return joblib.load(self.path(key))
+
+    def save(self, key, value):
+        filepath = self.path(key)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                joblib.dump(value, f)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return filepath
+
+
+class Stage:
+    """A node in the stage graph"""
+
+    def __init__(self, name, func, deps=(), params=None, extra=None, cache=True, version=1,
+                 labels=None):
+        """
+        Args:
+            name: Unique stage name (e.g. 'train/xgboost/42')
+            func: Function called as func(*dep_outputs, **params, **extra)
+            deps: Names of upstream stages whose outputs are passed positionally
+            params: Keyword arguments that determine the output (hashed)
+            extra: Keyword arguments that do not change the output, such as
+                   export paths (not hashed)
+            cache: If False the stage always runs (reports and other sinks)
+            version: Bump to invalidate cached outputs after changing func
+            labels: Descriptive labels such as {'rate': 0.5, 'model': 'xgboost',
+                    'seed': 42} recorded in checkpoints (not hashed)
+        """
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params or {}
+        self.extra = extra or {}
+        self.cache = cache
+        self.version = version
+        self.labels = labels or {}
+        self.key = None
+
+
+class StageGraph:
+    """Directed acyclic graph of stages"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, func, deps=(), params=None, extra=None, cache=True, version=1,
+            labels=None):
+        """
+        Add a stage to the graph
+
+        Returns:
+            Stage name (for use as a dependency of later stages)
+        """
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage name: {name}")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = Stage(name, func, deps, params, extra, cache, version, labels)
+        return name
+
+    def topological_order(self):
+        """Stage names in dependency order (insertion order is already valid)"""
+        return list(self.stages)
+
+    def compute_keys(self):
+        """Derive each stage's artifact key from its function, params and inputs"""
+        for name in self.topological_order():
+            stage = self.stages[name]
+            payload = _stable_repr({
+                'func': f"{stage.func.__module__}.{stage.func.__qualname__}",
+                'version': stage.version,
+                'params': stage.params,
+                'deps': [self.stages[dep].key for dep in stage.deps]
+            })
+            stage.key = hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def upstream(self, targets):
+        """All stages needed to produce the given targets"""
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].deps)
+        return needed
+
+
+class StageRunner:
+    """Executes a StageGraph against an ArtifactStore"""
+
+    def __init__(self, store=None, max_workers=1, force=False, verbose=True, journal=None, resume=False,
+                 progress=None):
+        """
+        Args:
+            store: ArtifactStore (default: results/artifacts)
+            max_workers: Number of stages run concurrently
+            force: Recompute every stage even if its artifact exists
+            verbose: Print one line per stage
+            journal: CheckpointJournal (optional); every completed stage is
+                     appended to it
+            resume: Skip the stages the journal records as done even with
+                    `force`, so an interrupted forced run continues where it
+                    stopped (otherwise the journal does not decide what runs)
+            progress: progress.ProgressLog (optional); start, finish and
+                      failure of every stage are emitted to it
+        """
+        self.store = store or ArtifactStore()
+        self.max_workers = max_workers
+        self.force = force
+        self.verbose = verbose
+        self.journal = journal
+        self.resume = resume
+        self.progress = progress
+        self.timings = {}
+        self._journalled = set()
+
+    def _log(self, message):
+        if self.verbose:
+            print(f"  {message}")
+
+    def _is_done(self, stage):
+        if not stage.cache:
+            return False
+        if self.force and not (self.resume and stage.key in self._journalled):
+            return False
+        return self.store.exists(stage.key)
+
+    def run(self, graph, targets=None):
+        """
+        Run the graph
+
+        Args:
+            graph: StageGraph
+            targets: Stage names whose outputs are returned (default: all sinks)
+
+        Returns:
+            Dictionary {target name: output}
+        """
+        graph.compute_keys()
+        if self.journal is not None and self.resume:
+            self._journalled = set(self.journal.completed())
+        if targets is None:
+            has_dependents = {dep for stage in graph.stages.values() for dep in stage.deps}
+            targets = [name for name in graph.stages if name not in has_dependents]
+        needed = graph.upstream(targets)
+
+        # Walk back from the targets: a cached stage does not need its inputs
+        to_run = set()
+        stack = list(targets)
+        visited = set()
+        while stack:
+            name = stack.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            stage = graph.stages[name]
+            if not self._is_done(stage):
+                to_run.add(name)
+                stack.extend(stage.deps)
+
+        for name in graph.topological_order():
+            if name in needed and name not in to_run:
+                self._log(f"[skip] {name}")
+        if self.journal is not None:
+            self.journal.append({
+                'event': 'plan',
+                'stages': [name for name in graph.topological_order() if name in needed],
+                'to_run': len(to_run)
+            })
+        if self.progress is not None:
+            names = [name for name in graph.topological_order() if name in to_run]
+            self.progress.plan(names, {name: graph.stages[name].labels for name in names})
+
+        outputs = {}
+
+        def get_output(name):
+            if name not in outputs:
+                outputs[name] = self.store.load(graph.stages[name].key)
+            return outputs[name]
+
+        def execute(stage, args):
+            start = time.perf_counter()
+            with labelled(**dict(stage.labels, stage=stage.name)), measure('stage'):
+                result = stage.func(*args, **stage.params, **stage.extra)
+            elapsed = time.perf_counter() - start
+            if stage.cache:
+                self.store.save(stage.key, result)
+            return result, elapsed
+
+        pending = [name for name in graph.topological_order() if name in to_run]
+        running = {}
+        started = {}
+        finished = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [
+                    name for name in pending
+                    if all(dep in finished or dep not in to_run for dep in graph.stages[name].deps)
+                ]
+                for name in ready[:max(self.max_workers - len(running), 0)]:
+                    pending.remove(name)
+                    # Inputs are gathered in the main thread so workers never touch `outputs`
+                    stage = graph.stages[name]
+                    args = [get_output(dep) for dep in stage.deps]
+                    self._log(f"[run]  {name}")
+                    if self.progress is not None:
+                        self.progress.start(name, stage.labels)
+                    started[name] = time.perf_counter()
+                    running[executor.submit(execute, stage, args)] = name
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as error:
+                        self._log(f"[fail] {name}")
+                        if self.progress is not None:
+                            self.progress.fail(name, time.perf_counter() - started[name], error,
+                                               graph.stages[name].labels)
+                            self.progress.emit('end', status='failed')
+                        for other in running:
+                            other.cancel()
+                        raise
+                    outputs[name] = result
+                    finished.add(name)
+                    self.timings[name] = elapsed
+                    self._log(f"[done] {name} ({elapsed:.1f}s)")
+                    if self.progress is not None:
+                        self.progress.finish(name, elapsed, graph.stages[name].labels)
+                    if self.journal is not None and graph.stages[name].cache:
+                        self.journal.append({
+                            'event': 'done', 'stage': name, 'key': graph.stages[name].key,
+                            'labels': graph.stages[name].labels, 'elapsed': elapsed
+                        })
+                    self._release(graph, name, pending, targets, outputs)
+
+        if self.progress is not None:
+            self.progress.emit('end', status='ok')
+        return {name: get_output(name) for name in targets}
+
+    def _release(self, graph, name, pending, targets, outputs):
+        """Drop in-memory outputs of upstream stages nobody still needs"""
+        for dep in graph.stages[name].deps:
+            if dep in targets or not graph.stages[dep].cache:
+                continue
+            if not any(dep in graph.stages[other].deps for other in pending):
+                outputs.pop(dep, None)
@@ -0,0 +1,231 @@
+"""
+Time-budget planner for seeds, explain-set size and KernelSHAP effort
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Instead of hand-tuning a CPU copy of config.py, a short calibration measures
+on the current machine how long each model takes to train and how long one
+instance takes to explain. Given a wall-clock budget, the planner then picks
+the number of seeds, the explain-set size and the KernelSHAP sample count that
+minimise the expected error of the stability metrics, and emits a config
+object with the same attributes as config.py.
+"""
+
+import copy
+import time
+import types
+
+import numpy as np
+
+from models import get_task_type
+from shap_analysis import compute_tree_shap, compute_kernel_shap
+from stages import train_stage, TREE_MODELS, KERNEL_MODELS
+
+
+def _train(model_type, X_train, y_train, seed, params):
+    """Train through the pipeline's train stage (raises on unknown model types)"""
+    split = {'X_train': X_train, 'y_train': y_train, 'task': get_task_type(y_train)}
+    return train_stage(split, model_type, seed, params=params)
+
+
+def _timed(func, repeats=3):
+    """Best wall-clock time of `repeats` calls"""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _linear_fit(x, costs):
+    """Intercept and slope (both >= 0) of cost = a + b * x through two probes"""
+    slope = max((costs[1] - costs[0]) / (x[1] - x[0]), 0.0)
+    return max(costs[0] - slope * x[0], 0.0), slope
+
+
+def calibrate(X_train, y_train, X_test, model_types, base_config,
+              n_instances=4, nsamples_probe=(50, 150), instances_probe=(4, 32), train_fraction=0.25):
+    """
+    Measure per-model training and explanation cost
+
+    Every explainer is called once before timing, so the import of shap and
+    the first explainer construction do not count as per-instance cost.
+
+    Args:
+        X_train, y_train: Training data
+        X_test: Test features
+        model_types: Models to calibrate
+        base_config: Config module providing MODELS params
+        n_instances: Instances explained per KernelSHAP probe
+        nsamples_probe: Two KernelSHAP sample counts used to fit cost = a + b * nsamples
+        instances_probe: Two explain-set sizes used to fit the TreeSHAP cost
+                         of one call = call + per_instance * instances
+        train_fraction: Fraction of the training set used for the timing
+                        (cost is extrapolated linearly to the full set)
+
+    Returns:
+        Dictionary {model_type: {'train_seconds', 'explain_call', 'explain_fixed',
+        'explain_per_sample'}} where one explain call costs explain_call plus,
+        per instance, explain_fixed + explain_per_sample * nsamples
+        (explain_per_sample is 0 for TreeSHAP)
+    """
+    n_train = max(int(len(X_train) * train_fraction), 50)
+    rng = np.random.RandomState(0)
+    train_idx = rng.choice(len(X_train), size=min(n_train, len(X_train)), replace=False)
+    X_cal, y_cal = X_train.iloc[train_idx], y_train.iloc[train_idx]
+
+    calibration = {}
+    for model_type in model_types:
+        params = base_config.MODELS.get(model_type, {}).get('params', {})
+        start = time.perf_counter()
+        model = _train(model_type, X_cal, y_cal, seed=0, params=params)
+        train_seconds = (time.perf_counter() - start) * len(X_train) / len(X_cal)
+
+        if model_type in KERNEL_MODELS:
+            X_probe = X_test.iloc[:n_instances]
+
+            def explain(nsamples):
+                return compute_kernel_shap(model, X_cal, X_probe, n_samples=None,
+                                           nsamples_shap=nsamples, random_state=0)
+
+            explain(nsamples_probe[0])  # Warm-up
+            costs = [_timed(lambda: explain(nsamples), repeats=1) / len(X_probe) for nsamples in nsamples_probe]
+            call, (fixed, per_sample) = 0.0, _linear_fit(nsamples_probe, costs)
+        else:
+            compute_tree_shap(model, X_test.iloc[:1], n_samples=None)  # Warm-up
+            costs = [_timed(lambda: compute_tree_shap(model, X_test.iloc[:size], n_samples=None))
+                     for size in instances_probe]
+            (call, fixed), per_sample = _linear_fit(instances_probe, costs), 0.0
+
+        calibration[model_type] = {
+            'train_seconds': train_seconds,
+            'explain_call': call,
+            'explain_fixed': fixed,
+            'explain_per_sample': per_sample
+        }
+    return calibration
+
+
+def expected_error(n_seeds, n_samples, nsamples_shap, n_features, kernel):
+    """
+    Relative error proxy of the stability metrics
+
+    The metrics average over seed pairs and explained instances, so their
+    standard error shrinks roughly as 1/sqrt(seeds - 1) and 1/sqrt(instances).
+    KernelSHAP adds estimator noise that shrinks with nsamples relative to the
+    number of features.
+    """
+    error = 1.0 / (n_seeds - 1) + 1.0 / n_samples
+    if kernel:
+        error += n_features / nsamples_shap
+    return np.sqrt(error)
+
+
+def plan_run(calibration, budget_seconds, n_features, rates=(1.0,), min_seeds=3, max_seeds=20,
+             sample_options=(20, 30, 50, 75, 100, 150, 200, 300),
+             nsamples_options=(50, 100, 200, 400, 800), safety=0.8):
+    """
+    Choose seeds, explain-set size and KernelSHAP samples for a time budget
+
+    Args:
+        calibration: Output of calibrate()
+        budget_seconds: Wall-clock budget for the whole run
+        n_features: Number of features
+        rates: Subsample rates run in the grid (training cost scales with rate)
+        min_seeds, max_seeds: Range of seed counts
+        sample_options: Candidate explain-set sizes
+        nsamples_options: Candidate KernelSHAP sample counts
+        safety: Fraction of the budget to plan for
+
+    Returns:
+        Plan dictionary with n_seeds, n_test_samples, nsamples, predicted
+        seconds and expected error; None if even the smallest plan does not fit
+    """
+    has_kernel = any(m in KERNEL_MODELS for m in calibration)
+    rate_sum = float(sum(rates))
+    best = None
+    for n_seeds in range(min_seeds, max_seeds + 1):
+        for n_samples in sample_options:
+            for nsamples in (nsamples_options if has_kernel else nsamples_options[:1]):
+                seconds = 0.0
+                for model_type, cost in calibration.items():
+                    per_instance = cost['explain_fixed'] + cost['explain_per_sample'] * nsamples
+                    per_call = cost.get('explain_call', 0.0) + n_samples * per_instance
+                    seconds += n_seeds * (cost['train_seconds'] * rate_sum + len(rates) * per_call)
+                if seconds > budget_seconds * safety:
+                    continue
+                error = max(
+                    expected_error(n_seeds, n_samples, nsamples, n_features, m in KERNEL_MODELS)
+                    for m in calibration
+                )
+                if best is None or (error, seconds) < (best['expected_error'], best['predicted_seconds']):
+                    best = {
+                        'n_seeds': n_seeds, 'n_test_samples': n_samples, 'nsamples': nsamples,
+                        'predicted_seconds': seconds, 'expected_error': error,
+                        'budget_seconds': budget_seconds
+                    }
+    return best
+
+
+def extend_seeds(base_seeds, n_seeds):
+    """Base seeds, extended deterministically if more are needed"""
+    seeds = list(base_seeds[:n_seeds])
+    rng = np.random.RandomState(sum(base_seeds))
+    while len(seeds) < n_seeds:
+        seed = int(rng.randint(10000, 100000))
+        if seed not in seeds:
+            seeds.append(seed)
+    return seeds
+
+
+def make_config(plan, base_config):
+    """
+    Build a config object from a plan
+
+    Args:
+        plan: Output of plan_run()
+        base_config: Config module to copy (config or config_cpu)
+
+    Returns:
+        Namespace with the same attributes as base_config, where RANDOM_SEEDS,
+        N_SEEDS, STABILITY_CONFIG['n_test_samples'] and
+        SHAP_CONFIG['kernel_explainer']['nsamples'] follow the plan. The plan
+        itself is available as PLAN.
+    """
+    attrs = {k: copy.deepcopy(v) for k, v in vars(base_config).items()
+             if k.isupper()}
+    planned = types.SimpleNamespace(**attrs)
+    planned.RANDOM_SEEDS = extend_seeds(base_config.RANDOM_SEEDS, plan['n_seeds'])
+    planned.N_SEEDS = len(planned.RANDOM_SEEDS)
+    planned.STABILITY_CONFIG['n_test_samples'] = plan['n_test_samples']
+    planned.SHAP_CONFIG['kernel_explainer']['nsamples'] = plan['nsamples']
+    planned.PLAN = plan
+    return planned
+
+
+def plan_config(budget_seconds, X_train, y_train, X_test, model_types, base_config, rates=(1.0,)):
+    """
+    Calibrate on the current machine and return a config for the budget
+
+    Returns:
+        Config namespace (see make_config)
+    """
+    calibration = calibrate(X_train, y_train, X_test, model_types, base_config)
+    plan = plan_run(calibration, budget_seconds, n_features=X_train.shape[1], rates=rates)
+    if plan is None:
+        raise ValueError(f"Budget of {budget_seconds:.0f}s is too small for the minimal plan")
+    plan['calibration'] = calibration
+    return make_config(plan, base_config)
+
+
+def print_plan(planned):
+    """Print a planned config"""
+    plan = planned.PLAN
+    print(f"  Budget: {plan['budget_seconds']:.0f}s, predicted: {plan['predicted_seconds']:.0f}s")
+    print(f"  Seeds: {plan['n_seeds']}, explain set: {plan['n_test_samples']}, "
+          f"KernelSHAP nsamples: {plan['nsamples']}")
+    for model_type, cost in plan.get('calibration', {}).items():
+        print(f"    {model_type}: train {cost['train_seconds']:.2f}s, "
+              f"explain {cost.get('explain_call', 0.0) * 1000:.1f}ms per call + "
+              f"{cost['explain_fixed'] * 1000:.2f}ms + "
+              f"{cost['explain_per_sample'] * 1000:.3f}ms/sample per instance")
@@ -0,0 +1,88 @@
+"""
+Numeric precision setting
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+With PRECISION = 'float32' in the config, the scaled training matrices,
+explain sets, SHAP tensors and saved SHAP files are kept in float32, which
+halves memory traffic and disk usage. Reductions that lose accuracy in single
+precision (means and variances over seeds) accumulate in float64; rankings
+are integers and unaffected. metric_drift() quantifies the effect on the
+stability metrics against a float64 run.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+PRECISIONS = {'float32': np.float32, 'float64': np.float64}
+
+# Dtype used for reductions over seeds and samples
+ACCUMULATE_DTYPE = np.float64
+
+
+def resolve_dtype(precision='float64'):
+    """
+    Args:
+        precision: 'float32', 'float64' or a numpy float dtype
+
+    Returns:
+        numpy dtype
+    """
+    if isinstance(precision, str):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision} (use one of {list(PRECISIONS)})")
+        return np.dtype(PRECISIONS[precision])
+    return np.dtype(precision)
+
+
+def cast_features(X, precision='float64'):
+    """
+    Cast a feature matrix (DataFrame or array) to the working precision
+
+    Returns:
+        X in the working dtype (same type, index and columns)
+    """
+    dtype = resolve_dtype(precision)
+    if isinstance(X, pd.DataFrame):
+        if all(d == dtype for d in X.dtypes):
+            return X
+        return X.astype(dtype)
+    return np.asarray(X, dtype=dtype)
+
+
+def working_dtype(X):
+    """Float dtype of a feature matrix (float64 for non-float data)"""
+    values = X.values if isinstance(X, pd.DataFrame) else np.asarray(X)
+    return values.dtype if np.issubdtype(values.dtype, np.floating) else np.dtype(np.float64)
+
+
+def metric_drift(metrics_64, metrics_32):
+    """
+    Difference of stability metrics between a float64 and a float32 run
+
+    Args:
+        metrics_64, metrics_32: Dictionaries {model_name: compute_stability_metrics output}
+
+    Returns:
+        DataFrame with one row per (model, metric): both values, the absolute
+        and relative difference
+    """
+    rows = []
+    for model_name, m64 in metrics_64.items():
+        m32 = metrics_32[model_name]
+        values = {
+            'Ranking Correlation': (m64['ranking_correlation']['mean'], m32['ranking_correlation']['mean']),
+            'SHAP Variance': (m64['variance']['overall'], m32['variance']['overall'])
+        }
+        for key in m64['consistency']:
+            values[f"{key.replace('top_', 'Top-')} Consistency"] = (
+                m64['consistency'][key]['overall'], m32['consistency'][key]['overall']
+            )
+        for metric, (v64, v32) in values.items():
+            rows.append({
+                'Model': model_name, 'Metric': metric,
+                'float64': float(v64), 'float32': float(v32),
+                'Absolute Drift': abs(float(v32) - float(v64)),
+                'Relative Drift': abs(float(v32) - float(v64)) / max(abs(float(v64)), 1e-300)
+            })
+    return pd.DataFrame(rows)
@@ -0,0 +1,282 @@
+"""
+Progress events and a monitor for running grids
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Runners append one JSON line per event to a local log (default
+results/logs/progress.jsonl):
+
+- 'plan': number of stages/cells about to run, per kind
+- 'start', 'finish', 'fail': one stage or cell, with its kind, labels,
+  worker (host, pid) and, for finish/fail, the elapsed time
+- 'end': the runner returned
+
+Appends are a single unbuffered write() without fsync, so emitting costs a
+few microseconds and can be done for every seed. ProgressMonitor tails the
+log incrementally (only new bytes are read on each poll) and derives, per
+run and stage kind, throughput, ETA, failures and stragglers. Because every
+event carries host and pid, a cell whose worker process no longer exists is
+reported as dead instead of running (POSIX only: on Windows os.kill cannot
+probe a process, it would send CTRL_C_EVENT to the worker).
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+from bookkeeping import new_run_id
+
+
+DEFAULT_LOG = 'results/logs/progress.jsonl'
+
+
+def stage_kind(name, labels=None):
+    """Kind of a stage or cell: its 'stage' label, else the last name component"""
+    labels = labels or {}
+    return labels.get('stage') or name.rsplit('/', 1)[-1]
+
+
+class ProgressLog:
+    """Append-only writer of progress events"""
+
+    def __init__(self, path=DEFAULT_LOG, run=None):
+        """
+        Args:
+            path: Event log file
+            run: Run identifier shared by all events (default: new id per log
+                 object; workers of one work queue pass the queue's id)
+        """
+        self.path = path
+        self.run = run or new_run_id()
+        self.host = socket.gethostname()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def emit(self, event, **fields):
+        """
+        Append one event
+
+        Args:
+            event: 'plan', 'start', 'finish', 'fail' or 'end'
+            **fields: JSON-serialisable fields (name, kind, labels, elapsed, ...)
+        """
+        record = dict(fields, event=event, run=self.run, time=time.time(), host=self.host,
+                      pid=os.getpid(), thread=threading.get_ident())
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (json.dumps(record, default=str) + '\n').encode())
+        finally:
+            os.close(fd)
+
+    def plan(self, names, labels=None):
+        """Announce stages about to run: {kind: count} derived from names/labels"""
+        labels = labels or {}
+        kinds = {}
+        for name in names:
+            kind = stage_kind(name, labels.get(name))
+            kinds[kind] = kinds.get(kind, 0) + 1
+        self.emit('plan', total=len(names), kinds=kinds)
+
+    def plan_kinds(self, kinds):
+        """Announce work as {kind: count} directly"""
+        self.emit('plan', total=sum(kinds.values()), kinds=dict(kinds))
+
+    def start(self, name, labels=None, kind=None):
+        self.emit('start', name=name, kind=kind or stage_kind(name, labels), labels=labels or {})
+
+    def finish(self, name, elapsed, labels=None, kind=None):
+        self.emit('finish', name=name, kind=kind or stage_kind(name, labels), labels=labels or {},
+                  elapsed=elapsed)
+
+    def fail(self, name, elapsed, error=None, labels=None, kind=None):
+        self.emit('fail', name=name, kind=kind or stage_kind(name, labels), labels=labels or {},
+                  elapsed=elapsed, error=str(error)[-500:] if error is not None else None)
+
+
+def _pid_alive(pid):
+    """Whether a local process exists (always True on Windows, where signal 0 is not a probe)"""
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _RunState:
+    def __init__(self):
+        self.planned = {}
+        self.done = {}
+        self.failed = {}
+        self.running = {}
+        self.finish_times = []
+        self.first = None
+        self.last = None
+        self.ended = False
+
+
+class ProgressMonitor:
+    """Incremental reader of a progress log"""
+
+    def __init__(self, path=DEFAULT_LOG, straggler_factor=3.0, window=300.0):
+        """
+        Args:
+            path: Event log file
+            straggler_factor: A running stage is a straggler once it has taken
+                              this many times the median duration of its kind
+            window: Seconds of recent finishes used for the throughput
+        """
+        self.path = path
+        self.straggler_factor = straggler_factor
+        self.window = window
+        self.runs = {}
+        self._offset = 0
+        self._partial = b''
+
+    def poll(self):
+        """
+        Read events appended since the last poll
+
+        Returns:
+            Number of new events
+        """
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        self._offset += len(data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()  # incomplete last line, completed by a later poll
+        count = 0
+        for line in lines:
+            try:
+                self._apply(json.loads(line))
+                count += 1
+            except (json.JSONDecodeError, KeyError):
+                continue
+        return count
+
+    def _apply(self, event):
+        state = self.runs.setdefault(event['run'], _RunState())
+        now = event['time']
+        state.first = now if state.first is None else min(state.first, now)
+        state.last = now if state.last is None else max(state.last, now)
+        kind = event.get('kind')
+        if event['event'] == 'plan':
+            for k, n in event['kinds'].items():
+                state.planned[k] = state.planned.get(k, 0) + n
+            state.ended = False
+        elif event['event'] == 'start':
+            state.running[event['name']] = event
+        elif event['event'] == 'finish':
+            state.running.pop(event['name'], None)
+            state.done.setdefault(kind, []).append(event['elapsed'])
+            state.finish_times.append(now)
+        elif event['event'] == 'fail':
+            state.running.pop(event['name'], None)
+            state.failed[kind] = state.failed.get(kind, 0) + 1
+        elif event['event'] == 'end':
+            state.ended = True
+
+    def snapshot(self, run=None, now=None):
+        """
+        Current progress of one run
+
+        Args:
+            run: Run id (default: the run with the most recent event)
+            now: Current time (default: time.time())
+
+        Returns:
+            Dictionary {'run', 'ended', 'elapsed', 'idle', 'throughput',
+            'kinds' (list of per-kind dicts), 'stragglers', 'dead'}
+        """
+        if not self.runs:
+            return None
+        now = time.time() if now is None else now
+        if run is None:
+            run = max(self.runs, key=lambda r: self.runs[r].last)
+        state = self.runs[run]
+
+        recent = [t for t in state.finish_times if t >= now - self.window]
+        span = min(self.window, max(now - state.first, 1e-9))
+        throughput = len(recent) / span if recent else 0.0
+
+        host = socket.gethostname()
+        dead, stragglers = [], []
+        running_by_kind = {}
+        for name, event in state.running.items():
+            elapsed = now - event['time']
+            if event['host'] == host and not _pid_alive(event['pid']):
+                dead.append({'name': name, 'elapsed': elapsed, 'pid': event['pid']})
+                continue
+            running_by_kind[event['kind']] = running_by_kind.get(event['kind'], 0) + 1
+            durations = state.done.get(event['kind'], [])
+            if len(durations) >= 3 and elapsed > self.straggler_factor * np.median(durations):
+                stragglers.append({'name': name, 'elapsed': elapsed, 'median': float(np.median(durations)),
+                                   'worker': f"{event['host']}:{event['pid']}"})
+
+        kinds = []
+        for kind in sorted(set(state.planned) | set(state.done) | set(state.failed) | set(running_by_kind)):
+            durations = state.done.get(kind, [])
+            done, failed = len(durations), state.failed.get(kind, 0)
+            running = running_by_kind.get(kind, 0)
+            planned = state.planned.get(kind)
+            remaining = max(planned - done - failed, 0) if planned is not None else None
+            mean = float(np.mean(durations)) if durations else None
+            # Remaining work spread over the workers currently busy with this kind
+            eta = None
+            if remaining == 0:
+                eta = 0.0
+            elif remaining is not None and mean is not None:
+                eta = remaining * mean / max(running, 1)
+            kinds.append({'kind': kind, 'planned': planned, 'done': done, 'running': running,
+                          'failed': failed, 'mean': mean, 'eta': eta})
+
+        etas = [k['eta'] for k in kinds if k['eta'] is not None]
+        return {
+            'run': run, 'ended': state.ended, 'elapsed': now - state.first, 'idle': now - state.last,
+            'throughput': throughput, 'kinds': kinds, 'stragglers': stragglers, 'dead': dead,
+            'eta': max(etas) if etas and not state.ended else None
+        }
+
+
+def _duration(seconds):
+    if seconds is None:
+        return '-'
+    seconds = int(round(seconds))
+    return f'{seconds // 3600}h{seconds // 60 % 60:02d}m' if seconds >= 3600 else f'{seconds // 60}m{seconds % 60:02d}s'
+
+
+def format_snapshot(snapshot):
+    """Text report of a snapshot"""
+    if snapshot is None:
+        return "  No progress events yet"
+    complete = all(k['planned'] is not None and k['done'] + k['failed'] >= k['planned'] and not k['running']
+                   for k in snapshot['kinds'])
+    status = 'finished' if snapshot['ended'] or complete else ('stalled?' if snapshot['dead'] else 'running')
+    width = max([len(k['kind']) for k in snapshot['kinds']] + [4]) + 2
+    lines = [
+        f"  Run {snapshot['run']} ({status}), elapsed {_duration(snapshot['elapsed'])}, "
+        f"last event {_duration(snapshot['idle'])} ago",
+        f"  Throughput {snapshot['throughput'] * 60:.1f} stages/min, ETA {_duration(snapshot['eta'])}",
+        '',
+        f"  {'Kind':<{width}}{'Done':>10}{'Running':>9}{'Failed':>8}{'Mean':>9}{'ETA':>9}"
+    ]
+    for k in snapshot['kinds']:
+        total = f"{k['done']}/{k['planned']}" if k['planned'] is not None else str(k['done'])
+        mean = f"{k['mean']:.1f}s" if k['mean'] is not None else '-'
+        lines.append(f"  {k['kind']:<{width}}{total:>10}{k['running']:>9}{k['failed']:>8}{mean:>9}"
+                     f"{_duration(k['eta']):>9}")
+    for s in snapshot['stragglers']:
+        lines.append(f"  [SLOW] {s['name']} running {_duration(s['elapsed'])} "
+                     f"(median {s['median']:.1f}s) on {s['worker']}")
+    for d in snapshot['dead']:
+        lines.append(f"  [DEAD] {d['name']} started {_duration(d['elapsed'])} ago by pid {d['pid']} "
+                     f"(process gone)")
+    return '\n'.join(lines)
@@ -0,0 +1,160 @@
+"""
+Parallel, cached figure rendering
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+A figure is described by a plot job (plotting function, its arguments and
+the output path). render_figures() runs a list of jobs in a process pool
+whose workers use the non-interactive Agg backend and apply the plot style
+once. Every figure is closed as soon as it is saved, so memory stays flat
+however many figures are drawn.
+
+Each job is hashed (function source, the source of its module and of the
+visualization module, which hold its helpers and the plot style, and the
+arguments). The hash of the last render of every output path is kept in a
+manifest next to the figures, and a job whose hash and output file are
+unchanged is skipped.
+
+Usage:
+    jobs = [plot_job(plot_shap_variance, 'results/figures/x.png', metrics, feature_names=names)]
+    render_figures(jobs, workers=4)
+"""
+
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+
+
+MANIFEST_NAME = '.render_manifest.json'
+
+
+def plot_job(func, save_path, *args, **kwargs):
+    """
+    Describe one figure
+
+    Args:
+        func: Module-level plotting function accepting save_path=
+        save_path: Output file
+        *args, **kwargs: Arguments of func
+
+    Returns:
+        Job dictionary {'func', 'save_path', 'args', 'kwargs'}
+    """
+    return {'func': func, 'save_path': save_path, 'args': args, 'kwargs': kwargs}
+
+
+@functools.lru_cache(maxsize=None)
+def _module_hash(name):
+    """Hash of a module's source ('' if it has none)"""
+    if name not in sys.modules:
+        __import__(name)
+    try:
+        return joblib.hash(inspect.getsource(sys.modules[name]))
+    except (OSError, TypeError):
+        return ''
+
+
+def job_hash(job):
+    """Hash of a job's plotting code (including helpers and plot style) and input data"""
+    func = job['func']
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = f"{func.__module__}.{func.__qualname__}"
+    modules = sorted({func.__module__, 'visualization'})
+    return joblib.hash((source, [_module_hash(name) for name in modules], job['args'],
+                        sorted(job['kwargs'].items())))
+
+
+def _init_worker():
+    """Non-interactive backend and plot style, once per process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from visualization import setup_plot_style
+    setup_plot_style()
+
+
+def _render(job):
+    """Draw and save one figure, then close it"""
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    try:
+        job['func'](*job['args'], save_path=job['save_path'], **job['kwargs'])
+    finally:
+        plt.close('all')
+    return time.perf_counter() - start
+
+
+def _manifest_path(jobs, manifest_path):
+    if manifest_path is not None:
+        return manifest_path
+    directory = os.path.dirname(jobs[0]['save_path']) or '.'
+    return os.path.join(directory, MANIFEST_NAME)
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def render_figures(jobs, workers=None, force=False, manifest_path=None, verbose=True):
+    """
+    Render plot jobs in parallel, skipping unchanged figures
+
+    Args:
+        jobs: List of plot_job dictionaries
+        workers: Worker processes (default: CPU count, capped by the jobs to
+                 render; 1 renders in this process)
+        force: Render every job regardless of the manifest
+        manifest_path: Hash manifest (default: .render_manifest.json in the
+                       directory of the first job's output)
+        verbose: Print one line per figure
+
+    Returns:
+        Dictionary {save_path: 'cached' | render time in seconds}
+    """
+    if not jobs:
+        return {}
+    manifest_path = _manifest_path(jobs, manifest_path)
+    manifest = _load_manifest(manifest_path)
+
+    results, pending = {}, []
+    for job in jobs:
+        digest = job_hash(job)
+        if not force and manifest.get(job['save_path']) == digest and os.path.exists(job['save_path']):
+            results[job['save_path']] = 'cached'
+        else:
+            pending.append((job, digest))
+
+    workers = min(workers or os.cpu_count() or 1, max(len(pending), 1))
+    if workers <= 1:
+        _init_worker()
+        times = [_render(job) for job, _ in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            times = list(pool.map(_render, [job for job, _ in pending]))
+
+    for (job, digest), seconds in zip(pending, times):
+        results[job['save_path']] = seconds
+        manifest[job['save_path']] = digest
+
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    tmp_path = f'{manifest_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+    if verbose:
+        for path, outcome in results.items():
+            status = 'cached' if outcome == 'cached' else f'{outcome:.1f}s'
+            print(f"  [{'SKIP' if outcome == 'cached' else 'OK'}] {path} ({status})")
+    return results
@@ -0,0 +1,331 @@
+"""
+SQLite index of experiment results
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Every pipeline run registers itself (config hash, script, git commit) and
+bulk-inserts one row per scalar stability metric and (dataset, rate, model)
+cell, plus the paths of the SHAP npz files it wrote. Cross-run questions
+("ranking correlation vs training size for all runs this month") become one
+indexed query returning a DataFrame; the SHAP arrays are never opened.
+
+Tables:
+    runs       run_id, config_hash, config (JSON), script, git_commit, created
+    metrics    run_id, config_hash, dataset, rate, model, seed (NULL for
+               metrics across seeds), n_train, n_seeds, name, value, created
+    artifacts  run_id, config_hash, dataset, rate, model, seed, kind, path, created
+
+Usage:
+    store = ResultsStore()
+    frame = store.query(metric='ranking_correlation.mean', model='xgboost', since='2025-01-01')
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from bookkeeping import Transaction, git_commit, new_run_id
+
+
+DEFAULT_DB = 'results/results.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    config_hash TEXT NOT NULL,
+    config TEXT,
+    script TEXT,
+    git_commit TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    rate REAL NOT NULL,
+    model TEXT NOT NULL,
+    seed INTEGER,
+    n_train INTEGER,
+    n_seeds INTEGER,
+    name TEXT NOT NULL,
+    value REAL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    rate REAL NOT NULL,
+    model TEXT NOT NULL,
+    seed INTEGER,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_query ON metrics (name, dataset, model, rate);
+CREATE INDEX IF NOT EXISTS idx_metrics_run ON metrics (run_id);
+CREATE INDEX IF NOT EXISTS idx_metrics_config ON metrics (config_hash);
+CREATE INDEX IF NOT EXISTS idx_metrics_created ON metrics (created);
+CREATE INDEX IF NOT EXISTS idx_artifacts_cell ON artifacts (dataset, model, seed);
+CREATE INDEX IF NOT EXISTS idx_artifacts_run ON artifacts (run_id);
+"""
+
+METRIC_COLUMNS = ['run_id', 'config_hash', 'dataset', 'rate', 'model', 'seed', 'n_train', 'n_seeds',
+                  'name', 'value', 'created']
+ARTIFACT_COLUMNS = ['run_id', 'config_hash', 'dataset', 'rate', 'model', 'seed', 'kind', 'path', 'created']
+
+
+def config_snapshot(config):
+    """JSON-serialisable settings of a config module (upper-case names) or dict"""
+    if not isinstance(config, dict):
+        config = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    return json.loads(json.dumps(config, sort_keys=True, default=str))
+
+
+def config_hash(config):
+    """Short content hash of a config module or dict"""
+    return hashlib.sha256(json.dumps(config_snapshot(config), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def flatten_metrics(metrics, prefix=''):
+    """
+    Scalar entries of a stability metrics dictionary with dotted names
+
+    Per-sample and per-feature arrays are skipped.
+
+    Returns:
+        Dictionary {name: float}, e.g. {'ranking_correlation.mean': 0.93,
+        'consistency.top_5.overall': 0.88, 'n_runs': 10, ...}
+    """
+    flat = {}
+    for key, value in metrics.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, prefix=f'{name}.'))
+        elif isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+            flat[name] = float(value)
+        elif isinstance(value, np.ndarray) and value.ndim == 0:
+            flat[name] = float(value)
+    return flat
+
+
+def stability_rows(dataset, model, metrics, rate=1.0, n_train=None, seeds=None):
+    """
+    Metric rows (see ResultsStore.add_metrics) of one (dataset, rate, model) cell
+
+    Metrics across seeds get seed NULL; the per-seed metrics of
+    compute_stability_metrics (metrics['per_seed']) get one row per seed.
+    """
+    n_seeds = len(seeds) if seeds is not None else metrics.get('n_runs')
+    cell = {'dataset': dataset, 'rate': rate, 'model': model, 'n_train': n_train, 'n_seeds': n_seeds}
+    rows = [dict(cell, name=name, value=value) for name, value in flatten_metrics(metrics).items()]
+    per_seed = metrics.get('per_seed') or {}
+    for k, seed in enumerate(per_seed.get('seeds', [])):
+        rows.extend(dict(cell, seed=int(seed), name=name, value=float(values[k]))
+                    for name, values in per_seed.items() if name != 'seeds')
+    return rows
+
+
+class ResultsStore:
+    """Indexed store of run metrics and artifact paths"""
+
+    def __init__(self, path=DEFAULT_DB):
+        """
+        Args:
+            path: SQLite database file (created with its indexes if missing)
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = sqlite3.connect(path, timeout=60)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        self._hashes = {}
+
+    def _connect(self):
+        return Transaction(sqlite3.connect(self.path, timeout=60, isolation_level=None))
+
+    def start_run(self, config, script=None, run_id=None):
+        """
+        Register a run
+
+        Args:
+            config: Config module or dict (hashed and stored as JSON)
+            script: Name of the script producing the run
+            run_id: Identifier (default: timestamp + random suffix)
+
+        Returns:
+            The run id
+        """
+        run_id = run_id or new_run_id()
+        snapshot = config_snapshot(config)
+        digest = config_hash(snapshot)
+        commit, dirty = git_commit()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, config_hash, config, script, git_commit, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, digest, json.dumps(snapshot, sort_keys=True), script,
+                 commit + ('-dirty' if dirty else ''), time.time())
+            )
+        self._hashes[run_id] = digest
+        return run_id
+
+    def _config_hash(self, run_id):
+        if run_id not in self._hashes:
+            conn = sqlite3.connect(self.path, timeout=60)
+            try:
+                row = conn.execute("SELECT config_hash FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                raise KeyError(f"Unknown run {run_id}; call start_run() first")
+            self._hashes[run_id] = row[0]
+        return self._hashes[run_id]
+
+    def add_metrics(self, run_id, rows):
+        """
+        Bulk-insert metric rows in one transaction
+
+        Args:
+            run_id: Run from start_run
+            rows: Iterable of dicts with dataset, rate, model, name, value and
+                  optional seed, n_train, n_seeds
+
+        Returns:
+            Number of rows inserted
+        """
+        digest, now = self._config_hash(run_id), time.time()
+        values = [
+            (run_id, digest, r['dataset'], float(r.get('rate', 1.0)), r['model'], r.get('seed'),
+             r.get('n_train'), r.get('n_seeds'), r['name'], r['value'], now)
+            for r in rows
+        ]
+        with self._connect() as conn:
+            conn.executemany(f"INSERT INTO metrics ({', '.join(METRIC_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(METRIC_COLUMNS))})", values)
+        return len(values)
+
+    def add_artifacts(self, run_id, rows):
+        """
+        Bulk-insert artifact paths (dicts with dataset, rate, model, seed, kind, path)
+
+        Returns:
+            Number of rows inserted
+        """
+        digest, now = self._config_hash(run_id), time.time()
+        values = [
+            (run_id, digest, r['dataset'], float(r.get('rate', 1.0)), r['model'], r.get('seed'),
+             r['kind'], r['path'], now)
+            for r in rows
+        ]
+        with self._connect() as conn:
+            conn.executemany(f"INSERT INTO artifacts ({', '.join(ARTIFACT_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(ARTIFACT_COLUMNS))})", values)
+        return len(values)
+
+    def record_stability(self, run_id, dataset, model, metrics, rate=1.0, n_train=None, seeds=None,
+                         shap_paths=None):
+        """
+        Record the stability metrics of one (dataset, rate, model) cell
+
+        Args:
+            run_id: Run from start_run
+            dataset, model: Dataset key and model name
+            metrics: Output of compute_stability_metrics
+            rate: Subsample rate
+            n_train: Training rows
+            seeds: Seeds the metrics were computed over
+            shap_paths: Dictionary {seed: SHAP npz path} (optional)
+
+        Returns:
+            Number of metric rows inserted
+        """
+        count = self.add_metrics(run_id, stability_rows(dataset, model, metrics, rate=rate, n_train=n_train,
+                                                        seeds=seeds))
+        if shap_paths:
+            self.add_artifacts(run_id, [
+                {'dataset': dataset, 'rate': rate, 'model': model, 'seed': seed, 'kind': 'shap', 'path': path}
+                for seed, path in shap_paths.items()
+            ])
+        return count
+
+    def _select(self, table, columns, filters, since=None):
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since if isinstance(since, (int, float)) else pd.Timestamp(since).timestamp())
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            frame = pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+        frame['created'] = pd.to_datetime(frame['created'], unit='s')
+        return frame
+
+    def query(self, metric=None, dataset=None, model=None, rate=None, run_id=None, config_hash=None,
+              since=None, per_seed=False, wide=False):
+        """
+        Metric rows matching the filters
+
+        Args:
+            metric: Metric name(s), e.g. 'ranking_correlation.mean'
+            dataset, model, rate, run_id, config_hash: Value or list of values
+            since: Only rows recorded at or after this time ('2025-01-01' or
+                   a Unix timestamp)
+            per_seed: Per-seed rows instead of metrics across seeds
+            wide: One column per metric instead of one row per metric
+
+        Returns:
+            DataFrame (long: one row per metric value)
+        """
+        frame = self._select('metrics', METRIC_COLUMNS, {
+            'name': metric, 'dataset': dataset, 'model': model, 'rate': rate,
+            'run_id': run_id, 'config_hash': config_hash
+        }, since=since)
+        frame = frame[frame['seed'].notna()] if per_seed else frame[frame['seed'].isna()]
+        if not per_seed:
+            frame = frame.drop(columns='seed')
+        if wide and not frame.empty:
+            index = [c for c in METRIC_COLUMNS if c in frame.columns and c not in ['name', 'value']]
+            frame = frame.groupby(index + ['name'], dropna=False, sort=False)['value'].last().unstack('name')
+            frame = frame.reset_index()
+            frame.columns.name = None
+        return frame.reset_index(drop=True)
+
+    def artifacts(self, dataset=None, model=None, seed=None, run_id=None, kind=None, since=None):
+        """Artifact paths matching the filters (the files are not opened)"""
+        return self._select('artifacts', ARTIFACT_COLUMNS, {
+            'dataset': dataset, 'model': model, 'seed': seed, 'run_id': run_id, 'kind': kind
+        }, since=since)
+
+    def runs(self, since=None):
+        """Registered runs (without the config JSON)"""
+        return self._select('runs', ['run_id', 'config_hash', 'script', 'git_commit', 'created'], {},
+                            since=since)
+
+    def run_config(self, run_id):
+        """Config snapshot of a run"""
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            row = conn.execute("SELECT config FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
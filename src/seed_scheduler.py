@@ -0,0 +1,197 @@
+"""
+Sequential early-stopping seed scheduler
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Seeds are added one at a time per model. After every seed the ranking
+correlation, SHAP variance and top-k overlap are updated incrementally,
+together with jackknife (leave-one-seed-out) confidence intervals. A model
+stops receiving seeds once every interval is narrower than its target width;
+stable models therefore stop after a few seeds.
+
+The top-k metric is the mean pairwise overlap of two seeds' top-k sets, not
+the intersection over all seeds (the consistency reported by
+stability_metrics): the intersection can only shrink as seeds are added, so
+its leave-one-out estimates are biased and often identical, which gives a
+zero-width interval and stops scheduling too early.
+"""
+
+import numpy as np
+
+from stability_metrics import compute_feature_ranking, pairwise_rank_correlation
+
+
+Z_95 = 1.959964
+
+
+def jackknife_interval(leave_one_out, z=Z_95):
+    """
+    Jackknife standard error and confidence interval half-width
+
+    Args:
+        leave_one_out: Estimates with each seed left out once (n_seeds,)
+
+    Returns:
+        (standard error, half-width)
+    """
+    n = len(leave_one_out)
+    se = np.sqrt((n - 1) / n * np.sum((leave_one_out - leave_one_out.mean()) ** 2))
+    return se, z * se
+
+
+def _pair_mean_interval(pair_values):
+    """Mean of a symmetric per-pair metric over all seed pairs, with its jackknife interval"""
+    n = len(pair_values)
+    upper = pair_values[np.triu_indices(n, k=1)]
+    # Leaving seed i out drops its row of pairs
+    loo = (upper.sum() - pair_values.sum(axis=1)) / ((n - 1) * (n - 2) / 2)
+    se, half = jackknife_interval(loo)
+    return {'value': upper.mean(), 'se': se, 'half_width': half}
+
+
+class IncrementalStability:
+    """
+    Stability metrics of one model, updated as seeds are added
+
+    Adding the k-th seed costs O(k * n_samples * n_features): only the new
+    run's correlations and top-k overlaps with the previous runs are computed.
+    """
+
+    def __init__(self, top_k_list=(3, 5, 10)):
+        self.top_k_list = list(top_k_list)
+        self.seeds = []
+        self.shap_values = []
+        self.rankings = []
+        # Mean (over samples) Spearman correlation and top-k overlap of each pair of runs
+        self.pair_corr = np.zeros((0, 0))
+        self.pair_overlap = {top_k: np.zeros((0, 0)) for top_k in self.top_k_list}
+
+    @staticmethod
+    def _extend(pair_values, new_values):
+        """Pair matrix with one more run whose values against the previous runs are given"""
+        k = len(pair_values)
+        extended = np.zeros((k + 1, k + 1))
+        extended[:k, :k] = pair_values
+        extended[k, :k] = extended[:k, k] = new_values
+        return extended
+
+    def add(self, seed, shap_values):
+        """Add the SHAP values (n_samples, n_features) of one more seed"""
+        rankings = compute_feature_ranking(shap_values)
+        previous = np.stack(self.rankings) if self.rankings else np.zeros((0,) + rankings.shape, dtype=int)
+        self.pair_corr = self._extend(self.pair_corr,
+                                      pairwise_rank_correlation(previous, rankings[None]).mean(axis=1))
+        for top_k in self.top_k_list:
+            shared = ((previous <= top_k) & (rankings <= top_k)[None]).sum(axis=2)
+            self.pair_overlap[top_k] = self._extend(self.pair_overlap[top_k], shared.mean(axis=1) / top_k)
+        self.seeds.append(seed)
+        self.shap_values.append(np.asarray(shap_values))
+        self.rankings.append(rankings)
+
+    def estimates(self):
+        """
+        Current metric estimates with jackknife confidence intervals
+
+        Returns:
+            Dictionary {metric: {'value', 'se', 'half_width'}} for
+            'ranking_correlation', 'variance' and the pairwise 'top_<k>_overlap'
+        """
+        n = len(self.seeds)
+        if n < 3:
+            raise ValueError("At least 3 seeds are needed for leave-one-out intervals")
+        results = {'ranking_correlation': _pair_mean_interval(self.pair_corr)}
+
+        # SHAP variance across runs (float64 accumulation)
+        stack = np.stack(self.shap_values).astype(np.float64)
+        total = stack.sum(axis=0)
+        total_sq = (stack ** 2).sum(axis=0)
+        loo = np.empty(n)
+        for i in range(n):
+            mean = (total - stack[i]) / (n - 1)
+            loo[i] = np.mean((total_sq - stack[i] ** 2) / (n - 1) - mean ** 2)
+        se, half = jackknife_interval(loo)
+        value = np.mean(total_sq / n - (total / n) ** 2)
+        results['variance'] = {'value': value, 'se': se, 'half_width': half}
+
+        # Top-k overlap: shared top-k features of two runs, mean over pairs
+        for top_k in self.top_k_list:
+            results[f'top_{top_k}_overlap'] = _pair_mean_interval(self.pair_overlap[top_k])
+        return results
+
+
+def is_converged(estimates, target_width=0.05, target_relative_width=0.25):
+    """
+    True when every confidence interval is narrower than its target
+
+    Args:
+        estimates: Output of IncrementalStability.estimates()
+        target_width: Full CI width for correlation and top-k overlap
+        target_relative_width: Full CI width for the variance, relative to its value
+    """
+    for metric, est in estimates.items():
+        width = 2 * est['half_width']
+        if metric == 'variance':
+            if width > target_relative_width * max(abs(est['value']), 1e-300):
+                return False
+        elif width > target_width:
+            return False
+    return True
+
+
+def schedule_seeds(explain_fns, seed_pool, min_seeds=3, max_seeds=None, target_width=0.05,
+                   target_relative_width=0.25, top_k_list=(3, 5, 10), verbose=True):
+    """
+    Add seeds one at a time until every model's stability estimate converges
+
+    Args:
+        explain_fns: Dictionary {model_type: function(seed) -> SHAP values
+                     (n_samples, n_features)}; typically trains and explains
+        seed_pool: Ordered candidate seeds
+        min_seeds: Seeds evaluated before convergence is checked (>= 3)
+        max_seeds: Upper limit per model (default: len(seed_pool))
+        target_width: Target CI width for correlation and top-k overlap
+        target_relative_width: Target relative CI width for the variance
+        top_k_list: Top-k values for the overlap
+        verbose: Print one line per seed
+
+    Returns:
+        Dictionary {model_type: {'seeds', 'converged', 'estimates', 'history'}}
+    """
+    min_seeds = max(min_seeds, 3)
+    max_seeds = min(max_seeds or len(seed_pool), len(seed_pool))
+    trackers = {m: IncrementalStability(top_k_list) for m in explain_fns}
+    history = {m: [] for m in explain_fns}
+    converged = {m: False for m in explain_fns}
+    estimates = {m: None for m in explain_fns}
+
+    for step in range(max_seeds):
+        active = [m for m in explain_fns if not converged[m]]
+        if not active:
+            break
+        seed = seed_pool[step]
+        for model_type in active:
+            tracker = trackers[model_type]
+            tracker.add(seed, explain_fns[model_type](seed))
+            if len(tracker.seeds) < 3:
+                continue
+            estimates[model_type] = tracker.estimates()
+            history[model_type].append({'n_seeds': len(tracker.seeds), **estimates[model_type]})
+            if len(tracker.seeds) >= min_seeds:
+                converged[model_type] = is_converged(
+                    estimates[model_type], target_width, target_relative_width
+                )
+            if verbose:
+                widest = max(
+                    2 * e['half_width'] for k, e in estimates[model_type].items() if k != 'variance'
+                )
+                status = 'converged' if converged[model_type] else 'continue'
+                print(f"  [{model_type}] {len(tracker.seeds)} seeds: widest CI {widest:.3f} ({status})")
+
+    return {
+        m: {
+            'seeds': trackers[m].seeds,
+            'converged': converged[m],
+            'estimates': estimates[m],
+            'history': history[m]
+        }
+        for m in explain_fns
+    }
@@ -5,13 +5,126 @@ Student: Keisuke Nishioka (Matrikelnummer: 10081049)
 
 import numpy as np
 import pandas as pd
-import shap
 import joblib
 import os
+import warnings
 from tqdm import tqdm
 
+from instrument import instrumented
 
-def compute_tree_shap(model, X_test, n_samples=100):
+
+# Rows per model call for model-agnostic explainers
+PREDICT_BATCH_SIZE = 8192
+
+
+class BatchedPredictor:
+    """
+    Bounded-memory prediction adapter for model-agnostic explainers
+    
+    KernelSHAP and the permutation explainer evaluate the model on
+    nsamples x background synthetic rows per instance. The adapter splits
+    every call into model calls of at most `batch_size` rows and keeps only
+    the positive-class column (or the regression output) as float32, written
+    into an output buffer that is reused across calls. It does not merge
+    calls: shap's explainers request one instance at a time (the adaptive
+    KernelSHAP below builds its own batches across instances).
+    
+    Batches are passed to the model as DataFrames with the training columns
+    when the model was fitted on a DataFrame, so the model sees the feature
+    names it was trained with.
+    
+    The returned array is a view of that buffer and is only valid until the
+    next call; the shap explainers copy it into their own arrays.
+    """
+    
+    def __init__(self, model, batch_size=None, dtype=np.float32):
+        """
+        Args:
+            model: Trained model (predict_proba or predict)
+            batch_size: Rows per model call (default: PREDICT_BATCH_SIZE)
+            dtype: Output dtype
+        """
+        self.model = model
+        self.batch_size = batch_size or PREDICT_BATCH_SIZE
+        self.dtype = dtype
+        self.n_calls = 0
+        self._proba = hasattr(model, 'predict_proba')
+        self._columns = getattr(model, 'feature_names_in_', None)
+        self._out = np.empty(0, dtype=dtype)
+    
+    def _predict(self, X):
+        self.n_calls += 1
+        if self._columns is not None:
+            X = pd.DataFrame(X, columns=self._columns, copy=False)
+        if self._proba:
+            return self.model.predict_proba(X)[:, 1]
+        return self.model.predict(X)
+    
+    def __call__(self, X):
+        n = len(X)
+        if len(self._out) < n:
+            self._out = np.empty(n, dtype=self.dtype)
+        out = self._out[:n]
+        rows = X.values if isinstance(X, pd.DataFrame) else X
+        for start in range(0, n, self.batch_size):
+            stop = min(start + self.batch_size, n)
+            out[start:stop] = self._predict(rows[start:stop])
+        return out
+
+
+def select_positive_class(shap_values):
+    """
+    Reduce SHAP output to the positive class for binary classification
+    
+    Args:
+        shap_values: SHAP values as returned by the explainer (list of
+                     per-class arrays, (n_samples, n_features, n_classes)
+                     array, or (n_samples, n_features) array)
+    
+    Returns:
+        SHAP values (n_samples, n_features)
+    """
+    if isinstance(shap_values, list):
+        shap_values = shap_values[1]
+    if len(shap_values.shape) == 3:
+        shap_values = shap_values[:, :, 1] if shap_values.shape[2] > 1 else shap_values[:, :, 0]
+    return shap_values
+
+
+def interventional_tree_shap(model, X, background, chunk_size=None):
+    """
+    Interventional TreeSHAP values against a background summary
+    
+    Absent features take the values of the background rows instead of
+    following the training cover of each split (path-dependent TreeSHAP).
+    The background's tree paths are computed once for the model (see
+    models.Ensemble.background_paths) and the instances are explained in
+    batches. Values are on the margin: log-odds for XGBoost classifiers,
+    positive-class probability for forests.
+    
+    Args:
+        model: Trained XGBoost or Random Forest model
+        X: Instances to explain
+        background: Background summary from background.summarize_background
+                    (weighted rows) or background rows
+        chunk_size: Instances per batch (default: bounded working memory)
+    
+    Returns:
+        SHAP values (n_samples, n_features)
+    """
+    from models import Ensemble
+    
+    if isinstance(background, dict):
+        data, weights = background['data'], background['weights']
+    else:
+        data, weights = background, None
+    ensemble = Ensemble([model])
+    paths = ensemble.background_paths(data, weights)
+    return ensemble.interventional_contributions(X, paths, chunk_size=chunk_size)[0]
+
+
+@instrumented(seed='random_state')
+def compute_tree_shap(model, X_test, n_samples=100, random_state=None, batch_size=None, background=None):
     """
     Compute TreeSHAP values for tree-based models
     
@@ -19,17 +132,28 @@ def compute_tree_shap(model, X_test, n_samples=100):
         model: Trained tree-based model (XGBoost or Random Forest)
         X_test: Test features
         n_samples: Number of samples to explain (None for all)
+        random_state: Seed for selecting samples (None uses the global RNG)
+        batch_size: Rows per model call for the model-agnostic fallback
+        background: Background summary for interventional TreeSHAP (see
+                    interventional_tree_shap; default: path-dependent)
     
     Returns:
         SHAP values (numpy array)
     """
+    rng = np.random if random_state is None else np.random.RandomState(random_state)
+    
     # Select samples if needed
     if n_samples is not None and n_samples < len(X_test):
-        indices = np.random.choice(len(X_test), size=n_samples, replace=False)
+        indices = rng.choice(len(X_test), size=n_samples, replace=False)
         X_sample = X_test.iloc[indices] if isinstance(X_test, pd.DataFrame) else X_test[indices]
     else:
         X_sample = X_test
     
+    if background is not None:
+        return interventional_tree_shap(model, X_sample, background), X_sample
+    
+    import shap
+    
     # Create TreeExplainer
     # For XGBoost compatibility with newer versions
     if hasattr(model, 'get_booster'):  # XGBoost
@@ -40,7 +164,7 @@ def compute_tree_shap(model, X_test, n_samples=100):
         except:
             # Fallback to Explainer with predict function
             explainer = shap.Explainer(
-                model.predict_proba if hasattr(model, 'predict_proba') else model.predict,
+                BatchedPredictor(model, batch_size),
                 X_sample.iloc[:10] if isinstance(X_sample, pd.DataFrame) else X_sample[:10]
             )
     else:  # Random Forest
@@ -56,7 +180,9 @@ def compute_tree_shap(model, X_test, n_samples=100):
     return shap_values, X_sample
 
 
-def compute_kernel_shap(model, X_train, X_test, n_samples=100, nsamples_shap=100):
+@instrumented(seed='random_state')
+def compute_kernel_shap(model, X_train, X_test, n_samples=100, nsamples_shap=100, random_state=None,
+                        background=None, batch_size=None):
     """
     Compute KernelSHAP values for non-tree models
     
@@ -66,21 +192,36 @@ def compute_kernel_shap(model, X_train, X_test, n_samples=100, nsamples_shap=100
         X_test: Test features
         n_samples: Number of test samples to explain
         nsamples_shap: Number of samples for KernelSHAP computation
+        random_state: Seed for background/sample selection (None uses the global RNG)
+        background: Weighted background summary from background.summarize_background
+                    (default: 100 random training rows drawn on every call)
+        batch_size: Rows per model call (see BatchedPredictor)
     
     Returns:
         SHAP values (numpy array)
     """
+    import shap
+    from shap.utils._legacy import DenseData
+    
+    rng = np.random if random_state is None else np.random.RandomState(random_state)
+    
     # Select background samples
-    n_background = min(100, len(X_train))
-    background_indices = np.random.choice(len(X_train), size=n_background, replace=False)
-    X_background = X_train.iloc[background_indices] if isinstance(X_train, pd.DataFrame) else X_train[background_indices]
+    if background is not None:
+        X_background = DenseData(np.asarray(background['data'], dtype=np.float64),
+                                 [str(c) for c in background['data'].columns], None,
+                                 np.array(background['weights'], dtype=np.float64))
+    else:
+        n_background = min(100, len(X_train))
+        background_indices = rng.choice(len(X_train), size=n_background, replace=False)
+        X_background = X_train.iloc[background_indices] if isinstance(X_train, pd.DataFrame) else X_train[background_indices]
     
     # Create KernelExplainer
-    explainer = shap.KernelExplainer(model.predict_proba if hasattr(model, 'predict_proba') else model.predict, X_background)
+    # Positive-class output only: SHAP values are returned as (n_samples, n_features)
+    explainer = shap.KernelExplainer(BatchedPredictor(model, batch_size), X_background)
     
     # Select test samples
     if n_samples is not None and n_samples < len(X_test):
-        indices = np.random.choice(len(X_test), size=n_samples, replace=False)
+        indices = rng.choice(len(X_test), size=n_samples, replace=False)
         X_sample = X_test.iloc[indices] if isinstance(X_test, pd.DataFrame) else X_test[indices]
     else:
         X_sample = X_test
@@ -95,7 +236,175 @@ def compute_kernel_shap(model, X_train, X_test, n_samples=100, nsamples_shap=100
     return shap_values, X_sample
 
 
-def compute_shap_for_model(model, X_train, X_test, model_type='xgboost', n_samples=100, **kwargs):
+def _shapley_kernel_moments(n_features):
+    """
+    Coalition-size distribution and A = E[z z^T] under the Shapley kernel
+
+    Returns:
+        (size probabilities for sizes 1..d-1, A matrix)
+    """
+    d = n_features
+    sizes = np.arange(1, d)
+    size_probs = 1.0 / (sizes * (d - sizes))
+    size_probs /= size_probs.sum()
+    # P(i in S) = 1/2 by symmetry; P(i, j in S) = E[k(k-1)] / (d(d-1))
+    off_diagonal = np.sum(size_probs * sizes * (sizes - 1)) / (d * (d - 1))
+    A = np.full((d, d), off_diagonal)
+    np.fill_diagonal(A, 0.5)
+    return size_probs, A
+
+
+@instrumented(seed='random_state')
+def compute_kernel_shap_adaptive(model, X_train, X_test, n_samples=100, target_se=0.002,
+                                 pairs_per_round=32, max_coalitions=2048, max_evaluations=None,
+                                 n_background=100, batch_size=None, random_state=None,
+                                 background=None):
+    """
+    KernelSHAP with per-instance convergence stopping
+    
+    Coalitions are drawn from the Shapley kernel in rounds of paired samples
+    (z and its complement). After each round the SHAP values are re-estimated
+    by the constrained kernel regression and their standard errors follow from
+    the sample covariance of the regression moments (Covert & Lee, 2021).
+    An instance stops once its largest standard error is below `target_se`,
+    or after `max_coalitions`; all instances share the global budget of
+    `max_evaluations` model evaluations.
+    
+    Args:
+        model: Trained model
+        X_train: Training features (for background)
+        X_test: Test features
+        n_samples: Number of test samples to explain (None for all)
+        target_se: Target standard error of every SHAP value of an instance
+        pairs_per_round: Coalition pairs drawn per instance and round
+        max_coalitions: Coalition limit per instance
+        max_evaluations: Global limit on model evaluations (rows predicted)
+        n_background: Background sample size (when no summary is given)
+        batch_size: Rows per model call (see BatchedPredictor)
+        random_state: Seed for sampling
+        background: Weighted background summary from background.summarize_background
+    
+    Raises:
+        ValueError: If max_evaluations does not cover the background and
+                    instance predictions and one round of one instance
+    
+    Returns:
+        shap_values (n_samples, n_features), X_sample, std_errors (n_samples, n_features);
+        instances the budget never reached keep zeros with infinite errors
+        (a warning is issued)
+    """
+    rng = np.random.RandomState(random_state)
+    to_array = lambda X: X.values if isinstance(X, pd.DataFrame) else np.asarray(X)
+    
+    if background is not None:
+        weights = np.asarray(background['weights'], dtype=np.float64)
+        background = to_array(background['data'])
+    else:
+        background_indices = rng.choice(len(X_train), size=min(n_background, len(X_train)), replace=False)
+        background = to_array(X_train)[background_indices]
+        weights = np.full(len(background), 1.0 / len(background))
+    
+    if n_samples is not None and n_samples < len(X_test):
+        indices = rng.choice(len(X_test), size=n_samples, replace=False)
+        X_sample = X_test.iloc[indices] if isinstance(X_test, pd.DataFrame) else X_test[indices]
+    else:
+        X_sample = X_test
+    X = to_array(X_sample)
+    n_instances, d = X.shape
+    m = len(background)
+    
+    needed = m + n_instances + 2 * pairs_per_round * m
+    if max_evaluations is not None and d > 1 and max_evaluations < needed:
+        raise ValueError(f"max_evaluations={max_evaluations} is below the {needed} evaluations of the "
+                         f"background ({m}) and instance ({n_instances}) predictions and one round "
+                         f"({pairs_per_round} coalition pairs x {m} background rows)")
+    
+    predict = BatchedPredictor(model, batch_size)
+    v0 = predict(background).astype(np.float64) @ weights
+    v1 = predict(X).astype(np.float64)
+    
+    if d == 1:
+        return (v1 - v0)[:, None], X_sample, np.zeros((n_instances, 1))
+    
+    size_probs, A = _shapley_kernel_moments(d)
+    A_inv = np.linalg.inv(A)
+    ones = np.ones(d)
+    A_inv_1 = A_inv @ ones
+    M = A_inv - np.outer(A_inv_1, A_inv_1) / (ones @ A_inv_1)
+    
+    # Running moments of b = z (v(z) - v0), one unit per coalition pair
+    b_sum = np.zeros((n_instances, d))
+    b_outer = np.zeros((n_instances, d, d))
+    n_units = np.zeros(n_instances, dtype=int)
+    shap_values = np.zeros((n_instances, d))
+    std_errors = np.full((n_instances, d), np.inf)
+    active = np.ones(n_instances, dtype=bool)
+    evaluations = m + n_instances  # background and instance predictions
+    
+    # Synthetic rows are built in one preallocated buffer of about batch_size rows
+    per_instance_rows = 2 * pairs_per_round * m
+    chunk = max(1, predict.batch_size // per_instance_rows)
+    synth = np.empty((chunk, 2, pairs_per_round, m, d), dtype=X.dtype)
+    
+    while active.any():
+        act = np.flatnonzero(active)
+        round_evals = len(act) * 2 * pairs_per_round * m
+        if max_evaluations is not None and evaluations + round_evals > max_evaluations:
+            # Spend what is left on as many instances as fit, worst first
+            n_fit = (max_evaluations - evaluations) // (2 * pairs_per_round * m)
+            if n_fit <= 0:
+                break
+            worst = np.argsort(-std_errors[act].max(axis=1))[:n_fit]
+            act = act[worst]
+            round_evals = len(act) * 2 * pairs_per_round * m
+        
+        # Sample coalitions: size from the Shapley kernel, members uniformly
+        n_pairs = len(act) * pairs_per_round
+        sizes = rng.choice(np.arange(1, d), size=n_pairs, p=size_probs)
+        order = np.argsort(rng.rand(n_pairs, d), axis=1)
+        masks = np.argsort(order, axis=1) < sizes[:, None]
+        masks = np.concatenate([masks, ~masks], axis=0).reshape(2, len(act), pairs_per_round, d)
+        
+        # Evaluate v(z) for every coalition, chunked over instances
+        values = np.empty((2, len(act), pairs_per_round))
+        for start in range(0, len(act), chunk):
+            sl = slice(start, start + chunk)
+            z = masks[:, sl].swapaxes(0, 1)  # (c, 2, p, d)
+            buf = synth[:len(z)]
+            np.copyto(buf, background)
+            np.copyto(buf, X[act[sl]][:, None, None, None, :], where=z[..., None, :])
+            preds = predict(buf.reshape(-1, d)).reshape(z.shape[:3] + (m,))
+            values[:, sl] = (preds.astype(np.float64) @ weights).swapaxes(0, 1)
+        
+        # Paired unit: average of z (v(z) - v0) over z and its complement
+        b = 0.5 * (masks[0] * (values[0] - v0)[..., None] + masks[1] * (values[1] - v0)[..., None])
+        b_sum[act] += b.sum(axis=1)
+        b_outer[act] += np.einsum('ipj,ipk->ijk', b, b)
+        n_units[act] += pairs_per_round
+        evaluations += round_evals
+        
+        # Constrained regression solution and its standard errors
+        n = n_units[act][:, None]
+        b_mean = b_sum[act] / n
+        nu = (b_mean @ A_inv_1 - (v1[act] - v0)) / (ones @ A_inv_1)
+        shap_values[act] = (b_mean - nu[:, None]) @ A_inv.T
+        cov_b = (b_outer[act] / n[..., None] - np.einsum('ij,ik->ijk', b_mean, b_mean))
+        cov_phi = np.einsum('jk,ikl,ml->ijm', M, cov_b, M) / n[..., None]
+        std_errors[act] = np.sqrt(np.clip(np.diagonal(cov_phi, axis1=1, axis2=2), 0, None))
+        
+        converged = (std_errors[act].max(axis=1) <= target_se) & (n_units[act] >= 2 * pairs_per_round)
+        exhausted = 2 * n_units[act] >= max_coalitions
+        active[act[converged | exhausted]] = False
+    
+    unreached = int((n_units == 0).sum())
+    if unreached:
+        warnings.warn(f"max_evaluations={max_evaluations} ran out before {unreached} of {n_instances} "
+                      f"instances were estimated; their SHAP values are 0 with infinite std_errors")
+    return shap_values, X_sample, std_errors
+
+
+def compute_shap_for_model(model, X_train, X_test, model_type='xgboost', n_samples=100,
+                           random_state=None, batch_size=None, **kwargs):
     """
     Compute SHAP values for a given model
     
@@ -105,29 +414,34 @@ def compute_shap_for_model(model, X_train, X_test, model_type='xgboost', n_sampl
         X_test: Test features
         model_type: 'xgboost', 'random_forest', or 'logistic_regression'
         n_samples: Number of samples to explain
+        random_state: Seed for sample/background selection (optional)
+        batch_size: Rows per model call for model-agnostic explainers
         **kwargs: Additional parameters for SHAP computation
     
     Returns:
         shap_values, X_sample
     """
     if model_type in ['xgboost', 'random_forest']:
-        return compute_tree_shap(model, X_test, n_samples=n_samples)
+        return compute_tree_shap(model, X_test, n_samples=n_samples, random_state=random_state,
+                                 batch_size=batch_size, background=kwargs.get('background'))
     elif model_type in ['logistic_regression', 'ridge']:
-        return compute_kernel_shap(model, X_train, X_test, n_samples=n_samples, **kwargs)
+        return compute_kernel_shap(model, X_train, X_test, n_samples=n_samples,
+                                   random_state=random_state, batch_size=batch_size, **kwargs)
     else:
         raise ValueError(f"Unknown model type: {model_type}")
 
 
-def save_shap_values(shap_values, filepath):
+def save_shap_values(shap_values, filepath, **arrays):
     """
     Save SHAP values to file
     
     Args:
         shap_values: SHAP values array
         filepath: Path to save file
+        **arrays: Additional arrays stored alongside (e.g. std_errors)
     """
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    np.savez_compressed(filepath, shap_values=shap_values)
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    np.savez_compressed(filepath, shap_values=shap_values, **arrays)
 
 
 def load_shap_values(filepath):
@@ -0,0 +1,128 @@
+"""
+Quantised, delta-encoded SHAP archives
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+SHAP matrices of the same model type trained with different seeds are highly
+correlated, so storing each seed as an independent float64 array repeats
+almost the same numbers over and over. An archive stores:
+
+- the cross-seed mean once (float32)
+- per-seed residuals from that mean, quantised to int16 with one scale per
+  feature (step = max |residual| / 32767)
+- the resulting per-feature error bound, verified against the input when
+  the archive is written
+
+Decoding is one broadcast multiply-add into a float32 block; every seed is a
+view into that block.
+"""
+
+import os
+
+import numpy as np
+
+
+ARCHIVE_VERSION = 1
+QUANT_MAX = np.iinfo(np.int16).max
+
+
+def encode_shap_archive(shap_dict):
+    """
+    Delta-encode and quantise SHAP values of several seeds
+
+    Args:
+        shap_dict: Dictionary {seed: shap_values}; all arrays share one shape
+                   (..., n_features)
+
+    Returns:
+        Dictionary of arrays {'seeds', 'mean', 'scale', 'residuals',
+        'error_bound', 'version'}
+    """
+    seeds = sorted(shap_dict.keys())
+    stack = np.stack([np.asarray(shap_dict[seed], dtype=np.float64) for seed in seeds])
+    n_features = stack.shape[-1]
+
+    mean = stack.mean(axis=0).astype(np.float32)
+    residuals = stack - mean
+    peak = np.abs(residuals).reshape(-1, n_features).max(axis=0)
+    scale = np.where(peak > 0, peak / QUANT_MAX, 1.0).astype(np.float32)
+    quantised = np.clip(np.rint(residuals / scale), -QUANT_MAX, QUANT_MAX).astype(np.int16)
+
+    archive = {
+        'seeds': np.asarray(seeds, dtype=np.int64),
+        'mean': mean,
+        'scale': scale,
+        'residuals': quantised,
+        'version': np.asarray(ARCHIVE_VERSION)
+    }
+    decoded = decode_shap_archive(archive)
+    archive['error_bound'] = np.abs(decoded - stack).reshape(-1, n_features).max(axis=0)
+    return archive
+
+
+def decode_shap_archive(archive):
+    """
+    Decode all seeds of an archive
+
+    Args:
+        archive: Output of encode_shap_archive (or a loaded npz)
+
+    Returns:
+        float32 array (n_seeds, ..., n_features)
+    """
+    residuals = archive['residuals']
+    decoded = np.empty(residuals.shape, dtype=np.float32)
+    np.multiply(residuals, archive['scale'], out=decoded, casting='unsafe')
+    decoded += archive['mean']
+    return decoded
+
+
+def save_shap_archive(shap_dict, filepath, compress=True):
+    """
+    Write the SHAP values of several seeds as one archive
+
+    Args:
+        shap_dict: Dictionary {seed: shap_values}
+        filepath: Path of the .npz archive
+        compress: Deflate the arrays (smaller, slightly slower to load)
+
+    Returns:
+        Per-feature error bound of the stored values
+    """
+    archive = encode_shap_archive(shap_dict)
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    (np.savez_compressed if compress else np.savez)(filepath, **archive)
+    return archive['error_bound']
+
+
+def load_shap_archive(filepath, seeds=None):
+    """
+    Load SHAP values from an archive
+
+    Args:
+        filepath: Path of the .npz archive
+        seeds: Seeds to return (all by default)
+
+    Returns:
+        Dictionary {seed: float32 SHAP values}; the arrays are views into one
+        decoded block
+    """
+    with np.load(filepath) as data:
+        archive = {key: data[key] for key in ['seeds', 'mean', 'scale', 'residuals']}
+    all_seeds = archive['seeds'].tolist()
+    if seeds is not None:
+        index = [all_seeds.index(seed) for seed in seeds]
+        archive['residuals'] = archive['residuals'][index]
+        all_seeds = list(seeds)
+    decoded = decode_shap_archive(archive)
+    return {seed: decoded[i] for i, seed in enumerate(all_seeds)}
+
+
+def archive_info(filepath):
+    """Seeds, shape and error bound of an archive without decoding it"""
+    with np.load(filepath) as data:
+        return {
+            'seeds': data['seeds'].tolist(),
+            'shape': tuple(data['residuals'].shape[1:]),
+            'max_error': float(data['error_bound'].max()),
+            'version': int(data['version'])
+        }
@@ -0,0 +1,328 @@
+"""
+Shared-memory data plane for worker processes
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+The prepared train/test matrices are copied into named shared memory blocks
+once by the parent process. Workers receive only small, picklable handles and
+attach to the blocks as read-only NumPy views (or DataFrames wrapping them),
+so nothing is pickled per task.
+
+Local work-queue workers (run_work_queue.py local) get the prepared splits
+of the grid's datasets this way instead of each loading and splitting them.
+
+Usage (parent):
+    with share_prepared_data(X_train, X_test, y_train, y_test) as plane:
+        results = run_with_shared_data(worker_fn, tasks, plane.handles())
+
+Usage (worker):
+    X_train = get_shared('X_train')
+"""
+
+import atexit
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import pandas as pd
+
+
+# Blocks created by this process: {handle name: SharedMemory}
+_OWNED = {}
+# Blocks attached by this process: {handle name: SharedMemory}
+_ATTACHED = {}
+# Handles passed to this process by the pool initializer: {key: handle}
+_WORKER_HANDLES = {}
+
+
+def _to_array(data):
+    """Return a C-contiguous NumPy array for an array, DataFrame or Series"""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        data = data.to_numpy()
+    array = np.ascontiguousarray(data)
+    if array.dtype == object:
+        raise TypeError("Shared memory only supports numeric arrays, got object dtype")
+    return array
+
+
+class SharedDataPlane:
+    """
+    Owner of a set of named shared memory blocks
+
+    The process that creates the plane owns the blocks and unlinks them on
+    close(), on leaving a ``with`` block, or at interpreter exit.
+    """
+
+    def __init__(self, prefix=None):
+        """
+        Args:
+            prefix: Name prefix for the shared memory blocks (default: random)
+        """
+        self.prefix = prefix or f"shap_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._blocks = {}
+        self._handles = {}
+        self._closed = False
+        atexit.register(self.close)
+
+    def publish(self, key, data):
+        """
+        Copy an array, DataFrame or Series into a new shared memory block
+
+        Args:
+            key: Name under which workers look the data up (e.g. 'X_train')
+            data: numpy array, DataFrame or Series
+
+        Returns:
+            Handle (dict) describing the block
+        """
+        if key in self._handles:
+            raise ValueError(f"Key already published: {key}")
+
+        array = _to_array(data)
+        name = f"{self.prefix}_{key}"
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        self._blocks[key] = shm
+        _OWNED[name] = shm
+
+        handle = {
+            'name': name,
+            'shape': array.shape,
+            'dtype': array.dtype.str,
+            'kind': 'array'
+        }
+        if isinstance(data, pd.DataFrame):
+            handle['kind'] = 'frame'
+            handle['columns'] = data.columns.tolist()
+        elif isinstance(data, pd.Series):
+            handle['kind'] = 'series'
+            handle['series_name'] = data.name
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            # Keep the index so workers can still align X with y
+            index = data.index
+            if pd.api.types.is_numeric_dtype(index.dtype) and not isinstance(index, pd.MultiIndex):
+                handle['index'] = self.publish(f"{key}__index", index.to_numpy())
+            else:
+                handle['index'] = index.tolist()
+
+        self._handles[key] = handle
+        return handle
+
+    def handles(self):
+        """
+        Returns:
+            Dictionary {key: handle} for all published blocks (picklable)
+        """
+        return {key: handle for key, handle in self._handles.items() if not key.endswith('__index')}
+
+    @property
+    def nbytes(self):
+        """Total size of all published blocks in bytes"""
+        return sum(shm.size for shm in self._blocks.values())
+
+    def close(self):
+        """Release and unlink all blocks owned by this plane"""
+        if self._closed:
+            return
+        self._closed = True
+        for shm in self._blocks.values():
+            _OWNED.pop(shm.name, None)
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def share_prepared_data(X_train, X_test, y_train=None, y_test=None,
+                        X_background=None, X_explain=None, prefix=None):
+    """
+    Publish the prepared train/test data (and optionally the SHAP background
+    and explain sets) into shared memory
+
+    Args:
+        X_train, X_test: Prepared feature matrices
+        y_train, y_test: Targets (optional)
+        X_background: Background set for model-agnostic explainers (optional)
+        X_explain: Instances to explain (optional)
+        prefix: Name prefix for the shared memory blocks
+
+    Returns:
+        SharedDataPlane owning the blocks
+    """
+    plane = SharedDataPlane(prefix=prefix)
+    data = {
+        'X_train': X_train, 'X_test': X_test,
+        'y_train': y_train, 'y_test': y_test,
+        'X_background': X_background, 'X_explain': X_explain
+    }
+    try:
+        for key, value in data.items():
+            if value is not None:
+                plane.publish(key, value)
+    except Exception:
+        plane.close()
+        raise
+    return plane
+
+
+def _attach_block(name):
+    """Attach to a block by name without taking ownership of it"""
+    if name in _OWNED:
+        return _OWNED[name]
+    if name in _ATTACHED:
+        return _ATTACHED[name]
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+        # Before 3.13 attaching registers the block with the resource tracker,
+        # which would unlink it when this worker exits
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    _ATTACHED[name] = shm
+    return shm
+
+
+def attach_array(handle):
+    """
+    Attach to a shared block as a read-only NumPy view (no copy)
+
+    Args:
+        handle: Handle returned by SharedDataPlane.publish
+
+    Returns:
+        Read-only numpy array backed by shared memory
+    """
+    shm = _attach_block(handle['name'])
+    array = np.ndarray(tuple(handle['shape']), dtype=np.dtype(handle['dtype']), buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+def attach(handle):
+    """
+    Attach to a shared block, restoring DataFrame/Series wrappers if needed
+
+    Args:
+        handle: Handle returned by SharedDataPlane.publish
+
+    Returns:
+        numpy array, DataFrame or Series backed by shared memory
+    """
+    array = attach_array(handle)
+    if handle['kind'] == 'array':
+        return array
+
+    index = handle['index']
+    index = pd.Index(attach_array(index)) if isinstance(index, dict) else pd.Index(index)
+    if handle['kind'] == 'frame':
+        return pd.DataFrame(array, columns=handle['columns'], index=index, copy=False)
+    return pd.Series(array, index=index, name=handle['series_name'], copy=False)
+
+
+def detach_all():
+    """Close all blocks attached by this process (does not unlink them)"""
+    for shm in _ATTACHED.values():
+        try:
+            shm.close()
+        except BufferError:
+            # A view is still alive; the mapping is released at process exit
+            pass
+    _ATTACHED.clear()
+
+
+def init_worker(handles):
+    """
+    Pool initializer: remember the handles passed from the parent process
+
+    Args:
+        handles: Dictionary {key: handle} from SharedDataPlane.handles()
+    """
+    _WORKER_HANDLES.clear()
+    _WORKER_HANDLES.update(handles)
+    atexit.register(detach_all)
+
+
+def get_shared(key):
+    """
+    Get shared data inside a worker started with init_worker
+
+    Args:
+        key: Published key (e.g. 'X_train', 'y_train', 'X_explain')
+
+    Returns:
+        numpy array, DataFrame or Series backed by shared memory
+    """
+    if key not in _WORKER_HANDLES:
+        raise KeyError(f"No shared data published under '{key}'")
+    return attach(_WORKER_HANDLES[key])
+
+
+def publish_split(plane, name, split):
+    """
+    Publish the arrays of a split dictionary (see stages.split_stage)
+
+    Args:
+        plane: SharedDataPlane
+        name: Prefix of the published keys ('<name>.X_train', ...)
+        split: Dictionary of DataFrames/Series/arrays and small objects
+
+    Returns:
+        The remaining (non-array) entries, e.g. scaler and task; pass them
+        to get_shared_split in the worker
+    """
+    meta = {}
+    for key, value in split.items():
+        if isinstance(value, (np.ndarray, pd.DataFrame, pd.Series)):
+            plane.publish(f'{name}.{key}', value)
+        else:
+            meta[key] = value
+    return meta
+
+
+def get_shared_split(name, meta):
+    """
+    Split dictionary published with publish_split, inside a worker
+
+    Args:
+        name: Prefix passed to publish_split
+        meta: Non-array entries returned by publish_split
+
+    Returns:
+        Dictionary with the arrays backed by shared memory (read-only)
+    """
+    split = dict(meta)
+    prefix = f'{name}.'
+    for key in _WORKER_HANDLES:
+        if key.startswith(prefix):
+            split[key[len(prefix):]] = get_shared(key)
+    return split
+
+
+def run_with_shared_data(func, tasks, handles, max_workers=None):
+    """
+    Run func(task) for each task in a process pool whose workers have the
+    shared data attached
+
+    Args:
+        func: Picklable function taking one task; use get_shared() inside it
+        tasks: Iterable of task arguments
+        handles: Dictionary {key: handle} from SharedDataPlane.handles()
+        max_workers: Number of worker processes (default: CPU count)
+
+    Returns:
+        List of results in task order
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                             initargs=(handles,)) as executor:
+        return list(executor.map(func, tasks))
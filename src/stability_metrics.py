@@ -5,9 +5,8 @@ Student: Keisuke Nishioka (Matrikelnummer: 10081049)
 
 import numpy as np
 import pandas as pd
-from scipy.stats import spearmanr
-from scipy.spatial.distance import pdist, squareform
-from tqdm import tqdm
+
+from instrument import instrumented
 
 
 def compute_feature_ranking(shap_values):
@@ -29,6 +28,40 @@ def compute_feature_ranking(shap_values):
     return rankings
 
 
+def pairwise_rank_correlation(rankings_a, rankings_b):
+    """
+    Spearman correlation between two ranking arrays, computed per sample
+    
+    Rankings from compute_feature_ranking are tie-free permutations of
+    1..n_features, so Spearman's rho reduces to 1 - 6 * sum(d^2) / (n (n^2 - 1)).
+    
+    Args:
+        rankings_a, rankings_b: Ranking arrays (..., n_samples, n_features);
+                                leading dimensions broadcast
+    
+    Returns:
+        Correlations (..., n_samples)
+    """
+    n_features = rankings_a.shape[-1]
+    diff = rankings_a.astype(np.float64) - rankings_b
+    return 1.0 - 6.0 * np.sum(diff * diff, axis=-1) / (n_features * (n_features ** 2 - 1))
+
+
+def compute_pairwise_correlations(rankings_list):
+    """
+    Correlation of every pair of runs for every sample
+    
+    Args:
+        rankings_list: List of ranking arrays from different runs
+    
+    Returns:
+        Array (n_pairs, n_samples), pairs ordered (0,1), (0,2), ..., (1,2), ...
+    """
+    rankings = np.stack(rankings_list, axis=0)
+    i, j = np.triu_indices(len(rankings_list), k=1)
+    return pairwise_rank_correlation(rankings[i], rankings[j])
+
+
 def compute_ranking_correlation(rankings_list):
     """
     Compute Spearman correlation of feature rankings across different runs
@@ -39,24 +72,28 @@ def compute_ranking_correlation(rankings_list):
     Returns:
         Mean correlation coefficient and correlation matrix
     """
-    n_runs = len(rankings_list)
-    n_samples = rankings_list[0].shape[0]
+    pair_corrs = compute_pairwise_correlations(rankings_list)
+    correlations = pair_corrs.mean(axis=0).tolist()
     
-    correlations = []
+    return np.mean(correlations), correlations
+
+
+def compute_seed_agreement(pair_correlations, n_runs):
+    """
+    Mean ranking correlation of every run with the other runs
     
-    for sample_idx in range(n_samples):
-        sample_rankings = [rankings[sample_idx, :] for rankings in rankings_list]
-        
-        # Compute pairwise correlations
-        sample_corrs = []
-        for i in range(n_runs):
-            for j in range(i + 1, n_runs):
-                corr, _ = spearmanr(sample_rankings[i], sample_rankings[j])
-                sample_corrs.append(corr)
-        
-        correlations.append(np.mean(sample_corrs))
+    Args:
+        pair_correlations: Output of compute_pairwise_correlations (n_pairs, n_samples)
+        n_runs: Number of runs
     
-    return np.mean(correlations), correlations
+    Returns:
+        Array (n_runs,); a run whose explanations disagree with the others
+        has a low value
+    """
+    i, j = np.triu_indices(n_runs, k=1)
+    per_pair = pair_correlations.mean(axis=1)
+    totals = np.bincount(i, per_pair, minlength=n_runs) + np.bincount(j, per_pair, minlength=n_runs)
+    return totals / max(n_runs - 1, 1)
 
 
 def compute_shap_variance(shap_values_list):
@@ -72,8 +109,8 @@ def compute_shap_variance(shap_values_list):
     # Stack all SHAP values
     shap_stack = np.stack(shap_values_list, axis=0)  # (n_runs, n_samples, n_features)
     
-    # Compute variance across runs
-    variance = np.var(shap_stack, axis=0)  # (n_samples, n_features)
+    # Compute variance across runs (float64 accumulation for float32 inputs)
+    variance = np.var(shap_stack, axis=0, dtype=np.float64)  # (n_samples, n_features)
     
     # Mean variance per feature
     mean_variance_per_feature = np.mean(variance, axis=0)
@@ -103,39 +140,69 @@ def compute_explanation_consistency(rankings_list, top_k=5):
     Returns:
         Consistency percentage per sample and overall
     """
-    n_runs = len(rankings_list)
-    n_samples = rankings_list[0].shape[0]
-    n_features = rankings_list[0].shape[1]
-    
-    consistencies = []
-    
-    for sample_idx in range(n_samples):
-        # Get top-k features for each run
-        top_k_features = []
-        for rankings in rankings_list:
-            top_k_indices = np.argsort(rankings[sample_idx, :])[:top_k]
-            top_k_features.append(set(top_k_indices.flatten().tolist()))  # Flatten and convert to list
-        
-        # Compute intersection of top-k features across all runs
-        intersection = set.intersection(*top_k_features)
-        
-        # Consistency = size of intersection / top_k
-        consistency = len(intersection) / top_k
-        consistencies.append(consistency)
+    # A feature is in a run's top-k iff its rank is <= top_k
+    in_top_k = np.stack(rankings_list, axis=0) <= top_k  # (n_runs, n_samples, n_features)
+    
+    # Consistency = size of intersection across all runs / top_k
+    consistencies = np.all(in_top_k, axis=0).sum(axis=1) / top_k
     
     return {
-        'per_sample': np.array(consistencies),
+        'per_sample': consistencies,
         'overall': np.mean(consistencies)
     }
 
 
-def compute_stability_metrics(shap_values_dict, top_k_list=[3, 5, 10]):
+def compute_feature_importance(shap_values_list):
+    """
+    Mean absolute SHAP value per feature over all runs and samples
+    
+    Args:
+        shap_values_list: List of SHAP value arrays from different runs
+    
+    Returns:
+        Mean |SHAP| per feature and the feature order (most important first)
+    """
+    mean_abs = np.mean([np.abs(shap_vals).mean(axis=0, dtype=np.float64) for shap_vals in shap_values_list],
+                       axis=0)
+    return {
+        'mean_abs': mean_abs,
+        'order': np.argsort(-mean_abs, kind='stable')
+    }
+
+
+def aggregate_feature_groups(shap_values, group_matrix):
+    """
+    Sum SHAP values of encoded columns into their source features
+    
+    SHAP values are additive, so the sum over a categorical column's dummies
+    is the attribution of the original column.
+    
+    Args:
+        shap_values: SHAP values (..., n_columns)
+        group_matrix: Sparse matrix (n_columns, n_groups) from
+                      data_loader.feature_group_matrix
+    
+    Returns:
+        SHAP values (..., n_groups)
+    """
+    shap_values = np.asarray(shap_values)
+    flat = shap_values.reshape(-1, shap_values.shape[-1])
+    grouped = np.asarray(group_matrix.T.dot(flat.T)).T
+    return grouped.reshape(shap_values.shape[:-1] + (group_matrix.shape[1],))
+
+
+@instrumented()
+def compute_stability_metrics(shap_values_dict, top_k_list=[3, 5, 10], group_matrix=None,
+                              group_names=None):
     """
     Compute all stability metrics for SHAP values from multiple runs
     
     Args:
         shap_values_dict: Dictionary {seed: shap_values}
         top_k_list: List of top-k values for consistency analysis
+        group_matrix: Optional sparse matrix from data_loader.feature_group_matrix;
+                      metrics are then computed per original feature
+        group_names: Names of the groups (stored as 'feature_names')
     
     Returns:
         Dictionary of all stability metrics
@@ -150,28 +217,43 @@ def compute_stability_metrics(shap_values_dict, top_k_list=[3, 5, 10]):
             shap_vals = shap_vals[:, :, 1] if shap_vals.shape[2] > 1 else shap_vals[:, :, 0]
         shap_values_list.append(shap_vals)
     
+    if group_matrix is not None:
+        grouped = aggregate_feature_groups(np.stack(shap_values_list), group_matrix)
+        shap_values_list = list(grouped)
+    
     # Compute rankings
     rankings_list = [compute_feature_ranking(shap_vals) for shap_vals in shap_values_list]
     
     # Compute metrics
-    ranking_corr_mean, ranking_corrs = compute_ranking_correlation(rankings_list)
+    pair_corrs = compute_pairwise_correlations(rankings_list)
+    ranking_corrs = pair_corrs.mean(axis=0).tolist()
+    ranking_corr_mean = np.mean(ranking_corrs)
     variance_metrics = compute_shap_variance(shap_values_list)
     
     consistency_metrics = {}
     for top_k in top_k_list:
         consistency_metrics[f'top_{top_k}'] = compute_explanation_consistency(rankings_list, top_k=top_k)
     
-    return {
+    metrics = {
         'ranking_correlation': {
             'mean': ranking_corr_mean,
             'per_sample': ranking_corrs
         },
         'variance': variance_metrics,
         'consistency': consistency_metrics,
+        'importance': compute_feature_importance(shap_values_list),
+        'per_seed': {
+            'seeds': list(seeds),
+            'ranking_correlation': compute_seed_agreement(pair_corrs, len(seeds)),
+            'mean_abs_shap': np.array([np.abs(v).mean(dtype=np.float64) for v in shap_values_list])
+        },
         'n_runs': len(seeds),
         'n_samples': shap_values_list[0].shape[0],
         'n_features': shap_values_list[0].shape[1]
     }
+    if group_names is not None:
+        metrics['feature_names'] = list(group_names)
+    return metrics
 
 
 def compare_models_stability(stability_results_dict):
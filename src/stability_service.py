@@ -0,0 +1,437 @@
+"""
+Online explanation-stability scoring service
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+A long-lived local HTTP service (TCP or Unix socket, standard library only)
+that holds the seed models of each model type in memory with warm
+explainers. Incoming rows are micro-batched: requests arriving within a few
+milliseconds are explained together, and every row gets its SHAP mean and
+variance across seeds, the mean pairwise rank agreement (Spearman) and the
+top-k consistency of its explanation.
+
+Endpoints:
+    GET  /info   Models, seeds, features and batching settings
+    POST /score  {"rows": [[x1, x2, ...], ...] or [{"feature": value}, ...]}
+
+Rows are in the models' input encoding, i.e. after prepare_data: one-hot
+encoded categoricals (the dummy columns listed by /info) and standardized
+values. Every row must give every feature of /info exactly once; rows with
+missing or unknown features are rejected with 400.
+"""
+
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+import numpy as np
+
+from models import Ensemble
+from stability_metrics import (
+    compute_feature_ranking, compute_pairwise_correlations, compute_explanation_consistency
+)
+
+
+def row_stability(shap_stack, top_k_list=(3, 5, 10)):
+    """
+    Per-row stability of explanations across seeds
+
+    Args:
+        shap_stack: SHAP values (n_seeds, n_rows, n_features)
+        top_k_list: Top-k values for consistency
+
+    Returns:
+        Dictionary with 'mean', 'variance' (n_rows, n_features),
+        'rank_agreement' (n_rows,) and 'top_<k>' consistencies (n_rows,)
+    """
+    rankings = [compute_feature_ranking(shap_values) for shap_values in shap_stack]
+    result = {
+        'mean': shap_stack.mean(axis=0),
+        'variance': shap_stack.var(axis=0),
+        'rank_agreement': compute_pairwise_correlations(rankings).mean(axis=0)
+    }
+    for top_k in top_k_list:
+        result[f'top_{top_k}'] = compute_explanation_consistency(rankings, top_k=top_k)['per_sample']
+    return result
+
+
+class StabilityScorer:
+    """Seed models of each model type with warm explainers"""
+
+    def __init__(self, models, X_background, top_k_list=(3, 5, 10), method='interventional', background=None):
+        """
+        Args:
+            models: Dictionary {model_type: {seed: fitted model}}
+            X_background: Training features (feature names and linear reference mean)
+            top_k_list: Top-k values for consistency
+            method: 'interventional' (interventional SHAP of all seeds
+                    against one background summary, in one Ensemble call),
+                    'shap' (path-dependent TreeSHAP per seed, as in the
+                    offline analysis, but an order of magnitude slower for
+                    forests) or 'paths' (Saabas path attributions of all
+                    seeds in one call; fast, but not SHAP values)
+            background: Background summary for 'interventional' (default:
+                        100 k-means centroids of X_background)
+        """
+        self.feature_names = list(X_background.columns)
+        self.reference = np.asarray(X_background, dtype=np.float64).mean(axis=0)
+        self.top_k_list = [k for k in top_k_list if k <= len(self.feature_names)]
+        self.method = method
+        self.ensembles = {m: Ensemble(seed_models) for m, seed_models in models.items()}
+        self.explainers = {}
+        self.background_paths = {}
+        if method == 'interventional':
+            from background import summarize_background
+            background = background or summarize_background(X_background, method='kmeans', size=100)
+            # Background tree paths are computed once per model type, for all seeds
+            self.background_paths = {
+                model_type: ensemble.background_paths(background['data'], background['weights'])
+                for model_type, ensemble in self.ensembles.items()
+            }
+        if method == 'shap':
+            import shap
+            for model_type, ensemble in self.ensembles.items():
+                if ensemble.kind != 'linear':
+                    self.explainers[model_type] = [shap.TreeExplainer(m) for m in ensemble.models]
+
+    def explain(self, model_type, X):
+        """
+        SHAP values of every seed
+
+        Linear models are explained exactly on the margin against the
+        training mean (the background mean with 'interventional').
+
+        Returns:
+            Array (n_seeds, n_rows, n_features)
+        """
+        ensemble = self.ensembles[model_type]
+        if model_type in self.background_paths:
+            return ensemble.interventional_contributions(X, self.background_paths[model_type])
+        if model_type not in self.explainers:
+            return ensemble.contributions(X, reference=self.reference)
+        from shap_analysis import select_positive_class
+        return np.stack([
+            select_positive_class(np.asarray(explainer.shap_values(X)))
+            for explainer in self.explainers[model_type]
+        ])
+
+    def score(self, X):
+        """
+        Returns:
+            Dictionary {model_type: row_stability(...)}
+        """
+        return {
+            model_type: row_stability(self.explain(model_type, X), self.top_k_list)
+            for model_type in self.ensembles
+        }
+
+    def rows_to_array(self, rows):
+        """
+        Rows as lists (in feature order) or dictionaries {feature: value}
+
+        Raises:
+            ValueError: If there are no rows, or a row misses features or has
+                        unknown ones
+        """
+        n_features = len(self.feature_names)
+        if not isinstance(rows, list) or not rows:
+            raise ValueError("'rows' must be a non-empty list")
+        if isinstance(rows[0], dict):
+            X = np.zeros((len(rows), n_features))
+            for r, row in enumerate(rows):
+                if not isinstance(row, dict):
+                    raise ValueError(f'row {r}: expected a dictionary like row 0')
+                unknown = sorted(set(row) - set(self.feature_names))
+                missing = [name for name in self.feature_names if name not in row]
+                if unknown or missing:
+                    raise ValueError(f'row {r}: unknown features {unknown}, missing features {missing}')
+                X[r] = [row[name] for name in self.feature_names]
+            return X
+        X = np.asarray(rows, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != n_features:
+            raise ValueError(f'rows must have {n_features} values each (the features of /info), '
+                             f'got shape {X.shape}')
+        return X
+
+
+def _slice_result(result, start, stop):
+    if isinstance(result, dict):
+        return {k: _slice_result(v, start, stop) for k, v in result.items()}
+    return result[start:stop]
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into one batch per model call
+
+    The first waiting request opens a batch; requests arriving within
+    max_wait seconds join it until max_rows rows are collected.
+    """
+
+    def __init__(self, func, max_rows=64, max_wait=0.005):
+        """
+        Args:
+            func: Function X (n, d) -> nested dictionary of arrays with n rows
+            max_rows: Upper limit of rows per batch
+            max_wait: Seconds a batch waits for more requests
+        """
+        self.func = func
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        """
+        Returns:
+            Future resolving to func's result for the rows of X
+        """
+        future = Future()
+        self._queue.put((X, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            n_rows = len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+            self._run(pending)
+
+    def _run(self, pending):
+        try:
+            result = self.func(np.concatenate([X for X, _ in pending]))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        start = 0
+        for X, future in pending:
+            future.set_result(_slice_result(result, start, start + len(X)))
+            start += len(X)
+        self.rows += start
+
+
+def _to_json(value):
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _row_records(result, n_rows):
+    """{model: {metric: array (n, ...)}} -> list of {model: {metric: row value}}"""
+    return [
+        {model: {metric: _to_json(values[i]) for metric, values in metrics.items()}
+         for model, metrics in result.items()}
+        for i in range(n_rows)
+    ]
+
+
+def make_handler(scorer, batcher, timeout=30.0):
+    """Request handler class bound to a scorer and batcher"""
+
+    class StabilityHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != '/info':
+                return self._send(404, {'error': 'not found'})
+            self._send(200, {
+                'models': {m: e.seeds for m, e in scorer.ensembles.items()},
+                'features': scorer.feature_names,
+                'top_k': scorer.top_k_list,
+                'method': scorer.method,
+                'values': 'path attributions (not SHAP)' if scorer.method == 'paths' else 'SHAP',
+                'max_batch_rows': batcher.max_rows,
+                'max_wait_ms': batcher.max_wait * 1000,
+                'batches': batcher.batches,
+                'rows': batcher.rows
+            })
+
+        def do_POST(self):
+            if self.path != '/score':
+                return self._send(404, {'error': 'not found'})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                rows = json.loads(self.rfile.read(length))['rows']
+                X = scorer.rows_to_array(rows)
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send(400, {'error': f'bad request: {e}'})
+            try:
+                result = batcher.submit(X).result(timeout=timeout)
+            except Exception as e:
+                return self._send(500, {'error': str(e)})
+            self._send(200, {'rows': _row_records(result, len(X))})
+
+        def log_message(self, format, *args):
+            pass
+
+    return StabilityHandler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server on a Unix domain socket"""
+    address_family = socket.AF_UNIX
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(scorer, host='127.0.0.1', port=8765, unix_socket=None, max_rows=64, max_wait=0.005):
+    """
+    Build the service (call serve_forever() on the result)
+
+    Args:
+        scorer: StabilityScorer
+        host, port: TCP address (ignored with unix_socket)
+        unix_socket: Path of a Unix domain socket
+        max_rows, max_wait: Micro-batching settings
+
+    Returns:
+        (server, batcher)
+    """
+    batcher = MicroBatcher(scorer.score, max_rows=max_rows, max_wait=max_wait)
+    # Warm up explainers and the first model call
+    scorer.score(np.tile(scorer.reference, (2, 1)))
+    handler = make_handler(scorer, batcher)
+    if unix_socket:
+        server = UnixHTTPServer(unix_socket, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+    return server, batcher
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30.0):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def connect(host='127.0.0.1', port=8765, unix_socket=None, timeout=30.0):
+    """Keep-alive connection to the service"""
+    if unix_socket:
+        return _UnixConnection(unix_socket, timeout=timeout)
+    return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+def score_rows(connection, rows):
+    """Score rows through a connection; returns the decoded response"""
+    body = json.dumps({'rows': _to_json(np.asarray(rows))})
+    connection.request('POST', '/score', body=body, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    if response.status != 200:
+        raise RuntimeError(payload.get('error', response.status))
+    return payload
+
+
+def load_test(rows, n_requests=1000, concurrency=8, rows_per_request=1, host='127.0.0.1',
+              port=8765, unix_socket=None, random_state=0):
+    """
+    Closed-loop load generator
+
+    Each of `concurrency` clients sends requests of `rows_per_request` rows
+    drawn from `rows` back to back over its own keep-alive connection.
+
+    Returns:
+        Dictionary with request/row counts, errors, throughput (rows/s) and
+        latency percentiles in milliseconds
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    rng = np.random.RandomState(random_state)
+    picks = rng.randint(0, len(rows), size=(n_requests, rows_per_request))
+    latencies = np.full(n_requests, np.nan)
+    errors = []
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def client():
+        connection = connect(host, port, unix_socket)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            try:
+                score_rows(connection, rows[picks[i]])
+                latencies[i] = time.perf_counter() - start
+            except Exception as e:
+                errors.append(str(e))
+                connection.close()
+                connection = connect(host, port, unix_socket)
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    ok = latencies[~np.isnan(latencies)] * 1000
+    percentiles = np.percentile(ok, [50, 95, 99]) if len(ok) else [np.nan] * 3
+    return {
+        'requests': n_requests,
+        'rows_per_request': rows_per_request,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'seconds': seconds,
+        'throughput_rows': len(ok) * rows_per_request / seconds,
+        'p50_ms': percentiles[0],
+        'p95_ms': percentiles[1],
+        'p99_ms': percentiles[2],
+        'max_ms': ok.max() if len(ok) else np.nan
+    }
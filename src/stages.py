@@ -0,0 +1,600 @@
+"""
+Pipeline stages and graph builders for the stability analysis
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+Each stage is a plain function of its upstream outputs. The run_* scripts
+only describe which stages to connect; pipeline.StageRunner executes them.
+"""
+
+import os
+
+import numpy as np
+
+from data_loader import (
+    load_dataset, dataset_fingerprint,
+    prepare_data, subsample_data, get_feature_groups, feature_group_matrix
+)
+from models import (
+    train_xgboost, train_random_forest, train_logistic_regression,
+    train_ridge_regression, get_task_type, save_model
+)
+from shap_analysis import (
+    compute_shap_for_model, compute_kernel_shap_adaptive, select_positive_class, save_shap_values
+)
+from background import summarize_background
+from stability_metrics import compute_stability_metrics, compare_models_stability
+from precision import cast_features, working_dtype
+
+
+# Models compared per task (logistic regression needs a binary target)
+TASK_MODELS = {
+    'classification': ['xgboost', 'random_forest', 'logistic_regression'],
+    'regression': ['xgboost', 'random_forest', 'ridge']
+}
+
+TREE_MODELS = ['xgboost', 'random_forest']
+KERNEL_MODELS = ['logistic_regression', 'ridge']
+
+MODEL_NAMES = {
+    'xgboost': 'XGBoost',
+    'random_forest': 'Random Forest',
+    'logistic_regression': 'Logistic Regression',
+    'ridge': 'Ridge Regression'
+}
+
+
+def load_stage(dataset='adult', fingerprint=None):
+    """Load a registered dataset; `fingerprint` only invalidates the cache when the data changes"""
+    return load_dataset(dataset)
+
+
+def feature_groups_stage(dataset='adult', fingerprint=None):
+    """Encoded columns and their source-feature groups recorded by the loader"""
+    X, _ = load_stage(dataset)
+    return {'columns': X.columns.tolist(), 'groups': get_feature_groups(X)}
+
+
+def split_stage(data, test_size=0.2, random_state=42, precision='float64'):
+    """
+    Split and scale; returns a dict with X_train, X_test, y_train, y_test, scaler and task
+
+    The scaled features are cast to `precision` ('float32' or 'float64'),
+    which every downstream stage inherits.
+    """
+    X, y = data
+    X_train, X_test, y_train, y_test, scaler = prepare_data(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    X_train, X_test = cast_features(X_train, precision), cast_features(X_test, precision)
+    return {
+        'X_train': X_train, 'X_test': X_test,
+        'y_train': y_train, 'y_test': y_test,
+        'scaler': scaler, 'task': get_task_type(y_train), 'rate': 1.0
+    }
+
+
+def subsample_stage(split, rate=1.0, random_state=42):
+    """Subsample the training part of a split"""
+    X_train, y_train = subsample_data(split['X_train'], split['y_train'],
+                                      rate=rate, random_state=random_state)
+    return dict(split, X_train=X_train, y_train=y_train, rate=rate)
+
+
+def explain_set_stage(split, n_samples=100, random_state=42):
+    """Pick the test instances to explain, shared by every model and seed"""
+    X_test = split['X_test']
+    if n_samples is None or n_samples >= len(X_test):
+        return X_test
+    indices = np.random.RandomState(random_state).choice(len(X_test), size=n_samples, replace=False)
+    return X_test.iloc[indices]
+
+
+def train_stage(split, model_type, seed, params=None, save_path=None, n_jobs=None):
+    """Train one model for one seed; `n_jobs` (threads) overrides params without changing the result"""
+    params = dict(params or {})
+    params.pop('random_state', None)
+    if n_jobs is not None and model_type != 'ridge':
+        params['n_jobs'] = n_jobs
+    X_train, y_train, task = split['X_train'], split['y_train'], split['task']
+
+    if model_type == 'xgboost':
+        model = train_xgboost(X_train, y_train, task=task, random_state=seed, **params)
+    elif model_type == 'random_forest':
+        model = train_random_forest(X_train, y_train, task=task, random_state=seed, **params)
+    elif model_type == 'logistic_regression':
+        model = train_logistic_regression(X_train, y_train, random_state=seed, **params)
+    elif model_type == 'ridge':
+        model = train_ridge_regression(X_train, y_train, random_state=seed, **params)
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    if save_path:
+        save_model(model, save_path)
+    return model
+
+
+def explain_stage(model, split, X_explain, model_type, seed, nsamples_shap=100,
+                  kernel_options=None, background=None, batch_size=None, save_path=None,
+                  feature_perturbation='tree_path_dependent', verbose=False):
+    """
+    Compute SHAP values (positive class) for the shared explain set
+
+    With kernel_options (see kernel_options()), model-agnostic explainers use
+    adaptive-precision KernelSHAP; the achieved standard errors are saved as
+    'std_errors' next to the values. A background summary (see
+    background_stage) replaces the per-call random KernelSHAP background;
+    with feature_perturbation='interventional' tree models are explained
+    against the same summary (interventional TreeSHAP).
+    batch_size bounds the rows per model call of model-agnostic explainers.
+    verbose prints the achieved standard errors; it is off in graph stages,
+    whose worker threads and processes would interleave with the runner's
+    output.
+    """
+    extra = {}
+    if kernel_options and model_type in KERNEL_MODELS:
+        shap_values, _, std_errors = compute_kernel_shap_adaptive(
+            model, split['X_train'], X_explain, n_samples=None, random_state=seed,
+            background=background, batch_size=batch_size, **kernel_options
+        )
+        extra['std_errors'] = std_errors
+        if verbose:
+            print(f"  {model_type} seed {seed}: SHAP standard error mean {std_errors.mean():.4f}, "
+                  f"max {std_errors.max():.4f}")
+    else:
+        kwargs = {}
+        if model_type in KERNEL_MODELS:
+            kwargs = {'nsamples_shap': nsamples_shap, 'background': background}
+        elif feature_perturbation == 'interventional':
+            if background is None:
+                raise ValueError("Interventional TreeSHAP needs a background summary")
+            kwargs = {'background': background}
+        shap_values, _ = compute_shap_for_model(
+            model, split['X_train'], X_explain, model_type,
+            n_samples=None, random_state=seed, batch_size=batch_size, **kwargs
+        )
+        shap_values = select_positive_class(shap_values)
+    # SHAP tensors follow the precision of the explain set
+    shap_values = np.asarray(shap_values).astype(working_dtype(X_explain), copy=False)
+    if save_path:
+        save_shap_values(shap_values, save_path, **extra)
+    return shap_values
+
+
+def background_stage(split, method='kmeans', size=100, random_state=0):
+    """Weighted background summary of the training set, shared by all models and seeds"""
+    return summarize_background(split['X_train'], split['y_train'], method=method,
+                                size=size, random_state=random_state)
+
+
+def background_explain_stage(model, split, X_explain, background, **kwargs):
+    """explain_stage with a shared background summary"""
+    return explain_stage(model, split, X_explain, background=background, **kwargs)
+
+
+def metrics_stage(*shap_values, seeds, top_k_list=(3, 5, 10)):
+    """Stability metrics across the seeds of one model"""
+    return compute_stability_metrics(dict(zip(seeds, shap_values)), top_k_list=list(top_k_list))
+
+
+def grouped_metrics_stage(feature_groups, *shap_values, seeds, top_k_list=(3, 5, 10)):
+    """Stability metrics per original feature (one-hot dummies summed per source column)"""
+    matrix, names = feature_group_matrix(feature_groups['columns'], feature_groups['groups'])
+    return compute_stability_metrics(dict(zip(seeds, shap_values)), top_k_list=list(top_k_list),
+                                     group_matrix=matrix, group_names=names)
+
+
+def interaction_stage(X_explain, *models, seeds, top_n=20, memory_limit_mb=512, save_path=None,
+                      group_matrix=None, group_names=None):
+    """Stability of pairwise SHAP interactions across the seeds of one tree model"""
+    from interaction_stability import compute_interaction_stability
+
+    result = compute_interaction_stability(dict(zip(seeds, models)), X_explain, top_n=top_n,
+                                           memory_limit_mb=memory_limit_mb, group_matrix=group_matrix,
+                                           group_names=group_names)
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        result['top_pairs'].to_csv(save_path, index=False)
+    return result
+
+
+def grouped_interaction_stage(feature_groups, X_explain, *models, **kwargs):
+    """Interaction stability per original feature pair (one-hot dummies summed per source column)"""
+    matrix, names = feature_group_matrix(feature_groups['columns'], feature_groups['groups'])
+    return interaction_stage(X_explain, *models, group_matrix=matrix, group_names=names, **kwargs)
+
+
+def comparison_stage(*metrics, model_names, save_path=None):
+    """Comparison table across models"""
+    comparison_df = compare_models_stability(dict(zip(model_names, metrics)))
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        comparison_df.to_csv(save_path, index=False)
+    return comparison_df
+
+
+def results_store_stage(split, *metrics, dataset, model_types, seeds, store_path=None, run_id=None,
+                        shap_dir=None):
+    """Bulk-insert the metrics (and SHAP file paths) of every model into the results store"""
+    from results_store import ResultsStore, stability_rows
+
+    store = ResultsStore(store_path)
+    rate, n_train = split['rate'], len(split['X_train'])
+    rows, artifacts = [], []
+    for model_type, model_seeds, model_metrics in zip(model_types, seeds, metrics):
+        rows.extend(stability_rows(dataset, model_type, model_metrics, rate=rate, n_train=n_train,
+                                   seeds=model_seeds))
+        if shap_dir:
+            artifacts.extend({'dataset': dataset, 'rate': rate, 'model': model_type, 'seed': seed, 'kind': 'shap',
+                              'path': os.path.join(shap_dir, f'{model_type}_seed_{seed}_shap.npz')}
+                             for seed in model_seeds)
+    store.add_metrics(run_id, rows)
+    if artifacts:
+        store.add_artifacts(run_id, artifacts)
+    return len(rows)
+
+
+def add_data_stages(graph, dataset='adult', test_size=0.2, random_state=42,
+                    n_samples=100, rate=1.0, prefix='', precision='float64'):
+    """
+    Add load -> split (-> subsample) -> explain-set stages
+
+    A float32 run gets its own split stage ('{dataset}/split_float32'), so
+    float64 artifacts are kept and reused.
+
+    Returns:
+        (split stage name, explain-set stage name)
+    """
+    load = f'{dataset}/load'
+    if load not in graph.stages:
+        graph.add(load, load_stage, params={'dataset': dataset, 'fingerprint': dataset_fingerprint(dataset)})
+    split_params = {'test_size': test_size, 'random_state': random_state}
+    split, explain_set = f'{dataset}/split', f'{dataset}/explain_set'
+    if precision != 'float64':
+        split_params['precision'] = precision
+        split, explain_set = f'{split}_{precision}', f'{explain_set}_{precision}'
+    if split not in graph.stages:
+        graph.add(split, split_stage, deps=[load], params=split_params)
+    if explain_set not in graph.stages:
+        graph.add(explain_set, explain_set_stage, deps=[split],
+                  params={'n_samples': n_samples, 'random_state': random_state})
+    if rate < 1.0:
+        split = graph.add(f'{prefix}subsample', subsample_stage, deps=[split],
+                          params={'rate': rate, 'random_state': random_state})
+    return split, explain_set
+
+
+def add_feature_groups_stage(graph, dataset='adult'):
+    """
+    Add the feature-group stage of a dataset (no-op if present)
+
+    Returns:
+        Name of the stage, for add_model_stages(feature_groups=...)
+    """
+    name = f'{dataset}/feature_groups'
+    if name not in graph.stages:
+        graph.add(name, feature_groups_stage, params={
+            'dataset': dataset, 'fingerprint': dataset_fingerprint(dataset)
+        })
+    return name
+
+
+def add_train_stage(graph, split, model_type, seed, params=None, prefix='', models_dir=None, labels=None,
+                    n_jobs=None):
+    """
+    Add the train(model, seed) stage (no-op if present)
+
+    Returns:
+        Name of the train stage
+    """
+    train = f'{prefix}train/{model_type}/{seed}'
+    if train in graph.stages:
+        return train
+    return graph.add(
+        train, train_stage, deps=[split],
+        params={'model_type': model_type, 'seed': seed, 'params': params or {}},
+        extra={'save_path': os.path.join(models_dir, f'{model_type}_seed_{seed}.pkl') if models_dir else None,
+               'n_jobs': n_jobs},
+        labels=dict(labels or {}, model=model_type, seed=seed, stage='train')
+    )
+
+
+def add_seed_stages(graph, split, explain_set, model_type, seed, params=None,
+                    nsamples_shap=100, kernel_options=None, background=None, batch_size=None,
+                    prefix='', models_dir=None, shap_dir=None, labels=None, n_jobs=None):
+    """
+    Add train(model, seed) -> explain stages for one seed (no-op if present)
+
+    With a background spec ({'method', 'size'}, see background_spec()),
+    model-agnostic explainers share one cached background summary per split;
+    with 'trees' in the spec, tree models are explained against it too
+    (interventional TreeSHAP).
+
+    Returns:
+        Name of the explain stage
+    """
+    explain = f'{prefix}explain/{model_type}/{seed}'
+    if explain in graph.stages:
+        return explain
+    cell = dict(labels or {}, model=model_type, seed=seed)
+    train = add_train_stage(graph, split, model_type, seed, params=params, prefix=prefix,
+                            models_dir=models_dir, labels=labels, n_jobs=n_jobs)
+    explain_params = {'model_type': model_type, 'seed': seed, 'nsamples_shap': nsamples_shap}
+    if kernel_options:
+        # Only part of the key when set, so fixed-sample runs keep their cache
+        explain_params['kernel_options'] = kernel_options
+    deps, func = [train, split, explain_set], explain_stage
+    summary = background_for(background, model_type)
+    if summary:
+        deps, func = deps + [add_background_stage(graph, split, **summary)], background_explain_stage
+        if model_type in TREE_MODELS:
+            explain_params['feature_perturbation'] = 'interventional'
+    return graph.add(
+        explain, func, deps=deps,
+        params=explain_params,
+        extra={
+            'save_path': os.path.join(shap_dir, f'{model_type}_seed_{seed}_shap.npz') if shap_dir else None,
+            # Execution detail only: not part of the stage key
+            'batch_size': batch_size
+        },
+        labels=dict(cell, stage='explain')
+    )
+
+
+def add_model_stages(graph, split, explain_set, model_type, seeds, params=None,
+                     nsamples_shap=100, kernel_options=None, background=None, batch_size=None,
+                     top_k_list=(3, 5, 10), feature_groups=None, prefix='', models_dir=None,
+                     shap_dir=None, labels=None, n_jobs=None):
+    """
+    Add train(model, seed) -> explain -> metrics stages for one model type
+
+    Args:
+        graph: StageGraph
+        split, explain_set: Stage names from add_data_stages
+        model_type: 'xgboost', 'random_forest', 'logistic_regression' or 'ridge'
+        seeds: Random seeds
+        params: Model hyperparameters
+        nsamples_shap: KernelSHAP samples (model-agnostic explainers only)
+        kernel_options: Adaptive KernelSHAP options (see kernel_options())
+        background: Background summary spec (see background_spec())
+        batch_size: Rows per model call for model-agnostic explainers
+        top_k_list: Top-k values for consistency analysis
+        feature_groups: Stage name from add_feature_groups_stage; metrics are
+                        then computed per original (pre one-hot) feature
+        prefix: Stage name prefix (e.g. 'rate_0.5/')
+        models_dir, shap_dir: Export directories for models / SHAP npz files
+        labels: Extra stage labels (e.g. {'rate': 0.5}) for checkpoints
+        n_jobs: Threads per training stage (not part of the stage key)
+
+    Returns:
+        Name of the metrics stage
+    """
+    explain_names = [
+        add_seed_stages(graph, split, explain_set, model_type, seed, params=params,
+                        nsamples_shap=nsamples_shap, kernel_options=kernel_options,
+                        background=background, batch_size=batch_size,
+                        prefix=prefix, models_dir=models_dir,
+                        shap_dir=shap_dir, labels=labels, n_jobs=n_jobs)
+        for seed in seeds
+    ]
+    deps, func = explain_names, metrics_stage
+    if feature_groups:
+        deps, func = [feature_groups] + explain_names, grouped_metrics_stage
+    return graph.add(
+        f'{prefix}metrics/{model_type}', func, deps=deps,
+        params={'seeds': list(seeds), 'top_k_list': list(top_k_list)},
+        labels=dict(labels or {}, model=model_type, stage='metrics')
+    )
+
+
+def add_interaction_stage(graph, split, explain_set, model_type, seeds, params=None, top_n=20,
+                          memory_limit_mb=512, feature_groups=None, prefix='', models_dir=None,
+                          save_path=None, labels=None, n_jobs=None):
+    """
+    Add train(model, seed) -> interaction stability stages for one tree model
+
+    The train stages are shared with add_model_stages. The memory ceiling
+    only sets the chunk size and is not part of the stage key.
+
+    Args:
+        top_n: Interaction pairs kept and compared across seeds
+        memory_limit_mb: Ceiling on the interaction values held at once
+        feature_groups: Stage name from add_feature_groups_stage; interactions
+                        are then computed per original feature pair
+        Others: See add_model_stages
+
+    Returns:
+        Name of the interaction stage
+    """
+    if model_type not in TREE_MODELS:
+        raise ValueError(f"Interaction values need a tree model, not {model_type}")
+    trains = [
+        add_train_stage(graph, split, model_type, seed, params=params, prefix=prefix,
+                        models_dir=models_dir, labels=labels, n_jobs=n_jobs)
+        for seed in seeds
+    ]
+    deps, func = [explain_set] + trains, interaction_stage
+    if feature_groups:
+        deps, func = [feature_groups] + deps, grouped_interaction_stage
+    return graph.add(
+        f'{prefix}interactions/{model_type}', func, deps=deps,
+        params={'seeds': list(seeds), 'top_n': top_n},
+        extra={'memory_limit_mb': memory_limit_mb, 'save_path': save_path},
+        labels=dict(labels or {}, model=model_type, stage='interactions')
+    )
+
+
+def add_background_stage(graph, split, method='kmeans', size=100, random_state=0):
+    """
+    Add the background summary stage of a split (no-op if present)
+
+    The split stage already identifies (dataset, subsample), so there is one
+    summary per (dataset, subsample, method, size).
+
+    Returns:
+        Name of the background stage
+    """
+    name = f'{split}/background/{method}_{size}'
+    if name not in graph.stages:
+        graph.add(name, background_stage, deps=[split],
+                  params={'method': method, 'size': size, 'random_state': random_state})
+    return name
+
+
+def seed_explainer(runner, graph, split, explain_set, model_type, **kwargs):
+    """
+    Function seed -> SHAP values that adds and runs one seed's stages on demand
+
+    Used by seed_scheduler.schedule_seeds; outputs are cached like any other
+    stage, so a later fixed-seed run reuses them.
+
+    Args:
+        runner: StageRunner
+        graph: StageGraph containing split and explain_set
+        split, explain_set: Stage names from add_data_stages
+        model_type: Model type
+        **kwargs: Passed to add_seed_stages (params, nsamples_shap, ...)
+    """
+    def explain(seed):
+        name = add_seed_stages(graph, split, explain_set, model_type, seed, **kwargs)
+        return runner.run(graph, targets=[name])[name]
+    return explain
+
+
+def add_comparison_stage(graph, metrics_names, model_types, prefix='', save_path=None):
+    """Add the model comparison report stage"""
+    return graph.add(
+        f'{prefix}report/comparison', comparison_stage, deps=metrics_names,
+        params={'model_names': [MODEL_NAMES[m] for m in model_types]},
+        extra={'save_path': save_path}, cache=False
+    )
+
+
+def dataset_task(config, dataset):
+    """Task of a dataset: config.DATASETS, else the synthetic spec, else classification"""
+    from data_loader import DATASET_REGISTRY
+
+    if dataset in config.DATASETS:
+        return config.DATASETS[dataset]['task']
+    return DATASET_REGISTRY.get(dataset, {}).get('spec', {}).get('task', 'classification')
+
+
+def add_results_store_stage(graph, split, metrics_names, model_types, seeds, dataset='adult', prefix='',
+                            store_path=None, run_id=None, shap_dir=None):
+    """
+    Add the stage recording a run's metrics in the results store
+
+    Args:
+        split: Split stage of the metrics (its rate and size are recorded)
+        metrics_names, model_types: Metrics stages and their model types
+        seeds: Seeds per model type ({model_type: seeds}) or one list for all
+        store_path: results_store database (None: no stage is added)
+        run_id: Run from ResultsStore.start_run
+        shap_dir: Directory the SHAP npz files were exported to (paths recorded)
+
+    Returns:
+        Name of the stage, or None
+    """
+    if not store_path:
+        return None
+    if not isinstance(seeds, dict):
+        seeds = {model_type: seeds for model_type in model_types}
+    return graph.add(
+        f'{prefix}report/results_store', results_store_stage, deps=[split] + list(metrics_names),
+        params={'dataset': dataset, 'model_types': list(model_types),
+                'seeds': [list(seeds[m]) for m in model_types]},
+        extra={'store_path': store_path, 'run_id': run_id, 'shap_dir': shap_dir}, cache=False
+    )
+
+
+def model_params(config, model_type):
+    """Hyperparameters for a model type from a config module (random_state removed)"""
+    params = dict(config.MODELS.get(model_type, {}).get('params', {}))
+    params.pop('random_state', None)
+    return params
+
+
+def kernel_options(config):
+    """
+    Adaptive KernelSHAP options from SHAP_CONFIG['kernel_explainer']
+
+    Returns:
+        Keyword arguments for compute_kernel_shap_adaptive, or None when
+        the config uses a fixed number of samples
+    """
+    kernel = config.SHAP_CONFIG['kernel_explainer']
+    if not kernel.get('adaptive', False):
+        return None
+    return {k: kernel[k] for k in ('target_se', 'max_coalitions', 'max_evaluations') if k in kernel}
+
+
+def background_spec(config):
+    """
+    Background summary spec from SHAP_CONFIG['background']
+
+    With SHAP_CONFIG['tree_explainer']['feature_perturbation'] set to
+    'interventional', the spec is marked for tree models ('trees': True) and
+    a 'random' method also becomes one shared summary, so every model and
+    seed is explained against the same background rows.
+
+    Returns:
+        {'method', 'size'[, 'trees']} for add_seed_stages, or None for the
+        per-call random background
+    """
+    background = config.SHAP_CONFIG.get('background', {})
+    trees = config.SHAP_CONFIG.get('tree_explainer', {}).get('feature_perturbation') == 'interventional'
+    if background.get('method', 'random') == 'random' and not trees:
+        return None
+    spec = {'method': background.get('method', 'random'), 'size': background.get('size', 100)}
+    if trees:
+        spec['trees'] = True
+    return spec
+
+
+def background_for(background, model_type):
+    """
+    Summary ({'method', 'size'}) a model type is explained against under a
+    background spec, or None (per-call background / path-dependent TreeSHAP)
+    """
+    if not background or (model_type in TREE_MODELS and not background.get('trees')):
+        return None
+    return {'method': background['method'], 'size': background['size']}
+
+
+def precision_for(config):
+    """Working precision from the config ('float64' if not set)"""
+    return getattr(config, 'PRECISION', 'float64')
+
+
+def feature_groups_for(graph, config, dataset='adult'):
+    """Feature-group stage when STABILITY_CONFIG['group_one_hot'] is set, else None"""
+    if not config.STABILITY_CONFIG.get('group_one_hot', False):
+        return None
+    return add_feature_groups_stage(graph, dataset)
+
+
+def planned_config(budget_seconds, model_types, base_config, rates=(1.0,), runner=None, dataset='adult'):
+    """
+    Calibrate on the (cached) split of a dataset and plan a run for a time budget
+
+    Args:
+        budget_seconds: Wall-clock budget
+        model_types: Models in the run
+        base_config: Config module to start from
+        rates: Subsample rates of the run
+        runner: StageRunner used to load the split (default: new runner)
+        dataset: Dataset key
+
+    Returns:
+        Config namespace (see planner.make_config)
+    """
+    from pipeline import StageGraph, StageRunner
+    from planner import plan_config, print_plan
+
+    graph = StageGraph()
+    split, _ = add_data_stages(graph, dataset)
+    runner = runner or StageRunner(verbose=False)
+    data = runner.run(graph, targets=[split])[split]
+    planned = plan_config(budget_seconds, data['X_train'], data['y_train'], data['X_test'],
+                          model_types, base_config, rates=rates)
+    print_plan(planned)
+    return planned
@@ -0,0 +1,285 @@
+"""
+Synthetic tabular datasets of any size for load testing
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+A dataset is defined by a spec (rows, numeric and categorical columns,
+cardinality, fraction of informative features, within-block correlation,
+task, noise and seed). Rows are generated in fixed-size chunks, each from
+its own random stream seeded by (seed, chunk index), so any chunk can be
+generated on its own, in any order or in parallel, and the data never
+depends on how much of it is generated at once. The coefficients that link
+features to the target depend only on the seed.
+
+Correlation structure: features are grouped into blocks of `block_size`
+consecutive columns sharing one latent factor, so two features in a block
+have correlation `correlation`, features in different blocks are
+independent. Categorical columns are latent normals of the same kind cut
+into `cardinality` equiprobable levels.
+
+Datasets are streamed to a directory of npz chunks (float32 numeric
+columns, int16 level codes, target) that can be read back whole or chunk
+by chunk.
+
+Usage:
+    spec = synthetic_spec(rows=5_000_000, numeric=80, categorical=20)
+    write_synthetic_dataset('data/synthetic/big', spec, workers=4)
+    for chunk in iter_synthetic_chunks('data/synthetic/big', spec): ...
+    X, y = load_synthetic('data/synthetic/big', spec)
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+SYNTHETIC_DEFAULTS = {
+    'rows': 50_000,
+    'numeric': 20,
+    'categorical': 5,
+    'cardinality': 8,
+    'informative': 0.25,
+    'correlation': 0.5,
+    'block_size': 5,
+    'task': 'classification',
+    'noise': 1.0,
+    'seed': 0,
+    'chunk_rows': 100_000
+}
+
+
+def synthetic_spec(**overrides):
+    """
+    Complete spec from defaults and overrides
+
+    Args:
+        rows: Number of rows
+        numeric, categorical: Number of numeric / categorical columns
+        cardinality: Levels per categorical column
+        informative: Fraction of columns with a non-zero effect on the target
+        correlation: Correlation of features within a block (0 to < 1)
+        block_size: Columns per correlated block
+        task: 'classification' (binary) or 'regression'
+        noise: Scale of the target noise
+        seed: Seed of the coefficients and of every chunk
+        chunk_rows: Rows per generated chunk (part of the data's identity)
+
+    Returns:
+        Spec dictionary
+    """
+    unknown = set(overrides) - set(SYNTHETIC_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown synthetic options: {sorted(unknown)}")
+    spec = dict(SYNTHETIC_DEFAULTS, **overrides)
+    if not 0 <= spec['correlation'] < 1:
+        raise ValueError("correlation must be in [0, 1)")
+    if spec['task'] not in ['classification', 'regression']:
+        raise ValueError("task must be 'classification' or 'regression'")
+    if spec['cardinality'] < 2 and spec['categorical']:
+        raise ValueError("cardinality must be at least 2")
+    return spec
+
+
+def spec_hash(spec):
+    """Short content hash of a spec"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def column_names(spec):
+    """Numeric then categorical column names"""
+    return ([f'num_{j}' for j in range(spec['numeric'])] +
+            [f'cat_{j}' for j in range(spec['categorical'])])
+
+
+def synthetic_coefficients(spec):
+    """
+    Effects of the features on the target (depend on the seed only)
+
+    Returns:
+        Dictionary {'weights': (numeric,), 'level_effects': (categorical,
+        cardinality), 'informative': names of informative columns}
+    """
+    rng = np.random.default_rng([spec['seed'], 2 ** 31])
+    n_columns = spec['numeric'] + spec['categorical']
+    n_informative = int(round(spec['informative'] * n_columns))
+    informative = np.zeros(n_columns, dtype=bool)
+    informative[rng.choice(n_columns, size=n_informative, replace=False)] = True
+
+    weights = rng.normal(size=spec['numeric']) * informative[:spec['numeric']]
+    level_effects = rng.normal(size=(spec['categorical'], spec['cardinality']))
+    level_effects *= informative[spec['numeric']:, None]
+    # Unit signal variance regardless of the number of informative columns
+    scale = np.sqrt(max(n_informative, 1))
+    names = column_names(spec)
+    return {'weights': weights / scale, 'level_effects': level_effects / scale,
+            'informative': [names[j] for j in np.flatnonzero(informative)]}
+
+
+def n_chunks(spec):
+    return -(-spec['rows'] // spec['chunk_rows'])
+
+
+def _chunk_arrays(spec, index, coefficients):
+    """Chunk as arrays: float32 numeric columns, int16 level codes and target"""
+    from scipy.special import ndtri
+
+    start = index * spec['chunk_rows']
+    n = min(spec['chunk_rows'], spec['rows'] - start)
+    if n <= 0:
+        raise IndexError(f"Chunk {index} is past the end ({n_chunks(spec)} chunks)")
+    rng = np.random.default_rng([spec['seed'], index])
+
+    n_columns = spec['numeric'] + spec['categorical']
+    n_blocks = -(-n_columns // spec['block_size'])
+    factors = rng.standard_normal((n, n_blocks), dtype=np.float32)
+    latent = rng.standard_normal((n, n_columns), dtype=np.float32)
+    rho = spec['correlation']
+    latent *= np.float32(np.sqrt(1 - rho))
+    latent += np.float32(np.sqrt(rho)) * np.repeat(factors, spec['block_size'], axis=1)[:, :n_columns]
+
+    numeric = latent[:, :spec['numeric']]
+    # Equiprobable levels: cut points at the normal quantiles
+    cuts = ndtri(np.arange(1, spec['cardinality']) / spec['cardinality']).astype(np.float32)
+    codes = np.searchsorted(cuts, latent[:, spec['numeric']:]).astype(np.int16)
+
+    score = numeric @ coefficients['weights'].astype(np.float32)
+    for j in range(spec['categorical']):
+        score += coefficients['level_effects'][j][codes[:, j]]
+    if spec['task'] == 'classification':
+        target = (score + spec['noise'] * rng.logistic(size=n) > 0).astype(np.int64)
+    else:
+        target = score + spec['noise'] * rng.standard_normal(n)
+    return {'numeric': np.ascontiguousarray(numeric), 'codes': codes, 'target': target}
+
+
+def _chunk_frame(spec, index, arrays):
+    names = column_names(spec)
+    categories = [f'L{k}' for k in range(spec['cardinality'])]
+    frame = pd.DataFrame(arrays['numeric'], columns=names[:spec['numeric']])
+    for j, name in enumerate(names[spec['numeric']:]):
+        frame[name] = pd.Categorical.from_codes(arrays['codes'][:, j], categories=categories)
+    frame['target'] = arrays['target']
+    start = index * spec['chunk_rows']
+    frame.index = pd.RangeIndex(start, start + len(frame))
+    return frame
+
+
+def generate_chunk(spec, index, coefficients=None):
+    """
+    Rows of one chunk
+
+    Args:
+        spec: Spec from synthetic_spec
+        index: Chunk index (0 <= index < n_chunks(spec))
+        coefficients: Output of synthetic_coefficients (computed if omitted)
+
+    Returns:
+        DataFrame with the numeric columns (float32), the categorical
+        columns (levels 'L0', 'L1', ...) and 'target'
+    """
+    arrays = _chunk_arrays(spec, index, coefficients or synthetic_coefficients(spec))
+    return _chunk_frame(spec, index, arrays)
+
+
+def _write_chunk(args):
+    spec, index, coefficients, directory = args
+    path = os.path.join(directory, f'chunk_{index:05d}.npz')
+    tmp_path = f'{path}.tmp.npz'
+    np.savez(tmp_path, **_chunk_arrays(spec, index, coefficients))
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_synthetic_dataset(directory, spec, workers=1, verbose=False):
+    """
+    Stream a dataset to disk chunk by chunk
+
+    Each chunk is written to its own file (chunk_00000.npz, ...) as soon as it
+    is generated, so memory holds at most `workers` chunks. Chunks already on
+    disk for the same spec are kept, so an interrupted run resumes. The spec
+    is written to spec.json in the directory.
+
+    Args:
+        directory: Output directory
+        spec: Spec from synthetic_spec
+        workers: Processes generating chunks
+        verbose: Print one line per chunk
+
+    Returns:
+        The directory
+    """
+    os.makedirs(directory, exist_ok=True)
+    spec_path = os.path.join(directory, 'spec.json')
+    if not synthetic_files_match(directory, spec):
+        for name in os.listdir(directory):
+            if name.startswith('chunk_'):
+                os.remove(os.path.join(directory, name))
+        with open(spec_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(spec, hash=spec_hash(spec)), f, indent=1, sort_keys=True)
+
+    coefficients = synthetic_coefficients(spec)
+    tasks = [(spec, index, coefficients, directory) for index in range(n_chunks(spec))
+             if not os.path.exists(os.path.join(directory, f'chunk_{index:05d}.npz'))]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = pool.map(_write_chunk, tasks)
+            for count, path in enumerate(written, 1):
+                if verbose:
+                    print(f"  [{count}/{len(tasks)}] {path}")
+    else:
+        for count, task in enumerate(tasks, 1):
+            path = _write_chunk(task)
+            if verbose:
+                print(f"  [{count}/{len(tasks)}] {path}")
+    return directory
+
+
+def synthetic_files_match(directory, spec):
+    """Whether the spec recorded in `directory` is `spec`"""
+    try:
+        with open(os.path.join(directory, 'spec.json'), encoding='utf-8') as f:
+            return json.load(f).get('hash') == spec_hash(spec)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+
+
+def iter_synthetic_chunks(directory, spec):
+    """
+    Chunks of a dataset written by write_synthetic_dataset, in order
+
+    Yields:
+        DataFrame per chunk, identical to generate_chunk
+    """
+    for index in range(n_chunks(spec)):
+        with np.load(os.path.join(directory, f'chunk_{index:05d}.npz')) as data:
+            arrays = {key: data[key] for key in data.files}
+        yield _chunk_frame(spec, index, arrays)
+
+
+def load_synthetic(directory=None, spec=None):
+    """
+    Features and target of a synthetic dataset, one-hot encoded like Adult
+
+    Args:
+        directory: Directory to stream the chunks to (and read back); None
+                   generates the chunks in memory
+        spec: Spec from synthetic_spec (default: SYNTHETIC_DEFAULTS)
+
+    Returns:
+        X (DataFrame with X.attrs['feature_groups']), y (Series)
+    """
+    from data_loader import one_hot_encode
+
+    spec = spec or synthetic_spec()
+    if directory is None:
+        coefficients = synthetic_coefficients(spec)
+        chunks = [generate_chunk(spec, index, coefficients) for index in range(n_chunks(spec))]
+    else:
+        write_synthetic_dataset(directory, spec)
+        chunks = list(iter_synthetic_chunks(directory, spec))
+    df = pd.concat(chunks)
+    y = df.pop('target')
+    return one_hot_encode(df, drop_first=True), y
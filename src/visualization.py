@@ -3,16 +3,23 @@ Visualization utilities for SHAP stability analysis
 Student: Keisuke Nishioka (Matrikelnummer: 10081049)
 """
 
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 import pandas as pd
-import shap
 import os
 
 
-def setup_plot_style():
-    """Setup matplotlib style"""
+_STYLE_APPLIED = False
+
+
+def setup_plot_style(force=False):
+    """Setup matplotlib style (once per process unless force=True)"""
+    global _STYLE_APPLIED
+    if _STYLE_APPLIED and not force:
+        return
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    _STYLE_APPLIED = True
     plt.style.use('seaborn-v0_8')
     sns.set_palette("husl")
     plt.rcParams['figure.figsize'] = (10, 6)
@@ -23,7 +30,69 @@ def setup_plot_style():
     plt.rcParams['ytick.labelsize'] = 10
 
 
-def plot_shap_summary(shap_values, X_sample, feature_names=None, save_path=None):
+def binned_beeswarm_points(shap_values, feature_values, n_bins=100, max_per_bin=20, random_state=0):
+    """
+    Downsample a beeswarm to at most max_per_bin points per (feature, SHAP bin)
+    
+    The SHAP axis is cut into n_bins equal bins shared by all features; in
+    every (feature, bin) cell a random subset of at most max_per_bin points is
+    kept and spread vertically in proportion to the cell's density. All
+    features are processed in one vectorised pass.
+    
+    Args:
+        shap_values: SHAP values (n_samples, n_features), features in display order
+        feature_values: Feature values of the same shape (for the colour)
+        n_bins: Bins along the SHAP axis
+        max_per_bin: Points kept per (feature, bin)
+        random_state: Seed for choosing the kept points
+    
+    Returns:
+        Dictionary of flat arrays {'x', 'offset', 'feature', 'color'} and
+        'n_points'; offset lies in [-0.4, 0.4], color in [0, 1]
+    """
+    shap_values = np.asarray(shap_values, dtype=np.float64)
+    feature_values = np.asarray(feature_values, dtype=np.float64)
+    n_samples, n_features = shap_values.shape
+    
+    # Colour: feature value scaled to its 5th-95th percentile
+    low = np.nanpercentile(feature_values, 5, axis=0)
+    high = np.nanpercentile(feature_values, 95, axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    color = np.clip((feature_values - low) / span, 0, 1)
+    color[:, high <= low] = 0.5
+    
+    lo, hi = shap_values.min(), shap_values.max()
+    bins = np.clip(((shap_values - lo) / max(hi - lo, 1e-12) * n_bins).astype(np.int64), 0, n_bins - 1)
+    
+    # Random order within each cell, then group by cell with a stable sort
+    perm = np.random.RandomState(random_state).permutation(n_samples)
+    cell = (np.arange(n_features) * n_bins + bins[perm]).ravel()
+    order = np.argsort(cell, kind='stable')
+    cell_sorted = cell[order]
+    counts = np.bincount(cell, minlength=n_features * n_bins)
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(cell_sorted)) - starts[cell_sorted]
+    keep = rank < max_per_bin
+    
+    kept_cell, kept_rank = cell_sorted[keep], rank[keep]
+    kept = np.minimum(counts, max_per_bin)[kept_cell]
+    density = counts.reshape(n_features, n_bins)
+    density = (density / np.maximum(density.max(axis=1, keepdims=True), 1)).ravel()[kept_cell]
+    offset = ((kept_rank + 0.5) / kept - 0.5) * 0.8 * density
+    
+    flat = order[keep]
+    rows, features = perm[flat // n_features], flat % n_features
+    return {
+        'x': shap_values[rows, features],
+        'offset': offset,
+        'feature': features,
+        'color': color[rows, features],
+        'n_points': int(keep.sum())
+    }
+
+
+def plot_shap_summary(shap_values, X_sample, feature_names=None, save_path=None, feature_order=None,
+                      mode='auto', max_display=20, max_points=2000, n_bins=100, max_per_bin=20):
     """
     Plot SHAP summary plot
     
@@ -32,22 +101,66 @@ def plot_shap_summary(shap_values, X_sample, feature_names=None, save_path=None)
         X_sample: Sample features
         feature_names: Feature names (optional)
         save_path: Path to save figure (optional)
+        feature_order: Feature indices, most important first (e.g.
+                       stability_metrics['importance']['order']); default:
+                       mean |SHAP| of shap_values
+        mode: 'shap' (shap's beeswarm with every point), 'binned' (downsampled,
+              rasterised scatter whose cost does not grow with the number of
+              samples) or 'auto' (binned above max_points samples)
+        max_display: Features shown
+        max_points: Sample count above which 'auto' switches to 'binned'
+        n_bins, max_per_bin: Downsampling grid (see binned_beeswarm_points)
     """
+    import matplotlib.pyplot as plt
+    
     setup_plot_style()
     
-    # Create SHAP Explanation object
     if feature_names is None and hasattr(X_sample, 'columns'):
         feature_names = X_sample.columns.tolist()
-    
-    shap_explanation = shap.Explanation(
-        values=shap_values,
-        base_values=np.zeros(len(shap_values)),
-        data=X_sample.values if hasattr(X_sample, 'values') else X_sample,
-        feature_names=feature_names
-    )
-    
-    plt.figure(figsize=(10, 8))
-    shap.plots.beeswarm(shap_explanation, show=False)
+    data = X_sample.values if hasattr(X_sample, 'values') else np.asarray(X_sample)
+    if mode == 'auto':
+        mode = 'binned' if len(shap_values) > max_points else 'shap'
+    
+    if mode == 'shap':
+        import shap
+        
+        # Create SHAP Explanation object
+        shap_explanation = shap.Explanation(
+            values=shap_values,
+            base_values=np.zeros(len(shap_values)),
+            data=data,
+            feature_names=feature_names
+        )
+        
+        plt.figure(figsize=(10, 8))
+        if feature_order is None:
+            shap.plots.beeswarm(shap_explanation, max_display=max_display, show=False)
+        else:
+            shap.plots.beeswarm(shap_explanation, max_display=max_display,
+                                order=np.asarray(feature_order), show=False)
+    else:
+        if feature_order is None:
+            feature_order = np.argsort(-np.abs(shap_values).mean(axis=0), kind='stable')
+        shown = np.asarray(feature_order)[:max_display]
+        points = binned_beeswarm_points(np.asarray(shap_values)[:, shown], data[:, shown],
+                                        n_bins=n_bins, max_per_bin=max_per_bin)
+        
+        plt.figure(figsize=(10, 8))
+        plt.axvline(0, color='#999999', linewidth=0.8, zorder=1)
+        scatter = plt.scatter(
+            points['x'], len(shown) - 1 - points['feature'] + points['offset'],
+            c=points['color'], cmap='coolwarm', vmin=0, vmax=1, s=10, linewidths=0,
+            alpha=0.8, rasterized=True, zorder=2
+        )
+        names = feature_names if feature_names is not None else [f'Feature {j}' for j in range(data.shape[1])]
+        plt.yticks(range(len(shown)), [names[j] for j in shown[::-1]])
+        plt.ylim(-0.6, len(shown) - 0.4)
+        plt.xlabel('SHAP value (impact on model output)')
+        plt.title(f'{len(shap_values)} instances ({points["n_points"]} points drawn)', fontsize=10)
+        colorbar = plt.colorbar(scatter, ticks=[0, 1], aspect=40)
+        colorbar.ax.set_yticklabels(['Low', 'High'])
+        colorbar.set_label('Feature value')
+        plt.grid(False)
     plt.tight_layout()
     
     if save_path:
@@ -65,6 +178,8 @@ def plot_ranking_correlation(stability_metrics, save_path=None):
         stability_metrics: Stability metrics dictionary
         save_path: Path to save figure (optional)
     """
+    import matplotlib.pyplot as plt
+    
     setup_plot_style()
     
     correlations = stability_metrics['ranking_correlation']['per_sample']
@@ -97,6 +212,8 @@ def plot_shap_variance(stability_metrics, feature_names=None, top_n=10, save_pat
         top_n: Number of top features to show
         save_path: Path to save figure (optional)
     """
+    import matplotlib.pyplot as plt
+    
     setup_plot_style()
     
     variance_per_feature = stability_metrics['variance']['per_feature']
@@ -135,6 +252,8 @@ def plot_consistency_comparison(stability_metrics, top_k_list=[3, 5, 10], save_p
         top_k_list: List of top-k values
         save_path: Path to save figure (optional)
     """
+    import matplotlib.pyplot as plt
+    
     setup_plot_style()
     
     consistency_values = [
@@ -172,6 +291,8 @@ def plot_model_comparison(comparison_df, save_path=None):
         comparison_df: DataFrame with model comparison
         save_path: Path to save figure (optional)
     """
+    import matplotlib.pyplot as plt
+    
     setup_plot_style()
     
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
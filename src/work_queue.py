@@ -0,0 +1,487 @@
+"""
+SQLite-backed work queue for the experiment grid
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+
+The grid (datasets x rates x replicates x models x seeds) is stored as one row
+per cell in a SQLite database inside a shared directory. Any number of worker
+processes, on any number of hosts that mount the directory, lease cells,
+heartbeat while training and explaining, and push the SHAP values back as npz
+files (one per attempt; the cell records the accepted one). Leases that are
+not renewed expire and the cell is retried, up to `max_attempts`. A coordinator runs the stability reduction at the end.
+
+The database uses SQLite's default rollback journal (not WAL), so it needs
+no shared-memory index, but it still depends on the file locks of the
+filesystem. SQLite documents these as unreliable on many network
+filesystems (NFS in particular): workers on several hosts need a shared
+directory with working POSIX locks, otherwise run the workers on one host.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+from itertools import product
+
+import pandas as pd
+
+from bookkeeping import Transaction
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    cell_id TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    rate REAL NOT NULL,
+    replicate INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    heartbeat REAL,
+    result_path TEXT,
+    error TEXT,
+    created REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS idx_cells_status ON cells (status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_cells_group ON cells (dataset, rate, replicate, model);
+"""
+
+
+def make_cell_id(dataset, rate, replicate, model, seed):
+    """Stable identifier of one grid cell"""
+    return f"{dataset}/rate_{rate}/rep_{replicate}/{model}/{seed}"
+
+
+def default_worker_id():
+    """host:pid identifier of the current worker process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Leasing work queue over a SQLite database in a shared directory"""
+
+    def __init__(self, queue_dir, lease_seconds=300, max_attempts=3):
+        """
+        Args:
+            queue_dir: Shared directory holding queue.db and results/
+            lease_seconds: Lease length; workers renew it by heartbeating
+            max_attempts: Attempts before a cell is marked as failed
+        """
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, 'queue.db')
+        self.results_dir = os.path.join(queue_dir, 'results')
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(self.results_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return Transaction(conn)
+
+    def enqueue(self, cells):
+        """
+        Add cells to the queue (cells already present are left untouched)
+
+        Args:
+            cells: Iterable of dicts with dataset, rate, replicate, model, seed
+                   and optional params
+
+        Returns:
+            Number of newly added cells
+        """
+        now = time.time()
+        rows = [
+            (make_cell_id(c['dataset'], c['rate'], c['replicate'], c['model'], c['seed']),
+             c['dataset'], c['rate'], c['replicate'], c['model'], c['seed'],
+             json.dumps(c.get('params', {}), sort_keys=True), now)
+            for c in cells
+        ]
+        with self._connect() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO cells "
+                "(cell_id, dataset, rate, replicate, model, seed, params, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            return conn.execute("SELECT COUNT(*) FROM cells").fetchone()[0] - before
+
+    def _expire_leases(self, conn, now):
+        """Return expired leases to the queue, or fail them after max_attempts"""
+        conn.execute(
+            "UPDATE cells SET status = 'failed', error = 'lease expired', worker = NULL "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE cells SET status = 'pending', worker = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?", (now,)
+        )
+
+    def lease(self, worker=None):
+        """
+        Lease the next pending cell
+
+        Args:
+            worker: Worker identifier (default: host:pid)
+
+        Returns:
+            Cell dict, or None if nothing is pending
+        """
+        worker = worker or default_worker_id()
+        now = time.time()
+        with self._connect() as conn:
+            self._expire_leases(conn, now)
+            row = conn.execute(
+                "SELECT * FROM cells WHERE status = 'pending' ORDER BY rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE cells SET status = 'leased', worker = ?, attempts = attempts + 1, "
+                "lease_expires = ?, heartbeat = ? WHERE cell_id = ?",
+                (worker, now + self.lease_seconds, now, row['cell_id'])
+            )
+        cell = dict(row)
+        cell['params'] = json.loads(cell['params'])
+        cell['attempts'] += 1
+        cell['worker'] = worker
+        return cell
+
+    def heartbeat(self, cell_id, worker):
+        """
+        Renew a lease
+
+        Returns:
+            True if the worker still holds the lease
+        """
+        now = time.time()
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE cells SET lease_expires = ?, heartbeat = ? "
+                "WHERE cell_id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, cell_id, worker)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, cell_id, worker, result_path):
+        """
+        Mark a leased cell as done
+
+        Returns:
+            True if the result was accepted (the lease was still held)
+        """
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE cells SET status = 'done', result_path = ?, finished = ?, error = NULL "
+                "WHERE cell_id = ? AND worker = ? AND status = 'leased'",
+                (result_path, time.time(), cell_id, worker)
+            ).rowcount
+        return updated == 1
+
+    def fail(self, cell_id, worker, error):
+        """Record a failed attempt; the cell is retried until max_attempts"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cells SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, worker = NULL WHERE cell_id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, cell_id, worker)
+            )
+
+    def counts(self):
+        """
+        Returns:
+            Dictionary {status: number of cells}
+        """
+        with self._connect() as conn:
+            self._expire_leases(conn, time.time())
+            rows = conn.execute("SELECT status, COUNT(*) FROM cells GROUP BY status").fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update({status: n for status, n in rows})
+        return counts
+
+    def is_finished(self):
+        """True when no cell is pending or leased"""
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+    def cells(self, status=None):
+        """
+        Returns:
+            DataFrame of cells (optionally filtered by status)
+        """
+        query = "SELECT * FROM cells" + (" WHERE status = ?" if status else "") + " ORDER BY rowid"
+        with self._connect() as conn:
+            rows = conn.execute(query, (status,) if status else ()).fetchall()
+        return pd.DataFrame([dict(r) for r in rows])
+
+    def progress_log(self):
+        """Progress event log shared by all workers of this queue"""
+        from progress import ProgressLog
+        return ProgressLog(os.path.join(self.queue_dir, 'progress.jsonl'),
+                           run=f'queue:{os.path.abspath(self.queue_dir)}')
+
+    def result_path(self, cell_id, attempt):
+        """
+        Path of the npz file holding the SHAP values of one attempt at a cell
+
+        Every lease writes its own file, so a worker that lost its lease
+        never overwrites the result accepted from the next holder;
+        complete() records which file is the cell's result.
+        """
+        return os.path.join(self.results_dir, f"{cell_id.replace('/', '__')}.attempt{attempt}.npz")
+
+
+def build_grid(datasets, rates, replicates, models, seeds, params=None):
+    """
+    Enumerate grid cells
+
+    Args:
+        datasets, rates, models, seeds: Grid axes
+        replicates: Number of subsample replicates per rate
+        params: Shared cell parameters (n_samples, nsamples_shap, model params)
+
+    Returns:
+        List of cell dicts
+    """
+    return [
+        {'dataset': d, 'rate': r, 'replicate': rep, 'model': m, 'seed': s, 'params': params or {}}
+        for d, r, rep, m, s in product(datasets, rates, range(replicates), models, seeds)
+    ]
+
+
+class _Heartbeat(threading.Thread):
+    """Background thread renewing a cell lease"""
+
+    def __init__(self, queue, cell_id, worker):
+        super().__init__(daemon=True)
+        self.queue, self.cell_id, self.worker = queue, cell_id, worker
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        interval = max(self.queue.lease_seconds / 3, 1)
+        while not self.stopped.wait(interval):
+            if not self.queue.heartbeat(self.cell_id, self.worker):
+                self.lost = True
+                return
+
+
+def run_worker(queue, worker=None, max_cells=None, idle_exit=True, poll_seconds=5, progress=None,
+               shared_splits=None):
+    """
+    Pull cells from the queue, train and explain them, push the results
+
+    Args:
+        queue: WorkQueue
+        worker: Worker identifier (default: host:pid)
+        max_cells: Stop after this many cells (default: no limit)
+        idle_exit: Exit once no cell is pending or leased instead of polling
+                   forever; while other workers hold leases this worker
+                   keeps polling, so it picks up cells whose lease expires
+        poll_seconds: Poll interval while waiting for work
+        progress: progress.ProgressLog (optional); cell start, finish and
+                  failure are emitted to it, with the model as the kind
+        shared_splits: Dictionary {(dataset, precision): (name, meta)} of
+                       splits published with shared_data.publish_split
+                       (used instead of loading and splitting the dataset)
+
+    Returns:
+        Number of cells completed by this worker
+    """
+    # Imported here so that the coordinator does not need the ML stack
+    from stages import (
+        load_stage, split_stage, subsample_stage, explain_set_stage, train_stage, explain_stage,
+        background_stage, background_for, TREE_MODELS
+    )
+    from shap_analysis import save_shap_values
+
+    worker = worker or default_worker_id()
+    splits = {}
+    backgrounds = {}
+    completed = 0
+
+    def get_split(cell):
+        precision = cell['params'].get('precision', 'float64')
+        key = (cell['dataset'], cell['rate'], cell['replicate'], precision)
+        if key not in splits:
+            if shared_splits and (cell['dataset'], precision) in shared_splits:
+                from shared_data import get_shared_split
+                split = get_shared_split(*shared_splits[(cell['dataset'], precision)])
+            else:
+                split = split_stage(load_stage(cell['dataset']), random_state=42, precision=precision)
+            if cell['rate'] < 1.0:
+                split = subsample_stage(split, rate=cell['rate'], random_state=42 + cell['replicate'])
+            splits[key] = split
+        return splits[key]
+
+    def tree_perturbation(cell):
+        spec = cell['params'].get('background') or {}
+        if cell['model'] in TREE_MODELS and spec.get('trees'):
+            return 'interventional'
+        return 'tree_path_dependent'
+
+    def get_background(cell, split):
+        spec = background_for(cell['params'].get('background'), cell['model'])
+        if not spec:
+            return None
+        key = (cell['dataset'], cell['rate'], cell['replicate'], spec['method'], spec['size'])
+        if key not in backgrounds:
+            backgrounds[key] = background_stage(split, **spec)
+        return backgrounds[key]
+
+    while max_cells is None or completed < max_cells:
+        cell = queue.lease(worker)
+        if cell is None:
+            # is_finished() returns expired leases to the queue first
+            if idle_exit and queue.is_finished():
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        heartbeat = _Heartbeat(queue, cell['cell_id'], worker)
+        heartbeat.start()
+        labels = {k: cell[k] for k in ['dataset', 'rate', 'replicate', 'model', 'seed']}
+        labels['worker'] = worker
+        if progress is not None:
+            progress.start(cell['cell_id'], labels, kind=cell['model'])
+        start = time.perf_counter()
+        try:
+            params = cell['params']
+            split = get_split(cell)
+            X_explain = explain_set_stage(split, n_samples=params.get('n_samples', 100), random_state=42)
+            model = train_stage(split, cell['model'], cell['seed'],
+                                params=params.get('model_params', {}).get(cell['model'], {}))
+            shap_values = explain_stage(model, split, X_explain, cell['model'], cell['seed'],
+                                        nsamples_shap=params.get('nsamples_shap', 100),
+                                        kernel_options=params.get('kernel_options'),
+                                        background=get_background(cell, split),
+                                        batch_size=params.get('batch_size'),
+                                        feature_perturbation=tree_perturbation(cell))
+
+            # Write next to the final path and rename, so readers never see partial files
+            result_path = queue.result_path(cell['cell_id'], cell['attempts'])
+            fd, tmp_path = tempfile.mkstemp(dir=queue.results_dir, suffix='.tmp.npz')
+            os.close(fd)
+            save_shap_values(shap_values, tmp_path)
+            os.replace(tmp_path, result_path)
+
+            heartbeat.stopped.set()
+            if heartbeat.lost or not queue.complete(cell['cell_id'], worker, result_path):
+                os.remove(result_path)
+                print(f"  [LOST] {cell['cell_id']} (lease expired, result discarded)")
+                if progress is not None:
+                    progress.fail(cell['cell_id'], time.perf_counter() - start, 'lease lost', labels,
+                                  kind=cell['model'])
+            else:
+                completed += 1
+                print(f"  [OK] {cell['cell_id']} ({worker})")
+                if progress is not None:
+                    progress.finish(cell['cell_id'], time.perf_counter() - start, labels, kind=cell['model'])
+        except Exception as error:
+            heartbeat.stopped.set()
+            queue.fail(cell['cell_id'], worker, traceback.format_exc(limit=5))
+            print(f"  [ERROR] {cell['cell_id']} ({worker})")
+            if progress is not None:
+                progress.fail(cell['cell_id'], time.perf_counter() - start, error, labels, kind=cell['model'])
+
+    return completed
+
+
+def _shared_worker(task):
+    """Entry point of a local worker process (see run_local_workers)"""
+    queue_dir, lease_seconds, max_attempts, worker, shared_splits = task
+    queue = WorkQueue(queue_dir, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    return run_worker(queue, worker=worker, progress=queue.progress_log(), shared_splits=shared_splits)
+
+
+def run_local_workers(queue, n_workers, datasets, precision='float64'):
+    """
+    Run worker processes on this machine with the datasets in shared memory
+
+    Every dataset is loaded and split once here and published to the
+    workers, which attach to it instead of loading and splitting it again.
+
+    Args:
+        queue: WorkQueue
+        n_workers: Worker processes
+        datasets: Datasets of the grid
+        precision: Feature precision of the cells
+
+    Returns:
+        Number of cells completed per worker
+    """
+    from stages import load_stage, split_stage
+    from shared_data import SharedDataPlane, publish_split, run_with_shared_data
+
+    with SharedDataPlane() as plane:
+        shared_splits = {}
+        for dataset in datasets:
+            split = split_stage(load_stage(dataset), random_state=42, precision=precision)
+            name = f'{dataset}_{precision}'
+            shared_splits[(dataset, precision)] = (name, publish_split(plane, name, split))
+        tasks = [(queue.queue_dir, queue.lease_seconds, queue.max_attempts, f'local-{i}', shared_splits)
+                 for i in range(n_workers)]
+        return run_with_shared_data(_shared_worker, tasks, plane.handles(), max_workers=n_workers)
+
+
+def reduce_results(queue, top_k_list=(3, 5, 10), group_one_hot=False):
+    """
+    Stability reduction over finished cells
+
+    Groups done cells by (dataset, rate, replicate, model) and computes the
+    stability metrics across their seeds.
+
+    Args:
+        queue: WorkQueue
+        top_k_list: Top-k values for consistency analysis
+        group_one_hot: Compute the metrics per original (pre one-hot) feature
+
+    Returns:
+        DataFrame with one row per group
+    """
+    from shap_analysis import load_shap_values
+    from stability_metrics import compute_stability_metrics
+    from stages import feature_groups_stage
+    from data_loader import feature_group_matrix
+
+    done = queue.cells(status='done')
+    rows = []
+    if done.empty:
+        return pd.DataFrame(rows)
+    group_matrices = {}
+    for (dataset, rate, replicate, model), group in done.groupby(['dataset', 'rate', 'replicate', 'model']):
+        if len(group) < 2:
+            continue
+        shap_dict = {int(seed): load_shap_values(path) for seed, path in zip(group['seed'], group['result_path'])}
+        matrix = names = None
+        if group_one_hot:
+            if dataset not in group_matrices:
+                groups = feature_groups_stage(dataset)
+                group_matrices[dataset] = feature_group_matrix(groups['columns'], groups['groups'])
+            matrix, names = group_matrices[dataset]
+        metrics = compute_stability_metrics(shap_dict, top_k_list=list(top_k_list),
+                                            group_matrix=matrix, group_names=names)
+        row = {
+            'Dataset': dataset, 'Subsample Rate': rate, 'Replicate': replicate,
+            'Model': model, 'Seeds': len(group),
+            'Ranking Correlation': metrics['ranking_correlation']['mean'],
+            'SHAP Variance': metrics['variance']['overall']
+        }
+        for top_k in top_k_list:
+            row[f'Top-{top_k} Consistency'] = metrics['consistency'][f'top_{top_k}']['overall']
+        rows.append(row)
+    return pd.DataFrame(rows)
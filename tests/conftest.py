@@ -0,0 +1,10 @@
+"""
+Shared pytest setup: the modules under src/ are imported by name, as the
+run_* scripts do
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,92 @@
+"""
+Chunked interaction statistics against brute-force computation
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+from itertools import combinations
+
+import numpy as np
+import pytest
+from scipy.stats import spearmanr
+
+from interaction_stability import InteractionStability, compute_interaction_stability, interaction_values
+
+
+def brute_force(tensors, top_n):
+    """Statistics from the full (seeds, samples, features, features) tensor, one loop per definition"""
+    n_seeds, n_samples, n_features, _ = tensors.shape
+    pairs = list(combinations(range(n_features), 2))
+    effects = np.array([[[2 * t[i, a, b] for a, b in pairs] for i in range(n_samples)] for t in tensors])
+    importance = np.abs(effects).mean(axis=1)  # (seeds, pairs)
+    seed_pairs = list(combinations(range(n_seeds), 2))
+
+    def top(values):
+        return set(np.argsort(-np.abs(values))[:top_n])
+
+    instance_correlation = np.mean([
+        np.mean([spearmanr(np.abs(effects[s, i]), np.abs(effects[t, i]))[0] for s, t in seed_pairs])
+        for i in range(n_samples)
+    ])
+    instance_consistency = np.mean([
+        len(set.intersection(*[top(effects[s, i]) for s in range(n_seeds)])) / top_n for i in range(n_samples)
+    ])
+    return {
+        'importance': importance,
+        'effect': effects.mean(axis=1),
+        'variance': effects.var(axis=0).mean(axis=0),
+        'ranking_correlation': np.mean([spearmanr(importance[s], importance[t])[0] for s, t in seed_pairs]),
+        'instance_ranking_correlation': instance_correlation,
+        'top_n_consistency': len(set.intersection(*[top(v) for v in importance])) / top_n,
+        'instance_top_n_consistency': instance_consistency,
+        'pairs': pairs
+    }
+
+
+def check_against_brute_force(result, expected, feature_names):
+    for key in ('ranking_correlation', 'instance_ranking_correlation', 'top_n_consistency',
+                'instance_top_n_consistency'):
+        assert result[key] == pytest.approx(expected[key], abs=1e-10), key
+    assert result['variance'] == pytest.approx(expected['variance'].mean(), rel=1e-10)
+
+    index = {(feature_names[a], feature_names[b]): p for p, (a, b) in enumerate(expected['pairs'])}
+    rows = [index[pair] for pair in zip(result['top_pairs']['feature_a'], result['top_pairs']['feature_b'])]
+    mean_importance = expected['importance'].mean(axis=0)
+    assert rows == list(np.argsort(-mean_importance)[:result['top_n']])
+    np.testing.assert_allclose(result['top_pairs']['importance_mean'], mean_importance[rows], rtol=1e-10)
+    np.testing.assert_allclose(result['top_pairs']['importance_std'], expected['importance'].std(axis=0)[rows],
+                               rtol=1e-10)
+    np.testing.assert_allclose(result['top_pairs']['effect_mean'], expected['effect'].mean(axis=0)[rows],
+                               rtol=1e-10)
+    np.testing.assert_allclose(result['top_pairs']['instance_variance'], expected['variance'][rows], rtol=1e-10)
+
+
+def test_running_statistics_match_brute_force():
+    rng = np.random.RandomState(0)
+    n_seeds, n_samples, n_features, top_n = 3, 23, 6, 4
+    tensors = rng.normal(size=(n_seeds, n_samples, n_features, n_features))
+    tensors = (tensors + tensors.swapaxes(-1, -2)) / 2
+
+    stats = InteractionStability(n_features, n_seeds, top_n=top_n)
+    for start in range(0, n_samples, 5):
+        stats.add(stats.pairs(tensors[:, start:start + 5]))
+    names = [f'f{j}' for j in range(n_features)]
+    check_against_brute_force(stats.result(), brute_force(tensors, top_n), names)
+
+
+def test_chunked_tree_interactions_match_unchunked():
+    shap = pytest.importorskip('shap')
+    xgb = pytest.importorskip('xgboost')
+    from benchmark import synthetic_classification
+
+    X, y = synthetic_classification(200, 6)
+    X_explain = X.iloc[:30]
+    models = {s: xgb.XGBClassifier(n_estimators=15, max_depth=3, subsample=0.8, random_state=s).fit(X, y)
+              for s in (0, 1, 2)}
+    # A ceiling of a few instances forces several chunks
+    result = compute_interaction_stability(models, X_explain, top_n=5, memory_limit_mb=0.02)
+    assert 1 < result['chunk_size'] < len(X_explain)
+    assert result['n_samples'] == len(X_explain)
+
+    tensors = np.stack([interaction_values(shap.TreeExplainer(models[s]), X_explain) for s in (0, 1, 2)])
+    tensors = tensors.astype(np.float64)
+    check_against_brute_force(result, brute_force(tensors, 5), list(X.columns))
@@ -0,0 +1,120 @@
+"""
+Ensemble margins, contributions and interventional TreeSHAP against the models and shap
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models import Ensemble
+
+
+SEEDS = (0, 1)
+
+
+@pytest.fixture(scope='module')
+def data():
+    from sklearn.datasets import make_classification
+
+    X, y = make_classification(n_samples=300, n_features=5, n_informative=3, random_state=0)
+    X = pd.DataFrame(X, columns=[f'feature_{j}' for j in range(5)])
+    return X, y, X.iloc[:20]
+
+
+def test_linear_contributions_match_linear_explainer(data):
+    shap = pytest.importorskip('shap')
+    from sklearn.linear_model import LogisticRegression
+
+    X, y, X_explain = data
+    models = {s: LogisticRegression(C=0.5 + s, max_iter=500).fit(X, y) for s in SEEDS}
+    background = X.iloc[:100]
+    ensemble = Ensemble(models)
+    contributions = ensemble.contributions(X_explain, reference=background)
+    for i, seed in enumerate(SEEDS):
+        expected = shap.LinearExplainer(models[seed], background).shap_values(X_explain)
+        np.testing.assert_allclose(contributions[i], expected, atol=1e-12)
+    np.testing.assert_allclose(contributions.sum(-1) + ensemble.base_value(reference=background)[:, None],
+                               ensemble.margin(X_explain), atol=1e-12)
+
+
+def test_xgboost_matches_booster_and_tree_shap(data):
+    shap = pytest.importorskip('shap')
+    xgb = pytest.importorskip('xgboost')
+
+    X, y, X_explain = data
+    models = {s: xgb.XGBClassifier(n_estimators=20, max_depth=3, subsample=0.8, random_state=s).fit(X, y)
+              for s in SEEDS}
+    ensemble = Ensemble(models)
+    margin = ensemble.margin(X_explain)
+    contributions = ensemble.contributions(X_explain)
+    for i, seed in enumerate(SEEDS):
+        model = models[seed]
+        np.testing.assert_allclose(margin[i], model.predict(X_explain, output_margin=True), atol=1e-5)
+        np.testing.assert_allclose(ensemble.predict(X_explain)[i], model.predict_proba(X_explain)[:, 1],
+                                   atol=1e-5)
+        # Path attributions are XGBoost's approximate contributions ...
+        approx = model.get_booster().predict(xgb.DMatrix(X_explain), pred_contribs=True, approx_contribs=True)
+        np.testing.assert_allclose(contributions[i], approx[:, :-1], atol=1e-5)
+        # ... and add up to the same total as TreeSHAP
+        tree_shap = shap.TreeExplainer(model).shap_values(X_explain)
+        np.testing.assert_allclose(contributions[i].sum(1), tree_shap.sum(1), atol=1e-5)
+    np.testing.assert_allclose(contributions.sum(-1) + ensemble.base_value()[:, None], margin, atol=1e-10)
+
+
+def test_random_forest_matches_predict_proba(data):
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y, X_explain = data
+    models = {s: RandomForestClassifier(n_estimators=10, max_depth=4, random_state=s).fit(X, y) for s in SEEDS}
+    ensemble = Ensemble(models)
+    margin = ensemble.margin(X_explain)
+    for i, seed in enumerate(SEEDS):
+        np.testing.assert_allclose(margin[i], models[seed].predict_proba(X_explain)[:, 1], atol=1e-12)
+    np.testing.assert_allclose(ensemble.contributions(X_explain).sum(-1) + ensemble.base_value()[:, None],
+                               margin, atol=1e-12)
+
+
+def _tree_model(name):
+    import xgboost as xgb
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    return {
+        'xgboost_classifier': lambda: xgb.XGBClassifier(n_estimators=20, max_depth=3),
+        'xgboost_regressor': lambda: xgb.XGBRegressor(n_estimators=20, max_depth=3),
+        'forest_classifier': lambda: RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0),
+        'forest_regressor': lambda: RandomForestRegressor(n_estimators=10, max_depth=4, random_state=0)
+    }[name]()
+
+
+@pytest.mark.parametrize('name', ['xgboost_classifier', 'xgboost_regressor', 'forest_classifier',
+                                  'forest_regressor'])
+def test_interventional_tree_shap_matches_shap(data, name):
+    shap = pytest.importorskip('shap')
+    pytest.importorskip('xgboost')
+    from sklearn.datasets import make_regression
+    from shap_analysis import compute_tree_shap
+
+    X, y, _ = data
+    if name.endswith('regressor'):
+        X, y = make_regression(n_samples=300, n_features=5, random_state=0)
+        X = pd.DataFrame(X, columns=[f'feature_{j}' for j in range(5)])
+    model = _tree_model(name).fit(X, y)
+    background, X_explain = X.iloc[:30], X.iloc[100:120]
+
+    def reference(rows):
+        # Margin for XGBoost classifiers, positive-class probability for forests
+        values = np.asarray(shap.TreeExplainer(model, rows, feature_perturbation='interventional')
+                            .shap_values(X_explain))
+        return values[..., 1] if values.ndim == 3 else values
+
+    expected = reference(background)
+    tolerance = 1e-6 * max(1.0, np.abs(expected).max())
+    values, _ = compute_tree_shap(model, X_explain, n_samples=None, background=background)
+    np.testing.assert_allclose(values, expected, atol=tolerance)
+
+    # Weights act like repeated rows: the first ten rows count twice
+    weights = np.r_[np.full(10, 2.0), np.ones(20)] / 40
+    values, _ = compute_tree_shap(model, X_explain, n_samples=None,
+                                  background={'data': background, 'weights': weights})
+    np.testing.assert_allclose(values, reference(pd.concat([background.iloc[:10], background])), atol=tolerance)
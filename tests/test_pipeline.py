@@ -0,0 +1,128 @@
+"""
+Stage keys, artifact caching and journal resume of the stage graph
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+from checkpoint import CheckpointJournal
+from pipeline import ArtifactStore, StageGraph, StageRunner
+
+
+CALLS = []
+
+
+def make_numbers(n):
+    CALLS.append('numbers')
+    return list(range(n))
+
+
+def scale(numbers, factor, export_path=None):
+    CALLS.append('scale')
+    return [factor * x for x in numbers]
+
+
+def total(numbers):
+    CALLS.append('total')
+    return sum(numbers)
+
+
+def build_graph(n=4, factor=2, export_path=None, version=1):
+    graph = StageGraph()
+    numbers = graph.add('numbers', make_numbers, params=dict(n=n))
+    scaled = graph.add('scale', scale, deps=[numbers], params=dict(factor=factor),
+                       extra=dict(export_path=export_path), version=version)
+    graph.add('total', total, deps=[scaled])
+    graph.compute_keys()
+    return graph
+
+
+def keys(graph):
+    return {name: stage.key for name, stage in graph.stages.items()}
+
+
+def runner(tmp_path, **kwargs):
+    return StageRunner(store=ArtifactStore(str(tmp_path / 'artifacts')), verbose=False, **kwargs)
+
+
+def test_keys_depend_on_params_inputs_and_version_only():
+    base = keys(build_graph())
+    assert base == keys(build_graph())
+    # Execution details are not part of the key
+    assert base == keys(build_graph(export_path='elsewhere.csv'))
+
+    changed = keys(build_graph(factor=3))
+    assert changed['numbers'] == base['numbers']
+    assert changed['scale'] != base['scale']
+    # A changed input changes every downstream key
+    assert changed['total'] != base['total']
+
+    assert keys(build_graph(n=5))['scale'] != base['scale']
+    assert keys(build_graph(version=2))['scale'] != base['scale']
+
+
+def test_cached_stages_are_skipped(tmp_path):
+    CALLS.clear()
+    assert runner(tmp_path).run(build_graph()) == {'total': 12}
+    assert CALLS == ['numbers', 'scale', 'total']
+
+    CALLS.clear()
+    assert runner(tmp_path).run(build_graph()) == {'total': 12}
+    assert CALLS == []
+
+    # Only the changed stage and its dependents rerun
+    CALLS.clear()
+    assert runner(tmp_path).run(build_graph(factor=3)) == {'total': 18}
+    assert CALLS == ['scale', 'total']
+
+    CALLS.clear()
+    runner(tmp_path, force=True).run(build_graph())
+    assert CALLS == ['numbers', 'scale', 'total']
+
+
+def test_uncached_stage_always_runs(tmp_path):
+    graph = StageGraph()
+    numbers = graph.add('numbers', make_numbers, params=dict(n=3))
+    graph.add('total', total, deps=[numbers], cache=False)
+    runner(tmp_path).run(graph)
+
+    CALLS.clear()
+    assert runner(tmp_path).run(graph) == {'total': 3}
+    assert CALLS == ['total']
+
+
+def test_completed_stages_are_journalled(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'journal.jsonl'))
+    graph = build_graph()
+    runner(tmp_path, journal=journal).run(graph)
+    assert set(journal.completed()) == {stage.key for stage in graph.stages.values()}
+    assert journal.planned() == ['numbers', 'scale', 'total']
+
+    CALLS.clear()
+    assert runner(tmp_path, journal=journal).run(build_graph()) == {'total': 12}
+    assert CALLS == []
+
+
+def test_resume_skips_journalled_stages_of_forced_run(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'journal.jsonl'))
+    graph = build_graph()
+    runner(tmp_path).run(graph)
+
+    # A forced run that stopped after its first stage
+    journal.append({'event': 'done', 'stage': 'numbers', 'key': graph.stages['numbers'].key})
+
+    CALLS.clear()
+    runner(tmp_path, force=True, journal=journal, resume=True).run(build_graph())
+    assert CALLS == ['scale', 'total']
+    assert set(journal.completed()) == {stage.key for stage in graph.stages.values()}
+
+    # Without resume the journal does not decide what runs
+    CALLS.clear()
+    runner(tmp_path, force=True, journal=journal).run(build_graph())
+    assert CALLS == ['numbers', 'scale', 'total']
+
+
+def test_journal_ignores_truncated_last_line(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'journal.jsonl'))
+    journal.append({'event': 'done', 'stage': 'a', 'key': 'k1'})
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "done", "stage": "b", "ke')
+    assert list(journal.completed()) == ['k1']
@@ -0,0 +1,105 @@
+"""
+Adaptive KernelSHAP: additivity, convergence and budget checks
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+from itertools import combinations
+from math import factorial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shap_analysis import compute_kernel_shap_adaptive
+
+
+@pytest.fixture(scope='module')
+def model_and_data():
+    from sklearn.datasets import make_classification
+    from sklearn.linear_model import LogisticRegression
+
+    X, y = make_classification(n_samples=200, n_features=6, n_informative=4, random_state=0)
+    X = pd.DataFrame(X, columns=[f'feature_{j}' for j in range(6)])
+    return LogisticRegression(max_iter=500).fit(X, y), X
+
+
+def exact_shapley_values(model, X_sample, background):
+    """Interventional Shapley values of the positive-class probability by enumerating all coalitions"""
+    d = X_sample.shape[1]
+    data = background.values
+    exact = np.zeros(X_sample.shape)
+    for i, x in enumerate(X_sample.values):
+        def value(members):
+            rows = data.copy()
+            rows[:, list(members)] = x[list(members)]
+            return model.predict_proba(pd.DataFrame(rows, columns=X_sample.columns))[:, 1].mean()
+        for j in range(d):
+            others = [k for k in range(d) if k != j]
+            for size in range(d):
+                weight = factorial(size) * factorial(d - size - 1) / factorial(d)
+                for members in combinations(others, size):
+                    exact[i, j] += weight * (value(members + (j,)) - value(members))
+    return exact
+
+
+def test_values_add_up_to_prediction_minus_background_mean(model_and_data):
+    model, X = model_and_data
+    # The whole training set is the background
+    background = X.iloc[:20]
+    shap_values, X_sample, std_errors = compute_kernel_shap_adaptive(
+        model, background, X.iloc[20:], n_samples=8, n_background=20, random_state=0
+    )
+    expected = model.predict_proba(X_sample)[:, 1] - model.predict_proba(background)[:, 1].mean()
+    np.testing.assert_allclose(shap_values.sum(axis=1), expected, atol=1e-5)
+    assert shap_values.shape == std_errors.shape == (8, 6)
+    assert np.isfinite(std_errors).all()
+
+
+def test_linear_model_converges_to_exact_values(model_and_data):
+    model, X = model_and_data
+    background = X.iloc[:20]
+    shap_values, X_sample, std_errors = compute_kernel_shap_adaptive(
+        model, background, X.iloc[20:], n_samples=4, n_background=20, target_se=1e-4,
+        max_coalitions=4096, random_state=0
+    )
+    exact = exact_shapley_values(model, X_sample, background)
+    assert np.abs(shap_values - exact).max() < 5 * max(std_errors.max(), 1e-4)
+
+
+def test_budget_below_one_round_raises(model_and_data):
+    model, X = model_and_data
+    with pytest.raises(ValueError, match='max_evaluations'):
+        compute_kernel_shap_adaptive(model, X, X, n_samples=4, n_background=20, max_evaluations=500,
+                                     random_state=0)
+
+
+def test_unreached_instances_are_reported(model_and_data):
+    model, X = model_and_data
+    # Background and instance predictions plus two rounds of one instance each
+    budget = 20 + 5 + 2 * 2 * 32 * 20
+    with pytest.warns(UserWarning, match='3 of 5'):
+        _, _, std_errors = compute_kernel_shap_adaptive(model, X, X, n_samples=5, n_background=20,
+                                                        max_evaluations=budget, random_state=0)
+    assert np.isinf(std_errors).all(axis=1).sum() == 3
+
+
+def test_budget_counts_every_prediction(model_and_data):
+    model, X = model_and_data
+    predicted = []
+    original = type(model).predict_proba
+
+    class Counting(type(model)):
+        def predict_proba(self, X):
+            predicted.append(len(X))
+            return original(self, X)
+
+    counting = Counting(max_iter=500).fit(X, np.asarray(model.predict(X)))
+    # Exactly the background and instance predictions and one round of one instance
+    budget = 20 + 5 + 2 * 32 * 20
+    with pytest.warns(UserWarning, match='4 of 5'):
+        compute_kernel_shap_adaptive(counting, X, X, n_samples=5, n_background=20, max_evaluations=budget,
+                                     random_state=0)
+    assert sum(predicted) == budget
+    with pytest.raises(ValueError, match='max_evaluations'):
+        compute_kernel_shap_adaptive(counting, X, X, n_samples=5, n_background=20,
+                                     max_evaluations=budget - 1, random_state=0)
@@ -0,0 +1,53 @@
+"""
+Round trip of quantised SHAP archives within their error bound
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+import numpy as np
+
+from shap_archive import (
+    archive_info, decode_shap_archive, encode_shap_archive, load_shap_archive, save_shap_archive
+)
+
+
+def seed_values(n_seeds=4, shape=(50, 7)):
+    rng = np.random.RandomState(0)
+    common = rng.normal(scale=rng.uniform(0.01, 2.0, shape[-1]), size=shape)
+    values = {seed: common + rng.normal(scale=0.05, size=shape) for seed in range(n_seeds)}
+    # A feature without variation across seeds (all-zero residuals)
+    for seed in values:
+        values[seed][:, 0] = common[:, 0]
+    return values
+
+
+def test_decoded_values_stay_within_bound():
+    values = seed_values()
+    archive = encode_shap_archive(values)
+    decoded = decode_shap_archive(archive)
+    stack = np.stack([values[seed] for seed in sorted(values)])
+    error = np.abs(decoded - stack).reshape(-1, stack.shape[-1]).max(axis=0)
+    np.testing.assert_array_equal(error, archive['error_bound'])
+    # Half a quantisation step, plus float32 rounding of mean and decode
+    rounding = 4 * np.finfo(np.float32).eps * np.abs(stack).reshape(-1, stack.shape[-1]).max(axis=0)
+    assert np.all(archive['error_bound'] <= archive['scale'] / 2 + rounding)
+    assert archive['residuals'].dtype == np.int16
+
+
+def test_file_round_trip(tmp_path):
+    values = seed_values()
+    path = str(tmp_path / 'archive.npz')
+    bound = save_shap_archive(values, path)
+    loaded = load_shap_archive(path)
+    assert sorted(loaded) == sorted(values)
+    for seed, original in values.items():
+        assert loaded[seed].dtype == np.float32
+        assert np.all(np.abs(loaded[seed] - original) <= bound)
+
+    subset = load_shap_archive(path, seeds=[3, 1])
+    assert list(subset) == [3, 1]
+    np.testing.assert_array_equal(subset[1], loaded[1])
+
+    info = archive_info(path)
+    assert info['seeds'] == [0, 1, 2, 3]
+    assert info['shape'] == (50, 7)
+    assert info['max_error'] == float(bound.max())
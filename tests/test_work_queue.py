@@ -0,0 +1,63 @@
+"""
+Leases of the SQLite work queue
+Student: Keisuke Nishioka (Matrikelnummer: 10081049)
+"""
+
+import time
+
+from work_queue import WorkQueue, build_grid
+
+
+def make_queue(tmp_path, lease_seconds=0.2, max_attempts=3):
+    queue = WorkQueue(str(tmp_path / 'queue'), lease_seconds=lease_seconds, max_attempts=max_attempts)
+    queue.enqueue(build_grid(['adult'], [0.5], 1, ['xgboost'], [42]))
+    return queue
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue(build_grid(['adult'], [0.5], 1, ['xgboost'], [42, 123])) == 1
+    assert queue.counts()['pending'] == 2
+
+
+def test_expired_lease_is_released_to_another_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    cell = queue.lease('dead')
+    assert queue.lease('alive') is None
+    assert not queue.is_finished()
+
+    time.sleep(0.3)
+    again = queue.lease('alive')
+    assert again['cell_id'] == cell['cell_id']
+    assert again['attempts'] == 2
+
+    # The worker that lost the lease can neither renew nor complete it, and
+    # its result file is not the one of the new lease
+    stale_path = queue.result_path(cell['cell_id'], cell['attempts'])
+    result_path = queue.result_path(again['cell_id'], again['attempts'])
+    assert stale_path != result_path
+    assert not queue.heartbeat(cell['cell_id'], 'dead')
+    assert not queue.complete(cell['cell_id'], 'dead', stale_path)
+    assert queue.complete(again['cell_id'], 'alive', result_path)
+    assert queue.is_finished()
+    assert queue.cells('done')['result_path'].tolist() == [result_path]
+
+
+def test_heartbeat_keeps_lease(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.5)
+    cell = queue.lease('worker')
+    for _ in range(4):
+        time.sleep(0.2)
+        assert queue.heartbeat(cell['cell_id'], 'worker')
+    assert queue.lease('other') is None
+
+
+def test_cell_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    for _ in range(2):
+        assert queue.lease('dead') is not None
+        time.sleep(0.3)
+    assert queue.lease('alive') is None
+    assert queue.counts()['failed'] == 1
+    assert queue.is_finished()
+    assert queue.cells('failed')['error'].tolist() == ['lease expired']